@@ -0,0 +1,127 @@
+# backend/app/alerts.py
+# ------------------------------------------------------------
+# Price alerts: notify a user when a market's YES price reaches a level.
+# - A market's armed alerts sit in an in-memory AlertBook: one
+#   ThresholdIndex per direction, keyed by threshold, built from `alerts`
+#   and cached per worker under cache.ALERTS (like the limit order book).
+# - trading.fill calls fire() after every fill with the new price, inside
+#   the writer's transaction. 'above' alerts with threshold <= price and
+#   'below' alerts with threshold >= price are the two ends of their
+#   indexes, so a fill costs O(log n + k) for k crossed alerts, however
+#   many are armed.
+# - Firing is a guarded UPDATE (status='armed'), so an alert fired by an
+#   earlier fill of the same transaction, or by another worker whose
+#   change this worker's cached book hasn't seen yet, is skipped.
+# - Fired alerts stay in the table as the user's inbox. Each gets its
+#   shard's next fired_seq (from alert_seq, under the writer's lock, so
+#   in commit order), which the inbox cursor pages on.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import sqlite3, uuid
+from typing import Any, Dict, List
+from . import cache
+from .db import market_conn
+from .triggers import ThresholdIndex
+
+MAX_ARMED_PER_MARKET = 50    # per user
+
+
+class AlertBook:
+    """Armed alerts of one market. Read-only once built (shared via the cache)."""
+    __slots__ = ("above", "below")
+
+    def __init__(self, rows):
+        entries: Dict[str, list] = {"above": [], "below": []}
+        for r in rows:
+            entries[r["direction"]].append((r["threshold"], r["rowid"], r["id"]))
+        self.above = ThresholdIndex(entries["above"])
+        self.below = ThresholdIndex(entries["below"])
+
+    def __len__(self) -> int:
+        return len(self.above) + len(self.below)
+
+    def crossed(self, price_yes: float) -> List[str]:
+        """Ids of the alerts whose condition holds at `price_yes`."""
+        return ([a for _, _, a in self.above.at_or_below(price_yes)]
+                + [a for _, _, a in self.below.at_or_above(price_yes)])
+
+
+def book(market_id: str) -> AlertBook:
+    """The market's committed armed alerts (cached per worker)."""
+    def load():
+        with market_conn(market_id) as c:
+            return AlertBook(c.execute(
+                """
+                SELECT rowid, id, direction, threshold
+                FROM alerts WHERE market_id=? AND status='armed'
+                """,
+                (market_id,),
+            ).fetchall())
+
+    return cache.cached(cache.ALERTS, market_id, load)
+
+
+def holds(direction: str, threshold: float, price_yes: float) -> bool:
+    return price_yes >= threshold if direction == "above" else price_yes <= threshold
+
+
+# --------------- firing (inside the writer's transaction) ---------------
+
+def fire(c: sqlite3.Connection, market_id: str, price_yes: float, now: str) -> int:
+    """Fire the market's alerts crossed by `price_yes`; returns how many fired."""
+    b = book(market_id)
+    if not len(b):
+        return 0
+    ids = b.crossed(price_yes)
+    if not ids:
+        return 0
+    fired = 0
+    for alert_id in ids:
+        seq = c.execute("INSERT INTO alert_seq DEFAULT VALUES").lastrowid
+        fired += c.execute(
+            """
+            UPDATE alerts SET status='fired', fired_at=?, fired_price=?, fired_seq=?
+            WHERE id=? AND status='armed'
+            """,
+            (now, price_yes, seq, alert_id),
+        ).rowcount
+    c.execute("DELETE FROM alert_seq")    # AUTOINCREMENT keeps the high-water mark
+    if fired:
+        cache.publish(c, cache.ALERTS, market_id)
+    return fired
+
+
+# --------------- create / cancel ---------------
+
+def create(c: sqlite3.Connection, market_id: str, username: str, direction: str,
+           threshold: float, now: str) -> str:
+    """Arm a new alert. Caller checks the market and the user's quota."""
+    alert_id = str(uuid.uuid4())
+    c.execute(
+        """
+        INSERT INTO alerts (id, market_id, username, direction, threshold, status, created_at)
+        VALUES (?, ?, ?, ?, ?, 'armed', ?)
+        """,
+        (alert_id, market_id, username, direction, threshold, now),
+    )
+    cache.publish(c, cache.ALERTS, market_id)
+    return alert_id
+
+
+def cancel(c: sqlite3.Connection, alert_id: str, username: str) -> bool:
+    """Disarm one of the user's armed alerts."""
+    a = c.execute(
+        "SELECT market_id FROM alerts WHERE id=? AND username=? AND status='armed'",
+        (alert_id, username),
+    ).fetchone()
+    if not a:
+        return False
+    c.execute("UPDATE alerts SET status='cancelled' WHERE id=?", (alert_id,))
+    cache.publish(c, cache.ALERTS, a["market_id"])
+    return True
+
+
+def alert_out(r: Any) -> Dict[str, Any]:
+    return {k: r[k] for k in ("id", "market_id", "direction", "threshold", "status",
+                              "created_at", "fired_at", "fired_price")}
@@ -0,0 +1,245 @@
+# backend/app/analytics.py
+# ------------------------------------------------------------
+# Materialized volume / activity rollups.
+# - record_bet() runs inside the bet transaction and bumps: global totals,
+#   per-market and per-user rows, and hourly + daily buckets. With market
+#   shards the halves run separately: record_bet_market on the market's
+#   shard, record_bet_user on the home DB.
+# - Unique-trader counts use small "seen" sets: the position row for
+#   per-market uniqueness (passed in by the caller) and
+#   stats_bucket_traders for time buckets.
+# - compact() drops the seen-sets of closed buckets. Their counts are
+#   final, so the table only holds recent buckets. It runs when the first
+#   trade of a new hour arrives.
+# - Readers never aggregate `bets`: every /admin/stats query is a primary
+#   key lookup or an index-ordered LIMIT.
+# - delete_market drops the market's row; user and time-bucket history
+#   keeps the activity that happened.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import datetime as dt, sqlite3
+from typing import Any, Dict, List, Optional
+
+GRANULARITIES = {"hour": 13, "day": 10}   # ISO prefix length per bucket
+KEEP_TRADER_SETS = {"hour": dt.timedelta(hours=2), "day": dt.timedelta(days=2)}
+
+
+def _bucket(ts_iso: str, granularity: str) -> str:
+    return ts_iso[:GRANULARITIES[granularity]]
+
+
+# --------------- incremental hook (call inside the bet txn) ---------------
+
+def record_bet(c: sqlite3.Connection, market_id: str, username: str, side: str,
+               spend_cents: int, now_iso: str, new_trader: bool) -> None:
+    """Fold one trade into every rollup. `new_trader`: first trade of this user in this market."""
+    record_bet_market(c, market_id, side, spend_cents, now_iso, new_trader)
+    record_bet_user(c, username, spend_cents, now_iso, new_trader)
+
+
+def record_bet_market(c: sqlite3.Connection, market_id: str, side: str,
+                      spend_cents: int, now_iso: str, new_trader: bool) -> None:
+    """stats_markets half of record_bet (runs on the market's shard)."""
+    yes = spend_cents if side == "YES" else 0
+    no = spend_cents if side == "NO" else 0
+
+    c.execute(
+        """
+        INSERT INTO stats_markets
+          (market_id, volume_cents, yes_volume_cents, no_volume_cents,
+           trade_count, trader_count, first_trade_at, last_trade_at)
+        VALUES (?, ?, ?, ?, 1, ?, ?, ?)
+        ON CONFLICT(market_id) DO UPDATE SET
+          volume_cents     = volume_cents + excluded.volume_cents,
+          yes_volume_cents = yes_volume_cents + excluded.yes_volume_cents,
+          no_volume_cents  = no_volume_cents + excluded.no_volume_cents,
+          trade_count      = trade_count + 1,
+          trader_count     = trader_count + excluded.trader_count,
+          last_trade_at    = excluded.last_trade_at
+        """,
+        (market_id, spend_cents, yes, no, int(new_trader), now_iso, now_iso),
+    )
+
+
+def record_bet_user(c: sqlite3.Connection, username: str, spend_cents: int,
+                    now_iso: str, new_trader: bool) -> None:
+    """User, total and time-bucket half of record_bet (runs on the home DB)."""
+    new_user = c.execute(
+        "INSERT OR IGNORE INTO stats_users (username) VALUES (?)", (username,)
+    ).rowcount == 1
+    c.execute(
+        """
+        UPDATE stats_users
+           SET volume_cents = volume_cents + ?, trade_count = trade_count + 1,
+               market_count = market_count + ?, last_trade_at = ?
+         WHERE username=?
+        """,
+        (spend_cents, int(new_trader), now_iso, username),
+    )
+
+    c.execute(
+        """
+        UPDATE stats_totals
+           SET volume_cents = volume_cents + ?, trade_count = trade_count + 1,
+               trader_count = trader_count + ?
+         WHERE id = 1
+        """,
+        (spend_cents, int(new_user)),
+    )
+
+    for gran in GRANULARITIES:
+        bucket = _bucket(now_iso, gran)
+        seen_first = c.execute(
+            "INSERT OR IGNORE INTO stats_bucket_traders (granularity, bucket, username) VALUES (?, ?, ?)",
+            (gran, bucket, username),
+        ).rowcount == 1
+        opened = c.execute(
+            "INSERT OR IGNORE INTO stats_buckets (granularity, bucket) VALUES (?, ?)",
+            (gran, bucket),
+        ).rowcount == 1
+        c.execute(
+            """
+            UPDATE stats_buckets
+               SET volume_cents = volume_cents + ?, trade_count = trade_count + 1,
+                   trader_count = trader_count + ?
+             WHERE granularity=? AND bucket=?
+            """,
+            (spend_cents, int(seen_first), gran, bucket),
+        )
+        if opened and gran == "hour":
+            compact(c, now_iso)
+
+
+def compact(c: sqlite3.Connection, now_iso: Optional[str] = None) -> int:
+    """Drop unique-trader sets of buckets that can no longer receive trades."""
+    now = dt.datetime.fromisoformat(now_iso) if now_iso else dt.datetime.utcnow()
+    removed = 0
+    for gran, keep in KEEP_TRADER_SETS.items():
+        cutoff = _bucket((now - keep).isoformat(), gran)
+        removed += c.execute(
+            "DELETE FROM stats_bucket_traders WHERE granularity=? AND bucket < ?",
+            (gran, cutoff),
+        ).rowcount
+    return removed
+
+
+def forget_market(c: sqlite3.Connection, market_id: str) -> None:
+    c.execute("DELETE FROM stats_markets WHERE market_id=?", (market_id,))
+
+
+# --------------- reads ---------------
+
+def _points(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+    """Row -> dict with *_cents columns converted to *_points."""
+    if row is None:
+        return None
+    out: Dict[str, Any] = {}
+    for k in row.keys():
+        if k.endswith("_cents"):
+            out[k[:-6] + "_points"] = row[k] / 100.0
+        else:
+            out[k] = row[k]
+    return out
+
+
+def totals(c: sqlite3.Connection) -> Dict[str, Any]:
+    row = c.execute(
+        "SELECT volume_cents, trade_count, trader_count FROM stats_totals WHERE id=1"
+    ).fetchone()
+    return _points(row) or {"volume_points": 0.0, "trade_count": 0, "trader_count": 0}
+
+
+def market(c: sqlite3.Connection, market_id: str) -> Optional[Dict[str, Any]]:
+    return _points(c.execute("SELECT * FROM stats_markets WHERE market_id=?", (market_id,)).fetchone())
+
+
+def user(c: sqlite3.Connection, username: str) -> Optional[Dict[str, Any]]:
+    return _points(c.execute("SELECT * FROM stats_users WHERE username=?", (username,)).fetchone())
+
+
+def top_markets(c: sqlite3.Connection, by: str, limit: int) -> List[Dict[str, Any]]:
+    col = {"volume": "volume_cents", "trades": "trade_count"}[by]
+    rows = c.execute(
+        f"""
+        SELECT s.*, m.question FROM stats_markets s
+        LEFT JOIN markets m ON m.id = s.market_id
+        ORDER BY s.{col} DESC LIMIT ?
+        """,
+        (limit,),
+    ).fetchall()
+    return [_points(r) for r in rows]
+
+
+def top_users(c: sqlite3.Connection, limit: int) -> List[Dict[str, Any]]:
+    rows = c.execute(
+        "SELECT * FROM stats_users ORDER BY volume_cents DESC LIMIT ?", (limit,)
+    ).fetchall()
+    return [_points(r) for r in rows]
+
+
+def series(c: sqlite3.Connection, granularity: str, limit: int) -> List[Dict[str, Any]]:
+    """Most recent `limit` buckets, oldest first."""
+    rows = c.execute(
+        """
+        SELECT bucket, volume_cents, trade_count, trader_count FROM stats_buckets
+        WHERE granularity=? ORDER BY bucket DESC LIMIT ?
+        """,
+        (granularity, limit),
+    ).fetchall()
+    return [_points(r) for r in reversed(rows)]
+
+
+# --------------- backfill ---------------
+
+def rebuild(c: sqlite3.Connection) -> Dict[str, int]:
+    """Recompute every rollup from the bets ledger (one-off, full scan)."""
+    for t in ("stats_markets", "stats_users", "stats_buckets", "stats_bucket_traders"):
+        c.execute(f"DELETE FROM {t}")
+    c.execute(
+        """
+        INSERT INTO stats_markets
+          (market_id, volume_cents, yes_volume_cents, no_volume_cents,
+           trade_count, trader_count, first_trade_at, last_trade_at)
+        SELECT market_id, SUM(amount_cents),
+               SUM(CASE WHEN side='YES' THEN amount_cents ELSE 0 END),
+               SUM(CASE WHEN side='NO'  THEN amount_cents ELSE 0 END),
+               COUNT(*), COUNT(DISTINCT username), MIN(created_at), MAX(created_at)
+        FROM bets GROUP BY market_id
+        """
+    )
+    c.execute(
+        """
+        INSERT INTO stats_users (username, volume_cents, trade_count, market_count, last_trade_at)
+        SELECT username, SUM(amount_cents), COUNT(*), COUNT(DISTINCT market_id), MAX(created_at)
+        FROM bets GROUP BY username
+        """
+    )
+    for gran, n in GRANULARITIES.items():
+        c.execute(
+            f"""
+            INSERT INTO stats_buckets (granularity, bucket, volume_cents, trade_count, trader_count)
+            SELECT ?, substr(created_at, 1, {n}), SUM(amount_cents), COUNT(*), COUNT(DISTINCT username)
+            FROM bets GROUP BY substr(created_at, 1, {n})
+            """,
+            (gran,),
+        )
+        c.execute(
+            f"""
+            INSERT INTO stats_bucket_traders (granularity, bucket, username)
+            SELECT DISTINCT ?, substr(created_at, 1, {n}), username FROM bets
+            """,
+            (gran,),
+        )
+    c.execute(
+        """
+        INSERT OR REPLACE INTO stats_totals (id, volume_cents, trade_count, trader_count)
+        SELECT 1, COALESCE(SUM(volume_cents), 0), COALESCE(SUM(trade_count), 0), COUNT(*)
+        FROM stats_users
+        """
+    )
+    compact(c)
+    return {
+        "markets": c.execute("SELECT COUNT(*) FROM stats_markets").fetchone()[0],
+        "users": c.execute("SELECT COUNT(*) FROM stats_users").fetchone()[0],
+    }
@@ -0,0 +1,131 @@
+# backend/app/archive.py
+# ------------------------------------------------------------
+# Hot/cold tiering: settled markets move to a separate SQLite file.
+# - The archive (db.archive_path()) is ATTACHed as schema `archive` and
+#   has the same tables as the hot DB: markets, bets, positions and the
+#   multi-outcome market_outcomes / outcome_positions.
+# - archive_settled() moves settled markets in batches. Each batch is one
+#   short transaction across both files: copy rows, delete them from the
+#   hot DB. The hot tables and their indexes shrink, so the page cache
+#   only has to hold live markets.
+# - Readers opt in with include_archive: union_sql() returns the query
+#   run once against `main` and once against `archive`, joined with
+#   UNION ALL.
+# - With market shards every shard file has its own archive next to it
+#   (db.archive_path of the shard) and archive_settled() visits each.
+# - Rollups are left alone. stats_* keep the history and recon_users
+#   keeps the spend; reconcile re-sums both tiers when the archive is
+#   attached.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import datetime as dt, os, sqlite3
+from typing import Any, Dict, Optional, Sequence, Tuple
+from . import cache, db
+
+SCHEMA = "archive"
+TABLES = ("markets", "bets", "positions", "market_outcomes", "outcome_positions")
+
+
+def is_attached(c: sqlite3.Connection) -> bool:
+    return any(r[1] == SCHEMA for r in c.execute("PRAGMA database_list"))
+
+
+def _path(c: sqlite3.Connection) -> str:
+    main_file = next(r[2] for r in c.execute("PRAGMA database_list") if r[1] == "main")
+    return db.archive_path(main_file)
+
+
+def exists(c: sqlite3.Connection) -> bool:
+    """Whether the database of `c` has an archive file (attached or not)."""
+    return is_attached(c) or os.path.exists(_path(c))
+
+
+def attach(c: sqlite3.Connection, create: bool = False) -> bool:
+    """ATTACH the archive file. Returns False if it doesn't exist (and not create)."""
+    if is_attached(c):
+        return True
+    path = _path(c)
+    if not create and not os.path.exists(path):
+        return False
+    c.execute(f"ATTACH DATABASE ? AS {SCHEMA}", (path,))
+    if create:
+        db.clone_schema(c, SCHEMA, TABLES)
+    return True
+
+
+def union_sql(template: str, attached: bool) -> Tuple[str, int]:
+    """
+    `template` uses {db} for the schema name, e.g.
+    "SELECT ... FROM {db}.bets b LEFT JOIN {db}.markets m ON ...".
+    Returns (sql, number of parts) so callers can repeat parameters.
+    """
+    parts = [template.format(db="main")]
+    if attached:
+        parts.append(template.format(db=SCHEMA))
+    return "\nUNION ALL\n".join(parts), len(parts)
+
+
+def _move(c: sqlite3.Connection, table: str, key: str, ids: Sequence[str]) -> int:
+    cols = ", ".join(db.columns(c, table))
+    q = ",".join("?" * len(ids))
+    c.execute(
+        f"INSERT OR REPLACE INTO {SCHEMA}.{table} ({cols}) SELECT {cols} FROM main.{table} WHERE {key} IN ({q})",
+        tuple(ids),
+    )
+    return c.execute(f"DELETE FROM main.{table} WHERE {key} IN ({q})", tuple(ids)).rowcount
+
+
+def archive_batch(c: sqlite3.Connection, batch_markets: int, closed_before: Optional[str] = None) -> Dict[str, int]:
+    """
+    Move up to `batch_markets` settled markets and their rows. Call inside a
+    txn. `closed_before` (ISO) keeps recently closing markets hot; it is
+    compared in closes_at's stored form (db.db_time), not as typed.
+    """
+    where, args = "settled=1", []
+    if closed_before:
+        where += " AND closes_at < ?"
+        args.append(db.db_time(dt.datetime.fromisoformat(closed_before)))
+    ids = [r[0] for r in c.execute(
+        f"SELECT id FROM main.markets WHERE {where} LIMIT ?", (*args, batch_markets)
+    )]
+    if not ids:
+        return {"markets": 0, "bets": 0, "positions": 0, "outcomes": 0}
+    moved = {
+        "bets": _move(c, "bets", "market_id", ids),
+        "positions": _move(c, "positions", "market_id", ids)
+                     + _move(c, "outcome_positions", "market_id", ids),
+        "outcomes": _move(c, "market_outcomes", "market_id", ids),
+        "markets": _move(c, "markets", "id", ids),
+    }
+    q = ",".join("?" * len(ids))
+    c.execute(f"DELETE FROM main.recon_markets WHERE market_id IN ({q})", tuple(ids))
+    for mid in ids:
+        cache.publish_market(c, mid)
+    return moved
+
+
+def archive_settled(batch_markets: int = 100, max_batches: Optional[int] = None,
+                    closed_before: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Archive settled markets batch by batch until none are left (or
+    max_batches, counted over all shards).
+    """
+    totals = {"markets": 0, "bets": 0, "positions": 0, "outcomes": 0, "batches": 0}
+    for shard in db.market_shards():
+        while max_batches is None or totals["batches"] < max_batches:
+            with db.market_conn(shard=shard) as c:
+                attach(c, create=True)
+                c.execute("BEGIN IMMEDIATE")
+                try:
+                    moved = archive_batch(c, batch_markets, closed_before)
+                    c.execute("COMMIT")
+                except Exception:
+                    c.execute("ROLLBACK")
+                    raise
+            if not moved["markets"]:
+                break
+            totals["batches"] += 1
+            for k, v in moved.items():
+                totals[k] += v
+    return totals
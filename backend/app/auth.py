@@ -1,11 +1,20 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
-from jose import jwt  # use python-jose
-from passlib.hash import bcrypt
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from .db import conn
 
+# The crypto stack (python-jose, passlib/bcrypt) is imported on first use:
+# scripts that only need the DB don't load it, and the API loads it in
+# warm() at startup (app/boot.py) instead of on the first request.
+def _jwt():
+    from jose import jwt  # use python-jose
+    return jwt
+
+def _bcrypt():
+    from passlib.hash import bcrypt
+    return bcrypt
+
 JWT_SECRET = "dev-secret-change-me"
 JWT_ALG = "HS256"
 JWT_EXP_MIN = 60 * 24 * 7  # 7 days
@@ -13,22 +22,31 @@ JWT_EXP_MIN = 60 * 24 * 7  # 7 days
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 def hash_password(pw: str) -> str:
-    return bcrypt.hash(pw)
+    return _bcrypt().hash(pw)
 
 def verify_password(pw: str, hashed: str) -> bool:
-    return bcrypt.verify(pw, hashed)
+    return _bcrypt().verify(pw, hashed)
 
 def create_token(username: str) -> str:
     exp_ts = int((datetime.now(timezone.utc) + timedelta(minutes=JWT_EXP_MIN)).timestamp())
     payload = {"sub": username, "exp": exp_ts}
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
+    return _jwt().encode(payload, JWT_SECRET, algorithm=JWT_ALG)
+
+def decode_token(token: str) -> dict:
+    """Verified payload of a token; raises (jose's JWTError) if invalid or expired."""
+    return _jwt().decode(token, JWT_SECRET, algorithms=[JWT_ALG])
 
 def get_current_username(token: str = Depends(oauth2_scheme)) -> str:
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        payload = decode_token(token)
         username = payload.get("sub")
     except Exception:
         raise HTTPException(401, "Invalid token")
     if not username:
         raise HTTPException(401, "Invalid token")
-    return username  # <-- no DB lookup here
\ No newline at end of file
+    return username  # <-- no DB lookup here
+
+def warm() -> None:
+    """Import the crypto stack and run one token round trip and the bcrypt backend self-test."""
+    decode_token(create_token("warmup"))
+    _bcrypt().get_backend()
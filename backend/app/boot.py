@@ -0,0 +1,87 @@
+# backend/app/boot.py
+# ------------------------------------------------------------
+# Worker startup: checks and warm-ups the app's lifespan (main.py) runs
+# once per process, before the worker accepts requests.
+# - Every step is timed. The breakdown (import time of the app included)
+#   is logged and served at GET /health/boot; a boot over BOOT_BUDGET_MS
+#   is logged as a warning.
+# - check_schema fails the boot when the home DB lacks a table (a
+#   migration wasn't applied), instead of the first request that needs
+#   it, and brings every shard file's schema up to date.
+# - The warm-ups move first-request costs into the boot: the shard files
+#   and the cache's watcher connections (first connection setup, page
+#   cache), the market lists clients poll first, the JWT / bcrypt stack
+#   (auth.py imports it lazily; the bcrypt backend self-test alone is a
+#   few hundred ms), and the OpenAPI schema, which builds every response
+#   model's JSON schema. BOOT_WARM=0 skips them.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import logging, time
+from contextlib import contextmanager
+from typing import Any, Dict
+from . import auth, cache, db
+from .config import BOOT_BUDGET_MS
+
+log = logging.getLogger("uvicorn.error")
+
+
+class Boot:
+    """Timings of one worker's startup, in ms per step."""
+
+    def __init__(self, import_ms: float):
+        self.steps: Dict[str, float] = {"import": round(import_ms, 1)}
+
+    @contextmanager
+    def step(self, name: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = round((time.perf_counter() - t) * 1000, 1)
+
+    def report(self) -> Dict[str, Any]:
+        total = round(sum(self.steps.values()), 1)
+        out = {"steps_ms": self.steps, "total_ms": total, "budget_ms": BOOT_BUDGET_MS,
+               "within_budget": total <= BOOT_BUDGET_MS}
+        breakdown = ", ".join(f"{k} {v:.0f}" for k, v in self.steps.items())
+        if out["within_budget"]:
+            log.info("boot %.0f ms (%s)", total, breakdown)
+        else:
+            log.warning("boot %.0f ms over the %.0f ms budget (%s)", total, BOOT_BUDGET_MS, breakdown)
+        return out
+
+
+# --------------- steps ---------------
+
+def check_schema() -> None:
+    with db.conn() as c:
+        have = {r[0] for r in c.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    missing = sorted(set(db.HOME_TABLES + db.SHARD_TABLES) - have)
+    if missing:
+        raise RuntimeError(
+            f"{db.DB_PATH} has no table(s) {', '.join(missing)}: apply app/migrations first"
+        )
+    for k in db.market_shards():
+        db.ensure_shard(k)
+
+
+def warm_db() -> None:
+    for k in db.market_shards():
+        with db.market_conn(shard=k) as c:
+            c.execute("SELECT COUNT(*) FROM markets").fetchone()
+    cache.sync()    # opens one watcher connection per shard
+
+
+def warm_cache() -> None:
+    from .routers import markets
+    for key in (None, "open"):
+        markets.cached_list(key)
+
+
+def warm_auth() -> None:
+    auth.warm()
+
+
+def warm_serializers(app) -> None:
+    app.openapi()
@@ -0,0 +1,149 @@
+# backend/app/cache.py
+# ------------------------------------------------------------
+# Process-local read caches that stay coherent across workers.
+# - Each uvicorn/gunicorn worker keeps its own dict of cached values.
+# - Writers call publish(c, topic, key) *inside* their transaction, so the
+#   change_log row commits or rolls back together with the data.
+# - Readers go through cached(); it first calls sync(), which asks a
+#   dedicated watcher connection for PRAGMA data_version. That value only
+#   changes when another connection has committed, so the steady-state
+#   cost of a cache hit is one cheap pragma (no table read).
+# - No broker: the SQLite file itself is the broadcast channel. With
+#   market shards each file has its own change_log (writers publish into
+#   the file they write) and a watcher of its own; the version is the sum
+#   of the per-shard sequence numbers.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import os, sqlite3, threading
+from typing import Any, Callable, Dict, Optional
+from . import db
+
+# Topics
+MARKET = "market"            # key = market_id -> assembled market dict
+MARKET_LIST = "market_list"  # key = status filter -> list of market dicts
+OUTCOMES = "outcomes"        # key = market_id -> multi-outcome market dict
+ORDERBOOK = "orderbook"      # key = market_id -> resting limit orders (orders.Book)
+ALERTS = "alerts"            # key = market_id -> armed price alerts (alerts.AlertBook)
+POSITIONS = "positions"      # key = market_id -> holders (positions.Holders)
+
+# Invalidating (topic, key) also drops the same key here, so writers only
+# publish MARKET whatever kind of market changed.
+_DEPENDENTS = {MARKET: (OUTCOMES, POSITIONS)}
+
+KEEP_ROWS = 10_000      # change_log rows kept for workers that lag behind
+TRIM_EVERY = 1_000      # trim when seq hits a multiple of this
+MAX_ENTRIES = 50_000    # per-topic cap; a full topic is simply cleared
+
+_MISS = object()
+_lock = threading.RLock()
+_store: Dict[str, Dict[Any, Any]] = {}
+_watchers: Dict[int, sqlite3.Connection] = {}    # shard -> watcher connection
+_pid: Optional[int] = None
+_data_versions: Dict[int, int] = {}
+_last_seqs: Dict[int, int] = {}
+
+
+# --------------- invalidation feed ---------------
+
+def publish(c: sqlite3.Connection, topic: str, key: Optional[str] = None) -> None:
+    """Record that (topic, key) changed. Call inside the writer's transaction."""
+    cur = c.execute(
+        "INSERT INTO change_log (topic, key) VALUES (?, ?)",
+        (topic, key),
+    )
+    seq = cur.lastrowid or 0
+    if seq % TRIM_EVERY == 0:
+        c.execute("DELETE FROM change_log WHERE seq <= ?", (seq - KEEP_ROWS,))
+
+
+def publish_market(c: sqlite3.Connection, market_id: str) -> None:
+    """A market's row changed: drop it and every cached market list."""
+    publish(c, MARKET, market_id)
+    publish(c, MARKET_LIST)
+
+
+def _watch(shard: int) -> sqlite3.Connection:
+    global _pid
+    if _pid != os.getpid():
+        # First use in this process (or we were forked): drop inherited
+        # watchers and the cache; start from the current heads.
+        _watchers.clear()
+        _data_versions.clear()
+        _last_seqs.clear()
+        _store.clear()
+        _pid = os.getpid()
+    w = _watchers.get(shard)
+    if w is None:
+        db.ensure_shard(shard)
+        w = _watchers[shard] = sqlite3.connect(db.shard_path(shard), check_same_thread=False)
+        row = w.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()
+        _last_seqs[shard] = row[0]
+    return w
+
+
+def _sync_shard(shard: int) -> None:
+    w = _watch(shard)
+    dv = w.execute("PRAGMA data_version").fetchone()[0]
+    if dv == _data_versions.get(shard):
+        return
+    _data_versions[shard] = dv
+    last = _last_seqs[shard]
+    rows = w.execute(
+        "SELECT seq, topic, key FROM change_log WHERE seq > ? ORDER BY seq",
+        (last,),
+    ).fetchall()
+    if not rows:
+        return
+    if rows[0][0] != last + 1:
+        # We missed rows that have been trimmed away: drop everything.
+        _store.clear()
+    else:
+        for _, topic, key in rows:
+            invalidate(topic, key)
+    _last_seqs[shard] = rows[-1][0]
+
+
+def sync() -> int:
+    """Apply invalidations committed by any connection; return the seen seq."""
+    with _lock:
+        for shard in db.market_shards():
+            _sync_shard(shard)
+        return sum(_last_seqs.values())
+
+
+def version() -> int:
+    """Current data version as seen by this worker (monotonic)."""
+    return sync()
+
+
+# --------------- local store ---------------
+
+def invalidate(topic: str, key: Optional[str] = None) -> None:
+    with _lock:
+        for t in (topic, *_DEPENDENTS.get(topic, ())):
+            if key is None:
+                _store.pop(t, None)
+            else:
+                _store.get(t, {}).pop(key, None)
+
+
+def cached(topic: str, key: Any, load: Callable[[], Any]) -> Any:
+    """
+    Return the cached value for (topic, key), or compute it with load().
+    The value is only stored if no invalidation arrived while load() ran,
+    so a slow reader can never park a stale value in the cache.
+    """
+    seq = sync()
+    with _lock:
+        hit = _store.get(topic, {}).get(key, _MISS)
+    if hit is not _MISS:
+        return hit
+    value = load()
+    with _lock:
+        if sync() == seq:
+            bucket = _store.setdefault(topic, {})
+            if len(bucket) >= MAX_ENTRIES:
+                bucket.clear()
+            bucket[key] = value
+    return value
@@ -1,6 +1,64 @@
-import os
-from dotenv import load_dotenv
+import logging, os
+
+# ENV_FILE if set, else backend/.env, else the repo root's .env (where
+# .env.example ships). Explicit paths instead of load_dotenv()'s directory
+# search; python-dotenv is only imported when a file is found.
+_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_ENV_CANDIDATES = (
+    [os.environ["ENV_FILE"]] if os.getenv("ENV_FILE")
+    else [os.path.join(_BACKEND, ".env"), os.path.join(os.path.dirname(_BACKEND), ".env")]
+)
+ENV_FILE = next((p for p in _ENV_CANDIDATES if os.path.exists(p)), None)
+if ENV_FILE:
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
+else:
+    logging.getLogger("uvicorn.error").warning(
+        "no env file at %s: using the process environment and defaults", " or ".join(_ENV_CANDIDATES)
+    )
 
-load_dotenv()
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "rapewillsonneborn")
-DB_PATH = os.getenv("DB_PATH", "app.db")
\ No newline at end of file
+DB_PATH = os.getenv("DB_PATH", "app.db")
+
+# Responses smaller than this are sent uncompressed (gzip/brotli overhead dominates).
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+# How long a bet's Idempotency-Key is remembered (replays return the stored response).
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+
+# Token-bucket budgets per route class: "rate_per_sec,burst" (see app/ratelimit.py).
+RATE_LIMITS_ENABLED = os.getenv("RATE_LIMITS_ENABLED", "1") not in ("0", "false", "no")
+def _rate(name, default):
+    """Parse a "rate_per_sec,burst" budget; refuse to start on a bad one."""
+    raw = os.getenv(name, default)
+    try:
+        rate, burst = (float(x) for x in raw.split(","))
+    except ValueError:
+        raise ValueError(f'{name}={raw!r}: expected "rate_per_sec,burst", e.g. "{default}"') from None
+    if not rate > 0 or not burst >= 1:
+        raise ValueError(f"{name}={raw!r}: rate must be > 0 and burst >= 1")
+    return rate, burst
+
+RATE_READ  = _rate("RATE_READ",  "20,40")
+RATE_BET   = _rate("RATE_BET",   "5,10")
+RATE_ADMIN = _rate("RATE_ADMIN", "10,20")
+
+# Number of SQLite files markets are spread over (see app/db.py). 1 = everything in DB_PATH.
+SHARD_COUNT = max(1, int(os.getenv("SHARD_COUNT", "1")))
+# Cross-shard bets whose escrow is still held after this long are resolved by escrow.recover().
+ESCROW_RECOVER_AFTER_S = float(os.getenv("ESCROW_RECOVER_AFTER_S", "30"))
+# How often each worker runs that recovery while serving. 0 = only at startup.
+ESCROW_RECOVER_EVERY_S = float(os.getenv("ESCROW_RECOVER_EVERY_S", "10"))
+
+# Background jobs for heavy admin operations (see app/jobs.py).
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))          # worker threads per process; 0 = none
+JOB_CHUNK_ROWS = int(os.getenv("JOB_CHUNK_ROWS", "1000"))  # rows per job transaction
+
+# Read replica for reporting routes (see app/replica.py). 0 = disabled, reads use the live DB.
+REPLICA_REFRESH_S = float(os.getenv("REPLICA_REFRESH_S", "0"))
+# Reads fall back to the live DB when the replica is older than this.
+REPLICA_MAX_STALENESS_S = float(os.getenv("REPLICA_MAX_STALENESS_S", "120"))
+
+# Worker startup (see app/boot.py): warm-ups before serving, and the boot time budget.
+BOOT_WARM = os.getenv("BOOT_WARM", "1") not in ("0", "false", "no")
+BOOT_BUDGET_MS = float(os.getenv("BOOT_BUDGET_MS", "2000"))
@@ -1,11 +1,14 @@
-import os, sqlite3
-from contextlib import contextmanager
+import os, re, sqlite3, threading, time, urllib.parse, zlib
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from datetime import timezone
+from .config import REPLICA_MAX_STALENESS_S, REPLICA_REFRESH_S, SHARD_COUNT
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # .../backend/app
 DB_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "app.db"))
 
-def _connect():
-    conn = sqlite3.connect(DB_PATH)
+def _connect(path=None):
+    conn = sqlite3.connect(path or DB_PATH)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -16,4 +19,236 @@ def conn():
         yield c
         c.commit()
     finally:
-        c.close()
\ No newline at end of file
+        c.close()
+
+def connect_readonly(path=None):
+    """Read-only connection (mode=ro): can never take the write lock."""
+    uri = "file:" + urllib.parse.quote(os.path.abspath(path or DB_PATH)) + "?mode=ro"
+    c = sqlite3.connect(uri, uri=True)
+    c.row_factory = sqlite3.Row
+    return c
+
+def db_time(d):
+    """
+    A datetime as stored in TEXT timestamp columns like markets.closes_at:
+    ISO with a ' ' separator (what sqlite3's deprecated default adapter
+    wrote), aware values in UTC. Strings in this format sort in time order.
+    """
+    if d.tzinfo is not None:
+        d = d.astimezone(timezone.utc)
+    return d.isoformat(" ")
+
+REPLICA_SUFFIX = "_replica"
+
+def archive_path(path=None):
+    """
+    Cold-storage database for settled markets of `path` (see app/archive.py).
+    A replica reads its primary's archive: archived rows never change.
+    """
+    base = os.path.splitext(path or DB_PATH)[0]
+    if base.endswith(REPLICA_SUFFIX):
+        base = base[:-len(REPLICA_SUFFIX)]
+    return base + "_archive.db"
+
+# --------------- market shards ---------------
+# Markets (with their bets, positions, orders and per-market rollups) can be
+# spread over SHARD_COUNT files so writes to different markets commit in
+# parallel. Shard 0 is DB_PATH itself, which also holds everything per-user
+# (balances, user rollups, escrows) and market_directory. With SHARD_COUNT=1
+# nothing changes: every market is on shard 0.
+
+HOME_TABLES = ("users", "recon_users", "stats_users", "stats_totals", "stats_buckets",
+               "stats_bucket_traders", "market_directory", "escrows", "jobs", "job_payouts")
+SHARD_TABLES = ("markets", "markets_fts", "bets", "positions", "market_outcomes",
+                "outcome_positions", "orders", "recon_markets", "stats_markets",
+                "change_log", "idempotency_keys", "escrow_fills", "escrow_void", "alerts",
+                "alert_seq")
+MAX_DIRECTORY = 1_000_000   # cached market -> shard entries per process
+
+_shard_lock = threading.Lock()
+_ready = set()              # shard files whose schema was synced by this process
+_directory = {}
+
+def shard_path(k):
+    return DB_PATH if k == 0 else f"{os.path.splitext(DB_PATH)[0]}_shard{k}.db"
+
+def market_shards():
+    return range(SHARD_COUNT)
+
+def ensure_shard(k):
+    """Create (or bring up to date) a shard file's tables from the home schema."""
+    if k == 0 or k in _ready:
+        return
+    with _shard_lock:
+        if k in _ready:
+            return
+        # Write through the shard file, only read the home schema: this can
+        # run inside a request that holds the home write lock.
+        c = sqlite3.connect(shard_path(k))
+        try:
+            c.execute("ATTACH DATABASE ? AS home", (DB_PATH,))
+            c.execute("BEGIN")
+            clone_schema(c, "main", SHARD_TABLES, src="home", triggers=True)
+            c.execute("COMMIT")
+        finally:
+            c.close()
+        _ready.add(k)
+
+def new_market_shard(market_id):
+    """Shard for a market being created: stable hash of its id."""
+    return zlib.crc32(market_id.encode()) % SHARD_COUNT
+
+def register_market(c, market_id, k):
+    """Record a new market's shard. Call in the creating txn (home attached)."""
+    c.execute("INSERT INTO market_directory (market_id, shard) VALUES (?, ?)", (market_id, k))
+    if len(_directory) >= MAX_DIRECTORY:
+        _directory.clear()
+    _directory[market_id] = k
+
+def shard_of(market_id):
+    """Shard holding `market_id`. Unknown ids map to 0 (and 404 there)."""
+    if SHARD_COUNT == 1:
+        return 0
+    k = _directory.get(market_id)
+    if k is None:
+        with conn() as c:
+            r = c.execute("SELECT shard FROM market_directory WHERE market_id=?", (market_id,)).fetchone()
+        if r is None:
+            return 0    # created before sharding, or doesn't exist; not cached
+        k = r[0]
+        if len(_directory) >= MAX_DIRECTORY:
+            _directory.clear()
+        _directory[market_id] = k
+    return k
+
+@contextmanager
+def market_conn(market_id=None, shard=None, home=False):
+    """
+    Connection to the shard holding `market_id` (or shard number `shard`).
+    home=True also ATTACHes the home DB as `home` for shards other than 0:
+    shard files have no users / user rollup tables, so unqualified names
+    like `users` resolve there and one transaction can write both files.
+    That transaction holds both write locks; the hot path (place_bet)
+    avoids it with escrow.py instead.
+    """
+    k = shard if shard is not None else shard_of(market_id)
+    ensure_shard(k)
+    c = _connect(shard_path(k))
+    try:
+        if home and k != 0:
+            c.execute("ATTACH DATABASE ? AS home", (DB_PATH,))
+        yield c
+        c.commit()
+    finally:
+        c.close()
+
+def map_shards(fn, home=False, read=False):
+    """
+    fn(conn) on every shard in order; returns the list of results.
+    read=True uses read_conn (replica when fresh) instead of market_conn.
+    """
+    out = []
+    for k in market_shards():
+        with (read_conn(k) if read else market_conn(shard=k, home=home)) as c:
+            out.append(fn(c))
+    return out
+
+@contextmanager
+def shard_conns():
+    """All shard connections at once (shard order), for cross-shard checks."""
+    with ExitStack() as stack:
+        yield [stack.enter_context(market_conn(shard=k)) for k in market_shards()]
+
+# --------------- read replica ---------------
+# Reporting reads (admin lists, stats, exports, bet history) go through
+# read_conn(): a read-only copy of the shard kept by app/replica.py when it
+# is at most REPLICA_MAX_STALENESS_S old, else the live file. The replica's
+# mtime is the moment its copy started, so every process sees the same age.
+# The age actually served is collected per request (track_reads) and
+# reported in the X-Data-Age header.
+
+_read_ages: ContextVar = ContextVar("read_ages", default=None)
+
+def replica_path(k=0):
+    return os.path.splitext(shard_path(k))[0] + REPLICA_SUFFIX + ".db"
+
+def replica_age(k=0):
+    """Seconds since the replica's snapshot was taken, or None if there is none."""
+    try:
+        return max(0.0, time.time() - os.path.getmtime(replica_path(k)))
+    except OSError:
+        return None
+
+def read_path(k=0):
+    """(path, staleness in seconds) to read shard k from for reporting."""
+    if REPLICA_REFRESH_S > 0:
+        age = replica_age(k)
+        if age is not None and age <= REPLICA_MAX_STALENESS_S:
+            return replica_path(k), age
+    ensure_shard(k)
+    return shard_path(k), 0.0
+
+def track_reads():
+    """Start collecting this request's read staleness; returns the holder dict."""
+    holder = {}
+    _read_ages.set(holder)
+    return holder
+
+def note_read_age(age):
+    holder = _read_ages.get()
+    if holder is not None:
+        holder["age"] = max(holder.get("age", 0.0), age)
+
+@contextmanager
+def read_conn(k=0):
+    """Read-only connection to shard k for reporting (replica if fresh enough)."""
+    path, age = read_path(k)
+    note_read_age(age)
+    c = connect_readonly(path)
+    try:
+        yield c
+    finally:
+        c.close()
+
+_CREATE_RE = re.compile(
+    r'^CREATE\s+(UNIQUE\s+|VIRTUAL\s+)?(TABLE|INDEX|TRIGGER)\s+(IF\s+NOT\s+EXISTS\s+)?["`\[]?(\w+)["`\]]?', re.I)
+_CLONE_ORDER = {"table": 0, "index": 1, "trigger": 2}
+
+def clone_schema(c, schema, tables, src="main", triggers=False):
+    """
+    Create `tables` (and their indexes, and with triggers=True their
+    triggers) in attached database `schema` with the same definitions as in
+    `src`, then add any columns the copy is missing (tables created before a
+    later ALTER TABLE in `src`). Virtual tables (FTS) are copied as well;
+    their shadow tables are created by SQLite.
+    """
+    q = ",".join("?" * len(tables))
+    kinds = "'table','index','trigger'" if triggers else "'table','index'"
+    rows = c.execute(
+        f"SELECT type, name, tbl_name, sql FROM {src}.sqlite_master "
+        f"WHERE type IN ({kinds}) AND tbl_name IN ({q}) AND sql IS NOT NULL",
+        tuple(tables),
+    ).fetchall()
+    # tables before their indexes, triggers last (they may reference other tables)
+    for r in sorted(rows, key=lambda r: _CLONE_ORDER[r[0]]):
+        sql = _CREATE_RE.sub(
+            lambda m: f"CREATE {m.group(1) or ''}{m.group(2)} IF NOT EXISTS {schema}.{m.group(4)}",
+            r[3], count=1,
+        )
+        c.execute(sql)
+    virtual = {r[2] for r in rows if r[0] == "table" and r[3].upper().startswith("CREATE VIRTUAL")}
+    for t in tables:
+        if t in virtual:
+            continue
+        have = {x[1] for x in c.execute(f"PRAGMA {schema}.table_info({t})")}
+        for col in c.execute(f"PRAGMA {src}.table_info({t})").fetchall():
+            if col[1] not in have:
+                decl = f"{col[1]} {col[2]}"
+                if col[3] and col[4] is not None:
+                    decl += f" NOT NULL DEFAULT {col[4]}"
+                elif col[4] is not None:
+                    decl += f" DEFAULT {col[4]}"
+                c.execute(f"ALTER TABLE {schema}.{t} ADD COLUMN {decl}")
+
+def columns(c, table, schema="main"):
+    return [x[1] for x in c.execute(f"PRAGMA {schema}.table_info({table})")]
\ No newline at end of file
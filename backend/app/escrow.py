@@ -0,0 +1,158 @@
+# backend/app/escrow.py
+# ------------------------------------------------------------
+# Bets on a market that lives on another shard than the user's balance.
+# SQLite can only commit one file atomically without holding both write
+# locks, so place_bet splits the trade into three short transactions:
+#   1. home:  hold()     debit the balance, insert escrows row 'held'
+#   2. shard: fill the market side, write escrow_fills (outbox) rows;
+#             refuses if escrow_void has the id
+#   3. home:  finalize() mark 'spent', apply the user-side rollups from
+#             the fills (or refund() if step 2 failed)
+# Step 2 is where the market's write lock is taken, so bets on markets of
+# different shards only contend on the two tiny home transactions.
+# - A crash between steps leaves a 'held' escrow. recover() resolves those
+#   older than ESCROW_RECOVER_AFTER_S from the shard's outbox: fills
+#   present -> finalize; none -> void it on the shard (a late step 2 then
+#   aborts) and refund. It runs at startup and then every
+#   ESCROW_RECOVER_EVERY_S on a daemon thread, so a hold whose finalize
+#   failed is settled while the process keeps serving.
+# - 'held' -> 'spent' / 'refunded' is a guarded UPDATE, so the request
+#   and recovery can race and only one of them applies the outcome.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import datetime as dt, sqlite3, threading
+from typing import Any, Dict, List, Optional
+from . import db, trading
+from .config import ESCROW_RECOVER_AFTER_S, ESCROW_RECOVER_EVERY_S
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+# --------------- home side (users DB) ---------------
+
+def hold(h: sqlite3.Connection, escrow_id: str, username: str, market_id: str,
+         shard: int, amount_cents: int, now: str) -> None:
+    """Take `amount_cents` from the user into escrow. Caller checked the balance."""
+    h.execute(
+        "UPDATE users SET balance_cents = balance_cents - ? WHERE username=?",
+        (amount_cents, username),
+    )
+    h.execute(
+        """
+        INSERT INTO escrows (id, username, market_id, shard, amount_cents, status, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, 'held', ?, ?)
+        """,
+        (escrow_id, username, market_id, shard, amount_cents, now, now),
+    )
+
+
+def finalize(h: sqlite3.Connection, escrow_id: str, fills: List[Dict[str, Any]], now: str) -> bool:
+    """The shard filled the escrow: apply user rollups once. False if already resolved."""
+    if h.execute(
+        "UPDATE escrows SET status='spent', updated_at=? WHERE id=? AND status='held'",
+        (now, escrow_id),
+    ).rowcount == 0:
+        return False
+    trading.record_users(h, fills)
+    return True
+
+
+def refund(h: sqlite3.Connection, escrow_id: str, now: str) -> bool:
+    """Return a held escrow to its owner. False if already resolved."""
+    e = h.execute(
+        "SELECT username, amount_cents FROM escrows WHERE id=? AND status='held'", (escrow_id,)
+    ).fetchone()
+    if not e:
+        return False
+    h.execute("UPDATE escrows SET status='refunded', updated_at=? WHERE id=?", (now, escrow_id))
+    h.execute(
+        "UPDATE users SET balance_cents = balance_cents + ? WHERE username=?",
+        (e["amount_cents"], e["username"]),
+    )
+    return True
+
+
+# --------------- shard side (market DB) ---------------
+
+def voided(s: sqlite3.Connection, escrow_id: str) -> bool:
+    return s.execute("SELECT 1 FROM escrow_void WHERE escrow_id=?", (escrow_id,)).fetchone() is not None
+
+
+def record_fills(s: sqlite3.Connection, escrow_id: str, fills: List[Dict[str, Any]]) -> None:
+    """Outbox rows for finalize(); written in the same txn as the fills."""
+    s.executemany(
+        """
+        INSERT INTO escrow_fills (escrow_id, bet_id, username, side, amount_cents, new_trader, created_at)
+        VALUES (:escrow_id, :bet_id, :username, :side, :amount_cents, :new_trader, :created_at)
+        """,
+        [{**f, "escrow_id": escrow_id} for f in fills],
+    )
+
+
+def _fills(s: sqlite3.Connection, escrow_id: str) -> List[Dict[str, Any]]:
+    return [dict(r) for r in s.execute(
+        """
+        SELECT bet_id, username, side, amount_cents, new_trader, created_at
+        FROM escrow_fills WHERE escrow_id=?
+        """,
+        (escrow_id,),
+    )]
+
+
+# --------------- recovery ---------------
+
+def recover(min_age_s: float = ESCROW_RECOVER_AFTER_S) -> Dict[str, int]:
+    """Resolve escrows left 'held' by a crashed or timed-out request."""
+    now = dt.datetime.utcnow()
+    cutoff = (now - dt.timedelta(seconds=min_age_s)).isoformat()
+    with db.conn() as h:
+        stuck = h.execute(
+            "SELECT id, shard FROM escrows WHERE status='held' AND created_at < ? ORDER BY created_at",
+            (cutoff,),
+        ).fetchall()
+
+    done = {"finalized": 0, "refunded": 0}
+    for e in stuck:
+        with db.market_conn(shard=e["shard"]) as s:
+            s.execute("BEGIN IMMEDIATE")
+            fills = _fills(s, e["id"])
+            if not fills:
+                s.execute("INSERT OR IGNORE INTO escrow_void (escrow_id, created_at) VALUES (?, ?)",
+                          (e["id"], now.isoformat()))
+            s.execute("COMMIT")
+        with db.conn() as h:
+            h.execute("BEGIN IMMEDIATE")
+            if fills and finalize(h, e["id"], fills, now.isoformat()):
+                done["finalized"] += 1
+            elif not fills and refund(h, e["id"], now.isoformat()):
+                done["refunded"] += 1
+            h.execute("COMMIT")
+    return done
+
+
+def _loop() -> None:
+    while not _stop.wait(ESCROW_RECOVER_EVERY_S):
+        try:
+            recover(ESCROW_RECOVER_AFTER_S)
+        except sqlite3.Error:
+            pass   # e.g. a shard busy past the timeout; the next tick retries
+
+
+def start() -> None:
+    """Start periodic recovery (app startup) when ESCROW_RECOVER_EVERY_S > 0."""
+    global _thread
+    if ESCROW_RECOVER_EVERY_S <= 0 or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="escrow-recover", daemon=True)
+    _thread.start()
+
+
+def stop(timeout: float = 10.0) -> None:
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout)
+        _thread = None
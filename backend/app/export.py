@@ -0,0 +1,212 @@
+# backend/app/export.py
+# ------------------------------------------------------------
+# Streaming, constant-memory export of ledger tables.
+# - Rows are read in keyset-paginated chunks, each on a read-only
+#   connection in its own short read transaction. The export never holds
+#   the write lock, and never keeps a read snapshot open across chunks,
+#   so place_bet keeps committing while a large export runs.
+# - Incremental exports resume from a watermark: the key of the last
+#   exported row, (created_at, id) for bets/positions and rowid for
+#   markets/users. Only rows strictly after it are returned. Writers stamp
+#   created_at after taking the write lock, so within one file a row can't
+#   commit behind a newer watermark.
+# - Writers: chunked CSV (stdlib) and Parquet (optional `pyarrow`, one
+#   row group per chunk).
+# - With market shards, bets/positions/markets are read from every shard
+#   and merged in key order (heapq.merge over the per-shard streams).
+#   rowids are per file, so a sharded markets export is always full.
+#   Shards commit independently, so a bet stamped on one shard can commit
+#   just after a later one on another: merged bets/positions stop at
+#   SHARD_SETTLE_S before now, and the next run picks up the rest.
+# - The admin route reads the read replica (app/replica.py) when fresh.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import csv, datetime as dt, heapq, io, itertools, os
+from typing import Any, Dict, IO, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from . import db
+from .db import connect_readonly
+
+CHUNK_ROWS = 10_000
+SHARD_SETTLE_S = 5.0    # far longer than any bet transaction
+
+
+class TableSpec(NamedTuple):
+    columns: Tuple[str, ...]
+    key: Tuple[str, ...]            # keyset columns (unique, indexed)
+    types: Tuple[str, ...]          # parquet types: string | int64 | float64
+
+
+TABLES: Dict[str, TableSpec] = {
+    "bets": TableSpec(
+        ("id", "market_id", "username", "side", "amount_cents", "created_at"),
+        ("created_at", "id"),
+        ("string", "string", "string", "string", "int64", "string"),
+    ),
+    "positions": TableSpec(
+        ("id", "market_id", "username", "yes_shares_micro", "no_shares_micro", "created_at"),
+        ("created_at", "id"),
+        ("string", "string", "string", "int64", "int64", "string"),
+    ),
+    # No timestamps: rowid watermark picks up new rows only (pools change in
+    # place), so markets/users are usually exported in full. Both are small.
+    "markets": TableSpec(
+        ("rowid", "id", "question", "closes_at", "open", "settled", "winner",
+         "yes_real_cents", "no_real_cents", "virt_yes_cents", "virt_no_cents"),
+        ("rowid",),
+        ("int64", "string", "string", "string", "int64", "int64", "string",
+         "int64", "int64", "int64", "int64"),
+    ),
+    "users": TableSpec(
+        ("rowid", "username", "balance_cents", "created_at"),
+        ("rowid",),
+        ("int64", "string", "int64", "string"),
+    ),
+}
+
+
+def spec(table: str) -> TableSpec:
+    if table not in TABLES:
+        raise KeyError(f"unknown export table {table!r} (choose from {', '.join(TABLES)})")
+    return TABLES[table]
+
+
+SHARDED = ("bets", "positions", "markets")   # tables spread over market shards
+
+
+def iter_chunks(
+    table: str,
+    since: Optional[Sequence[Any]] = None,
+    chunk_rows: int = CHUNK_ROWS,
+    path: Optional[str] = None,
+    replica: bool = False,
+) -> Iterator[List[tuple]]:
+    """
+    Yield lists of row tuples (in spec column order), oldest key first.
+    `since` is a watermark tuple matching spec(table).key. replica=True
+    reads the read replica where it is fresh enough (db.read_path).
+    """
+    s = spec(table)
+
+    def source(k: int) -> str:
+        if not replica:
+            return db.shard_path(k)
+        p, age = db.read_path(k)
+        db.note_read_age(age)
+        return p
+
+    if path is not None or table not in SHARDED or db.SHARD_COUNT == 1:
+        return _iter_file(table, since, chunk_rows, path or source(0))
+    until = None
+    if s.key == ("rowid",):
+        since = None
+    else:
+        until = (dt.datetime.utcnow() - dt.timedelta(seconds=SHARD_SETTLE_S)).isoformat()
+    key_idx = [s.columns.index(k) for k in s.key]
+    streams = [
+        itertools.chain.from_iterable(_iter_file(table, since, chunk_rows, source(k), until))
+        for k in db.market_shards() if os.path.exists(db.shard_path(k))
+    ]
+    merged = heapq.merge(*streams, key=lambda r: tuple(r[i] for i in key_idx))
+    return _rechunk(merged, chunk_rows)
+
+
+def _rechunk(rows: Iterator[tuple], chunk_rows: int) -> Iterator[List[tuple]]:
+    while True:
+        chunk = list(itertools.islice(rows, chunk_rows))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_file(
+    table: str,
+    since: Optional[Sequence[Any]],
+    chunk_rows: int,
+    path: Optional[str],
+    until: Optional[str] = None,
+) -> Iterator[List[tuple]]:
+    s = spec(table)
+    cols = ", ".join(s.columns)
+    key = ", ".join(s.key)
+    key_idx = [s.columns.index(k) for k in s.key]
+    after = tuple(since) if since else None
+
+    while True:
+        conds, args = [], ()
+        if after is not None:
+            conds.append(f"({key}) > ({', '.join('?' * len(s.key))})")
+            args = after
+        if until is not None:
+            conds.append("created_at < ?")
+            args = (*args, until)
+        where = f"WHERE {' AND '.join(conds)}" if conds else ""
+        c = connect_readonly(path)
+        try:
+            rows = c.execute(
+                f"SELECT {cols} FROM {table} {where} ORDER BY {key} LIMIT ?",
+                (*args, chunk_rows),
+            ).fetchall()
+        finally:
+            c.close()   # releases the read snapshot between chunks
+        if not rows:
+            return
+        rows = [tuple(r) for r in rows]
+        yield rows
+        if len(rows) < chunk_rows:
+            return
+        after = tuple(rows[-1][i] for i in key_idx)
+
+
+def watermark(table: str, row: tuple) -> List[Any]:
+    s = spec(table)
+    return [row[s.columns.index(k)] for k in s.key]
+
+
+# --------------- writers ---------------
+
+def csv_stream(table: str, chunks: Iterator[List[tuple]]) -> Iterator[str]:
+    """Encode chunks as CSV text, one string per chunk (header first)."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(spec(table).columns)
+    yield buf.getvalue()
+    for rows in chunks:
+        buf.seek(0)
+        buf.truncate()
+        w.writerows(rows)
+        yield buf.getvalue()
+
+
+def write_csv(table: str, chunks: Iterator[List[tuple]], out: IO[str]) -> Tuple[int, Optional[List[Any]]]:
+    """Write CSV to `out`. Returns (rows written, new watermark or None)."""
+    n, last = 0, None
+    w = csv.writer(out)
+    w.writerow(spec(table).columns)
+    for rows in chunks:
+        w.writerows(rows)
+        n += len(rows)
+        last = rows[-1]
+    return n, (watermark(table, last) if last else None)
+
+
+def write_parquet(table: str, chunks: Iterator[List[tuple]], out_path: str) -> Tuple[int, Optional[List[Any]]]:
+    """Write one Parquet row group per chunk. Requires `pyarrow`."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from e
+
+    s = spec(table)
+    schema = pa.schema([(c, getattr(pa, t)()) for c, t in zip(s.columns, s.types)])
+    n, last = 0, None
+    with pq.ParquetWriter(out_path, schema) as writer:
+        for rows in chunks:
+            cols = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=f.type) for col, f in zip(cols, schema)], schema=schema
+            ))
+            n += len(rows)
+            last = rows[-1]
+    return n, (watermark(table, last) if last else None)
@@ -0,0 +1,44 @@
+# backend/app/formats.py
+# Compact response encodings shared by list endpoints.
+# - Default responses stay a list of objects (one dict per row).
+# - ?format=columnar pivots rows into parallel arrays so keys like
+#   "implied_payout_per1_spot" are sent once instead of once per row.
+
+from __future__ import annotations
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from fastapi import HTTPException
+
+COLUMNAR = "columnar"
+
+# Columns sent for market lists. odds / implied payouts are derivable
+# client-side from price_yes (odds = {yes: 1-p, no: p}, payout = 1/p).
+MARKET_COLUMNS = (
+    "id", "question", "closes_at", "open", "settled", "winner",
+    "yes_pool_points", "no_pool_points", "price_yes",
+)
+
+
+def check_format(fmt: Optional[str]) -> Optional[str]:
+    """Validate the ?format= query value (None = default row objects)."""
+    if fmt is None or fmt == COLUMNAR:
+        return fmt
+    raise HTTPException(400, "format must be 'columnar' or omitted")
+
+
+def columnar(rows: Sequence[Dict[str, Any]], columns: Iterable[str]) -> Dict[str, Any]:
+    """
+    Pivot row dicts into {"count": n, "columns": [...], "<col>": [v0, v1, ...]}.
+    Every array has the same length and order as the input rows.
+    """
+    cols: List[str] = list(columns)
+    out: Dict[str, Any] = {"count": len(rows), "columns": cols}
+    for col in cols:
+        out[col] = [r.get(col) for r in rows]
+    return out
+
+
+def render(rows: List[Dict[str, Any]], fmt: Optional[str], columns: Iterable[str]):
+    """Return rows as-is, or pivoted when fmt == 'columnar'."""
+    if fmt == COLUMNAR:
+        return columnar(rows, columns)
+    return rows
@@ -0,0 +1,87 @@
+# backend/app/idempotency.py
+# ------------------------------------------------------------
+# Idempotency-Key support for write endpoints (currently bets).
+# - A key is scoped to the authenticated user.
+# - The first request stores its response in the SAME transaction as the
+#   write, so a replay either sees the committed response or nothing.
+# - A key reused with a different body is rejected (422) instead of
+#   silently returning the other request's result.
+# - Rows older than the TTL are ignored on lookup and deleted in small
+#   batches by compact(), which store() runs every COMPACT_EVERY writes.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import datetime as dt, hashlib, itertools, json, sqlite3
+from typing import Any, Dict, Optional
+from fastapi import HTTPException
+from .config import IDEMPOTENCY_TTL_HOURS
+
+MAX_KEY_LEN = 255
+COMPACT_EVERY = 256     # store() calls between compactions (per process)
+COMPACT_BATCH = 5_000   # rows deleted per compaction
+
+_writes = itertools.count(1)
+
+
+def normalize_key(key: Optional[str]) -> Optional[str]:
+    """Strip the header value; None/blank means 'not idempotent'."""
+    if key is None:
+        return None
+    key = key.strip()
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LEN:
+        raise HTTPException(400, f"Idempotency-Key longer than {MAX_KEY_LEN} chars")
+    return key
+
+
+def request_hash(*parts: Any) -> str:
+    """Stable fingerprint of the request fields that define the operation."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def _cutoff() -> str:
+    return (dt.datetime.utcnow() - dt.timedelta(hours=IDEMPOTENCY_TTL_HOURS)).isoformat()
+
+
+def lookup(c: sqlite3.Connection, username: str, key: str, req_hash: str) -> Optional[Dict[str, Any]]:
+    """Return the stored response for (username, key), or None if unseen/expired."""
+    row = c.execute(
+        """
+        SELECT request_hash, response_json FROM idempotency_keys
+        WHERE username=? AND idem_key=? AND created_at >= ?
+        """,
+        (username, key, _cutoff()),
+    ).fetchone()
+    if not row:
+        return None
+    if row["request_hash"] != req_hash:
+        raise HTTPException(422, "Idempotency-Key was already used for a different request")
+    return json.loads(row["response_json"])
+
+
+def store(c: sqlite3.Connection, username: str, key: str, req_hash: str, response: Dict[str, Any]) -> None:
+    """Remember the response; call inside the write transaction before COMMIT."""
+    c.execute(
+        """
+        INSERT OR REPLACE INTO idempotency_keys
+          (username, idem_key, request_hash, response_json, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (username, key, req_hash, json.dumps(response), dt.datetime.utcnow().isoformat()),
+    )
+    if next(_writes) % COMPACT_EVERY == 0:
+        compact(c)
+
+
+def compact(c: sqlite3.Connection, batch: int = COMPACT_BATCH) -> int:
+    """Delete up to `batch` expired keys (uses idx_idempotency_created)."""
+    cur = c.execute(
+        """
+        DELETE FROM idempotency_keys WHERE rowid IN (
+          SELECT rowid FROM idempotency_keys WHERE created_at < ? LIMIT ?
+        )
+        """,
+        (_cutoff(), batch),
+    )
+    return cur.rowcount
@@ -0,0 +1,521 @@
+# backend/app/jobs.py
+# ------------------------------------------------------------
+# Persistent background jobs for heavy admin operations.
+# - A job is a row in `jobs` (migration 0016): kind, JSON params, a JSON
+#   resume `state` and progress counters. A handler does one chunk of at
+#   most JOB_CHUNK_ROWS rows per call, in its own short transaction, and
+#   save()s the new state inside that transaction. Trading interleaves
+#   with a large settlement, and a restart resumes from the last chunk.
+# - Workers are daemon threads (JOB_WORKERS per process) started with the
+#   app. They claim the oldest queued job, or a running one whose lease
+#   expired (its worker died), under BEGIN IMMEDIATE, so several
+#   processes can share the table. run_now() runs a job in the request
+#   thread instead, for callers that want the result.
+# - dedupe_key allows one active job per key (settle:<market>,
+#   delete:<market>): asking again for the same kind and params returns
+#   the active job, anything else is a JobConflict (409 in the admin
+#   router). `exclusive` keys must not have one either, so a market isn't
+#   settled and deleted at once.
+# - A settle or delete that fails part-way has moved money or rows, so it
+#   is never replaced: with resume=True, enqueue re-queues it and it
+#   continues from its saved state. Lock timeouts (busy database) don't
+#   count as attempts; the job goes back to the queue.
+# - Kinds: settle, delete (one market), archive, reconcile.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import datetime as dt, json, sqlite3, threading, time, uuid
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from . import analytics, archive, cache, db, lmsr, orders, positions, reconcile
+from .config import JOB_CHUNK_ROWS, JOB_WORKERS
+
+LEASE_S = 60            # a running job not saved for this long is reclaimed
+MAX_ATTEMPTS = 3        # failed chunks retried from the last saved state
+POLL_S = 5.0            # idle workers also pick up jobs queued by other processes
+INLINE_WAIT_S = 60.0    # run_now() waits this long for a job another worker holds
+
+_wake = threading.Event()
+_stop = threading.Event()
+_threads: List[threading.Thread] = []
+
+
+class JobError(Exception):
+    """A job that cannot succeed (e.g. its market is gone): fail without retrying."""
+
+
+class JobConflict(Exception):
+    """Another job holds the dedupe key (different params) or an exclusive key."""
+
+
+def _now() -> str:
+    return dt.datetime.utcnow().isoformat()
+
+
+def _lease() -> str:
+    return (dt.datetime.utcnow() + dt.timedelta(seconds=LEASE_S)).isoformat()
+
+
+# --------------- queue ---------------
+
+def enqueue(kind: str, params: Dict[str, Any], dedupe_key: Optional[str] = None,
+            resume: bool = False, exclusive: Sequence[str] = ()) -> str:
+    """
+    Queue a job and return its id: the active job's id if dedupe_key has
+    one for the same kind and params, or with resume=True the key's last
+    job if it failed part-way (re-queued to continue from its state).
+    Raises JobConflict when the key's job is for something else, or an
+    `exclusive` key has an active or part-way failed job.
+    """
+    if kind not in HANDLERS:
+        raise KeyError(f"unknown job kind {kind!r}")
+    job_id, now = str(uuid.uuid4()), _now()
+    with db.conn() as c:
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            for key in exclusive:
+                r = _unfinished(c, key)
+                if r is not None:
+                    raise JobConflict(f"{r['kind']} job {r['id']} is {_unfinished_how(r)}")
+            r = _unfinished(c, dedupe_key) if dedupe_key else None
+            if r is not None and (r["status"] != "failed" or resume):
+                if r["kind"] != kind or json.loads(r["params"]) != params:
+                    raise JobConflict(
+                        f"{r['kind']} job {r['id']} is {_unfinished_how(r)} with params {r['params']}"
+                    )
+                if r["status"] == "failed":
+                    c.execute(
+                        """
+                        UPDATE jobs SET status='queued', attempts=0, lease_until=NULL,
+                                        finished_at=NULL, updated_at=?
+                        WHERE id=?
+                        """,
+                        (now, r["id"]),
+                    )
+                    job_id = r["id"]
+                else:
+                    c.execute("COMMIT")
+                    return r["id"]
+            else:
+                c.execute(
+                    """
+                    INSERT INTO jobs (id, kind, params, dedupe_key, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (job_id, kind, json.dumps(params), dedupe_key, now, now),
+                )
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+    _wake.set()
+    return job_id
+
+
+def _unfinished(c: sqlite3.Connection, key: str) -> Optional[sqlite3.Row]:
+    """The key's active job, or its last job if that failed after saving some state."""
+    r = c.execute(
+        """
+        SELECT id, kind, params, status, state FROM jobs WHERE dedupe_key=?
+        ORDER BY status IN ('queued', 'running') DESC, created_at DESC LIMIT 1
+        """,
+        (key,),
+    ).fetchone()
+    if r is None or r["status"] == "done" or (r["status"] == "failed" and r["state"] == "{}"):
+        return None
+    return r
+
+
+def _unfinished_how(r: sqlite3.Row) -> str:
+    return "stopped part-way (run it again to resume)" if r["status"] == "failed" else r["status"]
+
+
+def save(c: sqlite3.Connection, job: Dict[str, Any]) -> None:
+    """Persist state and progress. Call inside the transaction that did the work."""
+    c.execute(
+        """
+        UPDATE jobs SET state=?, progress_done=?, progress_total=?, updated_at=?, lease_until=?
+        WHERE id=?
+        """,
+        (json.dumps(job["state"]), job["done"], job["total"], _now(), _lease(), job["id"]),
+    )
+
+
+def _job(r: sqlite3.Row) -> Dict[str, Any]:
+    return {"id": r["id"], "kind": r["kind"], "params": json.loads(r["params"]),
+            "state": json.loads(r["state"]), "done": r["progress_done"],
+            "total": r["progress_total"], "attempts": r["attempts"]}
+
+
+def _claim(job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Take the oldest runnable job (or `job_id` if runnable) and lease it."""
+    now = _now()
+    with db.conn() as c:
+        c.execute("BEGIN IMMEDIATE")
+        r = c.execute(
+            f"""
+            SELECT * FROM jobs
+            WHERE {'id=? AND ' if job_id else ''}
+                  (status='queued' OR (status='running' AND lease_until < ?))
+            ORDER BY created_at LIMIT 1
+            """,
+            (job_id, now) if job_id else (now,),
+        ).fetchone()
+        if r is not None:
+            c.execute(
+                "UPDATE jobs SET status='running', lease_until=?, updated_at=? WHERE id=?",
+                (_lease(), now, r["id"]),
+            )
+        c.execute("COMMIT")
+    return _job(r) if r is not None else None
+
+
+def _finish(job_id: str, status: str, result: Any = None, error: Optional[str] = None,
+            attempts: Optional[int] = None) -> None:
+    now = _now()
+    with db.conn() as c:
+        c.execute(
+            """
+            UPDATE jobs SET status=?, result=?, error=?, attempts=COALESCE(?, attempts),
+                            lease_until=NULL, updated_at=?, finished_at=?
+            WHERE id=?
+            """,
+            (status, json.dumps(result) if result is not None else None, error, attempts,
+             now, now if status in ("done", "failed") else None, job_id),
+        )
+
+
+def _run(job: Dict[str, Any], worker: bool) -> None:
+    handler = HANDLERS[job["kind"]]
+    while True:
+        if worker and _stop.is_set():
+            _finish(job["id"], "queued")    # shutting down: next start resumes it
+            return
+        try:
+            result = handler(job)
+        except JobError as e:
+            _finish(job["id"], "failed", error=str(e))
+            return
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if _transient(e):
+                # Busy database: not the job's fault. Back to the queue, from its saved state.
+                _finish(job["id"], "queued", error=error)
+                _wake.set()
+                return
+            job["attempts"] += 1
+            if job["attempts"] >= MAX_ATTEMPTS:
+                _finish(job["id"], "failed", error=error, attempts=job["attempts"])
+                return
+            with db.conn() as c:
+                c.execute("UPDATE jobs SET attempts=?, error=? WHERE id=?",
+                          (job["attempts"], error, job["id"]))
+                r = c.execute("SELECT * FROM jobs WHERE id=?", (job["id"],)).fetchone()
+            # Retry from the last saved chunk, not the half-applied in-memory state
+            job.update({k: v for k, v in _job(r).items() if k != "attempts"})
+            time.sleep(min(2 ** job["attempts"], 10))
+            continue
+        if result is not None:
+            _finish(job["id"], "done", result=result)
+            return
+
+
+def _transient(e: Exception) -> bool:
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in str(e) or "busy" in str(e))
+
+
+def run_now(job_id: str, wait_s: float = INLINE_WAIT_S) -> Dict[str, Any]:
+    """Run a queued job in the calling thread (or wait for the worker that has it)."""
+    job = _claim(job_id)
+    if job is not None:
+        _run(job, worker=False)
+    else:
+        deadline = time.monotonic() + wait_s
+        while time.monotonic() < deadline and get(job_id)["status"] in ("queued", "running"):
+            time.sleep(0.05)
+    return get(job_id)
+
+
+# --------------- reads ---------------
+
+def _out(r: sqlite3.Row) -> Dict[str, Any]:
+    total = r["progress_total"]
+    return {
+        "id": r["id"],
+        "kind": r["kind"],
+        "status": r["status"],
+        "params": json.loads(r["params"]),
+        "progress": {
+            "done": r["progress_done"],
+            "total": total,
+            "pct": round(100.0 * r["progress_done"] / total, 1) if total else None,
+        },
+        "result": json.loads(r["result"]) if r["result"] else None,
+        "error": r["error"],
+        "attempts": r["attempts"],
+        "created_at": r["created_at"],
+        "updated_at": r["updated_at"],
+        "finished_at": r["finished_at"],
+    }
+
+
+def get(job_id: str) -> Optional[Dict[str, Any]]:
+    with db.conn() as c:
+        r = c.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+    return _out(r) if r is not None else None
+
+
+def list_jobs(status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    where, args = ("WHERE status=?", (status,)) if status else ("", ())
+    with db.conn() as c:
+        rows = c.execute(
+            f"SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ?", (*args, limit)
+        ).fetchall()
+    return [_out(r) for r in rows]
+
+
+# --------------- workers ---------------
+
+def _worker() -> None:
+    while not _stop.is_set():
+        try:
+            job = _claim()
+        except sqlite3.Error:
+            job = None      # e.g. busy: try again after the poll interval
+        if job is None:
+            _wake.wait(POLL_S)
+            _wake.clear()
+            continue
+        _run(job, worker=True)
+
+
+def start(n: int = JOB_WORKERS) -> None:
+    """Start the worker threads (app startup). Jobs left running by a dead
+    process are picked up once their lease expires."""
+    if _threads:
+        return
+    _stop.clear()
+    for i in range(n):
+        t = threading.Thread(target=_worker, name=f"job-worker-{i}", daemon=True)
+        t.start()
+        _threads.append(t)
+
+
+def stop(timeout: float = 10.0) -> None:
+    """Stop after the current chunk; unfinished jobs go back to the queue."""
+    _stop.set()
+    _wake.set()
+    for t in _threads:
+        t.join(timeout)
+    _threads.clear()
+
+
+# --------------- handlers: one chunk per call, None until done ---------------
+
+def _settle(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Phases: stage (compute every payout once, write them to job_payouts in
+    chunks), pay (credit a chunk of balances and delete those rows), finish
+    (record the settlement and mark the market settled).
+    """
+    p, st = job["params"], job["state"]
+    mid = p["market_id"]
+    phase = st.get("phase", "stage")
+
+    if phase == "stage":
+        with db.market_conn(mid) as s:
+            m = s.execute(
+                "SELECT kind, settled, yes_real_cents, no_real_cents FROM markets WHERE id=?", (mid,)
+            ).fetchone()
+            if m is None:
+                raise JobError("market not found")
+            if m["kind"] == "lmsr":
+                pays = [tuple(r) for r in s.execute(
+                    f"SELECT username, pay_cents FROM ({lmsr.PAYOUTS_SQL}) WHERE pay_cents > 0 ORDER BY username",
+                    (mid, p["winner_idx"]),
+                )]
+            else:
+                # Split the winning real pool pro-rata by shares. Largest remainder
+                # keeps it exact: payouts sum to the pool, no per-holder rounding drift.
+                # One vectorized pass over the market's columnar holders block.
+                pool = m["yes_real_cents"] if p["winner"] == "YES" else m["no_real_cents"]
+                pays = positions.holders(mid, s).payouts(p["winner"], pool)
+        if m["settled"]:
+            return {"ok": True, **_winner(p), "total_paid_points": 0.0}
+
+        st.update(kind=m["kind"], total_paid=sum(a for _, a in pays))
+        job["total"] = len(pays)
+        staged = st.get("staged", 0)
+        while True:
+            chunk = pays[staged:staged + JOB_CHUNK_ROWS]
+            with db.conn() as h:
+                h.execute("BEGIN IMMEDIATE")
+                h.executemany(
+                    "INSERT INTO job_payouts (job_id, username, pay_cents) VALUES (?, ?, ?)",
+                    [(job["id"], u, a) for u, a in chunk],
+                )
+                staged += len(chunk)
+                st["staged"] = staged
+                if staged >= len(pays):
+                    st["phase"] = "pay"
+                save(h, job)
+                h.execute("COMMIT")
+            if staged >= len(pays):
+                return None
+
+    if phase == "pay":
+        rows_sql = "SELECT username, pay_cents FROM job_payouts WHERE job_id=? AND rowid <= ?"
+        with db.conn() as h:
+            h.execute("BEGIN IMMEDIATE")
+            last = h.execute(
+                "SELECT MAX(rowid) FROM (SELECT rowid FROM job_payouts WHERE job_id=? ORDER BY rowid LIMIT ?)",
+                (job["id"], JOB_CHUNK_ROWS),
+            ).fetchone()[0]
+            if last is None:
+                st["phase"] = "finish"
+            else:
+                args = (job["id"], last)
+                h.execute(
+                    f"""
+                    UPDATE users SET balance_cents = balance_cents + p.pay_cents
+                    FROM ({rows_sql}) AS p
+                    WHERE users.username = p.username
+                    """,
+                    args,
+                )
+                reconcile.record_payouts(h, rows_sql, args)
+                job["done"] += h.execute(
+                    "DELETE FROM job_payouts WHERE job_id=? AND rowid <= ?", args
+                ).rowcount
+            save(h, job)
+            h.execute("COMMIT")
+        return None
+
+    if phase == "finish":
+        with db.market_conn(mid, home=True) as c:
+            c.execute("BEGIN IMMEDIATE")
+            reconcile.record_settlement(c, mid, st["total_paid"])
+            if st["kind"] == "lmsr":
+                c.execute("UPDATE markets SET settled=1, winner_idx=? WHERE id=?", (p["winner_idx"], mid))
+            else:
+                c.execute("UPDATE markets SET settled=1, winner=? WHERE id=?", (p["winner"], mid))
+            cache.publish_market(c, mid)
+            st["phase"] = "done"
+            save(c, job)
+            c.execute("COMMIT")
+    return {"ok": True, **_winner(p), "total_paid_points": st["total_paid"] / 100.0}
+
+
+def _winner(p: Dict[str, Any]) -> Dict[str, Any]:
+    return {"winner_idx": p["winner_idx"]} if p.get("winner_idx") is not None else {"winner": p["winner"]}
+
+
+def _delete(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Phases: close (stop trading, cancel orders), bets (back out of the user
+    aggregates and delete, a chunk at a time), positions, finish (rollup
+    rows and the market itself). Reconcile reports the market as
+    inconsistent while its bets are half deleted.
+    """
+    p, st = job["params"], job["state"]
+    mid = p["market_id"]
+    phase = st.get("phase", "close")
+    result = None
+    with db.market_conn(mid, home=True) as c:
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            if phase == "close":
+                if not c.execute("SELECT 1 FROM markets WHERE id=?", (mid,)).fetchone():
+                    raise JobError("market not found")
+                c.execute("UPDATE markets SET open=0 WHERE id=?", (mid,))
+                orders.cancel_market(c, mid, _now())
+                c.execute("DELETE FROM orders WHERE market_id=?", (mid,))
+                c.execute("DELETE FROM alerts WHERE market_id=?", (mid,))
+                job["total"] = sum(
+                    c.execute(f"SELECT COUNT(*) FROM {t} WHERE market_id=?", (mid,)).fetchone()[0]
+                    for t in ("bets", "positions", "outcome_positions")
+                )
+                cache.publish_market(c, mid)
+                st["phase"] = "bets"
+            elif phase == "bets":
+                n = reconcile.forget_bets(c, mid, JOB_CHUNK_ROWS)
+                job["done"] += n
+                if n < JOB_CHUNK_ROWS:
+                    st["phase"] = "positions"
+            elif phase == "positions":
+                n = c.execute(
+                    "DELETE FROM positions WHERE id IN (SELECT id FROM positions WHERE market_id=? LIMIT ?)",
+                    (mid, JOB_CHUNK_ROWS),
+                ).rowcount
+                n += c.execute(
+                    """
+                    DELETE FROM outcome_positions WHERE (market_id, idx, username) IN
+                      (SELECT market_id, idx, username FROM outcome_positions WHERE market_id=? LIMIT ?)
+                    """,
+                    (mid, JOB_CHUNK_ROWS - n),
+                ).rowcount
+                job["done"] += n
+                if n < JOB_CHUNK_ROWS:
+                    st["phase"] = "finish"
+            else:
+                reconcile.forget_market(c, mid)
+                analytics.forget_market(c, mid)
+                c.execute("DELETE FROM market_outcomes WHERE market_id=?", (mid,))
+                c.execute("DELETE FROM markets WHERE id=?", (mid,))
+                c.execute("DELETE FROM market_directory WHERE market_id=?", (mid,))
+                cache.publish_market(c, mid)
+                result = {"ok": True}
+            save(c, job)
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+    return result
+
+
+def _archive(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """One archive batch per call, shard by shard."""
+    p, st = job["params"], job["state"]
+    totals = st.setdefault("totals", {"markets": 0, "bets": 0, "positions": 0, "outcomes": 0, "batches": 0})
+    k = st.get("shard", 0)
+    if k >= db.SHARD_COUNT:
+        return totals
+    with db.market_conn(shard=k, home=True) as c:
+        archive.attach(c, create=True)
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            moved = archive.archive_batch(c, p.get("batch", 100), p.get("closed_before"))
+            if moved["markets"]:
+                totals["batches"] += 1
+                for key, v in moved.items():
+                    totals[key] += v
+            else:
+                st["shard"] = k + 1
+            job["done"] = totals["markets"]
+            save(c, job)
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
+    return None
+
+
+def _reconcile(job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    verify_all one page at a time (reconcile.verify_chunk): each page
+    commits its clean marks, then save() records progress and renews the
+    lease, so a long verification isn't reclaimed by another worker.
+    """
+    p, st = job["params"], job["state"]
+    result = reconcile.verify_chunk(st, p.get("full", False), p.get("deep", True), JOB_CHUNK_ROWS)
+    job["done"] = st.get("markets", 0) + st.get("users", 0)
+    with db.conn() as h:
+        save(h, job)
+    return result
+
+
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = {
+    "settle": _settle,
+    "delete": _delete,
+    "archive": _archive,
+    "reconcile": _reconcile,
+}
@@ -0,0 +1,96 @@
+# backend/app/lmsr.py
+# ------------------------------------------------------------
+# Logarithmic market scoring rule for N-outcome markets.
+# - Cost C(q) = b * log(sum_j exp(q_j / b)); prices are softmax(q / b).
+#   Buying x shares of outcome i costs C(q + x e_i) - C(q).
+# - All evaluation is in log space (logsumexp / log-softmax), so dozens
+#   of outcomes or large q/b never overflow, and every function is one
+#   vectorized numpy pass over the N outcomes.
+# - Spend -> shares has a closed form: with p_i the current price,
+#     x = b * log(1 + expm1(S / b) / p_i)
+#   evaluated as b * logaddexp(0, log(expm1(S/b)) - log p_i).
+# - Units: q and x in shares, b and S in points (1 share pays 1 point).
+#   Callers convert from micro-shares / cents at the boundary, and
+#   issued shares are floored to micro-shares like the CPMM.
+# - The market maker's worst-case loss is b * ln N points, paid by the
+#   house: winning shares settle at par, not from the pool.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+from typing import Dict
+import numpy as np
+
+MIN_OUTCOMES = 2
+MAX_OUTCOMES = 64
+
+
+def _logsumexp(x: np.ndarray) -> float:
+    m = np.max(x)
+    return float(m + np.log(np.sum(np.exp(x - m))))
+
+
+def cost(q: np.ndarray, b: float) -> float:
+    """C(q) in points."""
+    return b * _logsumexp(np.asarray(q, dtype=np.float64) / b)
+
+
+def log_prices(q: np.ndarray, b: float) -> np.ndarray:
+    x = np.asarray(q, dtype=np.float64) / b
+    return x - _logsumexp(x)
+
+
+def prices(q: np.ndarray, b: float) -> np.ndarray:
+    """Spot prices (sum to 1)."""
+    return np.exp(log_prices(q, b))
+
+
+def shares_for_spend(q: np.ndarray, b: float, spend: float) -> np.ndarray:
+    """Shares received for spending `spend` points on each outcome (length N)."""
+    lp = log_prices(q, b)
+    if spend <= 0:
+        return np.zeros_like(lp)
+    s = spend / b
+    log_expm1_s = s + np.log(-np.expm1(-s))        # log(e^s - 1), stable for all s > 0
+    return b * np.logaddexp(0.0, log_expm1_s - lp)
+
+
+def cost_of_shares(q: np.ndarray, b: float, shares: np.ndarray) -> np.ndarray:
+    """Points needed to buy `shares[i]` of outcome i (each outcome separately)."""
+    lp = log_prices(q, b)
+    x = np.asarray(shares, dtype=np.float64) / b
+    # C(q + x e_i) - C(q) = b * log(1 - p_i + p_i e^x)
+    return b * np.logaddexp(np.log1p(-np.minimum(np.exp(lp), 1.0)), lp + x)
+
+
+def price_after(q: np.ndarray, b: float, shares: np.ndarray) -> np.ndarray:
+    """Price of outcome i after buying `shares[i]` of it (each outcome separately)."""
+    lp = log_prices(q, b)
+    x = np.asarray(shares, dtype=np.float64) / b
+    return np.exp(lp + x - np.logaddexp(np.log1p(-np.minimum(np.exp(lp), 1.0)), lp + x))
+
+
+def quote(q: np.ndarray, b: float, spend: float) -> Dict[str, np.ndarray]:
+    """Buying `spend` points of each outcome: shares, average and post-trade price."""
+    sh = shares_for_spend(q, b, spend)
+    return {
+        "price": prices(q, b),
+        "shares": sh,
+        "avg_price": np.divide(spend, sh, out=np.zeros_like(sh), where=sh > 0),
+        "price_after": price_after(q, b, sh),
+    }
+
+
+def max_loss(b: float, n: int) -> float:
+    """Worst-case market-maker subsidy in points."""
+    return b * float(np.log(n))
+
+
+# --------------- settlement (SQL) ---------------
+
+# Winning holders and their payout in cents (par, floored to the cent).
+# Parameters: (market_id, winner_idx). Used by admin settle and reconcile.
+PAYOUTS_SQL = """
+    SELECT username, shares_micro * 100 / 1000000 AS pay_cents
+    FROM outcome_positions
+    WHERE market_id=? AND idx=? AND shares_micro >= 10000
+"""
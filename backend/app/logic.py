@@ -2,17 +2,37 @@
 # ------------------------------------------------------------
 # Binary CPMM with virtual liquidity (Uniswap-style x*y = k).
 # - Monetary units in DB are *cents* (integers).
-# - Returned share amounts are in *points* (floats), where
-#     1.0 share pays exactly 1.0 point (=100 cents) on win.
+# - Share quantities are integer *micro-shares* (SHARE_MICRO per share);
+#   1 share pays exactly 1.0 point (=100 cents) on win. The pricing
+#   integral is float; its result is floored to micro-shares once per
+#   trade, and everything downstream (positions, settlement) is exact
+#   integer arithmetic. shares_points_issued is kept for display.
 # - YES/NO prices move continuously; virtual liquidity provides
 #   initial depth and keeps prices well-defined at launch.
 # ------------------------------------------------------------
 
 from __future__ import annotations
-from typing import Dict, Literal, Tuple
+import math
+from typing import Dict, List, Literal, Sequence, Tuple
 
 Side = Literal["YES", "NO"]
 EPS = 1e-12  # numeric guard for division
+SHARE_MICRO = 1_000_000  # micro-shares per share (1 share = 100 cents at par)
+# Cap per fill. A spend larger than the opposite effective pool drives the
+# integrated price to EPS and the share count towards infinity; 2**53 keeps
+# the fill exact as a float and leaves int64 headroom for position sums.
+MAX_FILL_MICRO = 2 ** 53
+
+
+def to_micro(shares_points: float) -> int:
+    """Float shares -> integer micro-shares, rounded down (never over-issue)."""
+    if not shares_points * SHARE_MICRO < MAX_FILL_MICRO:   # also catches inf/nan
+        return MAX_FILL_MICRO
+    return int(math.floor(shares_points * SHARE_MICRO))
+
+
+def micro_to_points(micro: int) -> float:
+    return micro / SHARE_MICRO
 
 # --------------- Effective pools (real + virtual) ---------------
 
@@ -133,13 +153,14 @@ def preview_buy(
 ) -> Dict[str, float]:
     """
     Compute preview without mutating state:
-    - shares_points_issued
+    - shares_micro_issued (int) / shares_points_issued
     - price_yes_after
     - odds after
     - implied spot payout multiples
     """
     if spend_cents <= 0:
         return {
+            "shares_micro_issued": 0,
             "shares_points_issued": 0.0,
             "price_yes_after": spot_price_yes(*effective_pools(yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents)),
             "odds": odds_from_pools(*effective_pools(yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents)),
@@ -162,8 +183,10 @@ def preview_buy(
     odds_after = odds_from_pools(y_after, n_after)
     mult_after = implied_payout_per1_spot(y_after, n_after)
 
+    micro = to_micro(shares)
     return {
-        "shares_points_issued": shares,
+        "shares_micro_issued": micro,
+        "shares_points_issued": micro_to_points(micro),
         "price_yes_after": price_after,
         "odds": odds_after,
         "implied_payout_per1_spot": mult_after,
@@ -181,7 +204,7 @@ def apply_buy(
     """
     Apply a buy to REAL pools, returning:
       - new_yes_real_cents / new_no_real_cents (ints)
-      - shares_points_issued (float)
+      - shares_micro_issued (int) and shares_points_issued (display float)
       - price_yes_after, odds, implied_payout_per1_spot
     NOTE: virtual pools are *not* mutated here (they're fixed depth).
     """
@@ -189,6 +212,7 @@ def apply_buy(
         return {
             "new_yes_real_cents": yes_real_cents,
             "new_no_real_cents": no_real_cents,
+            "shares_micro_issued": 0,
             "shares_points_issued": 0.0,
             "price_yes_after": spot_price_yes(*effective_pools(yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents)),
             "odds": odds_from_pools(*effective_pools(yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents)),
@@ -211,11 +235,63 @@ def apply_buy(
         new_yes_real = yes_real_cents
         y_after, n_after = effective_pools(new_yes_real, new_no_real, virt_yes_cents, virt_no_cents)
 
+    micro = to_micro(shares)
     return {
         "new_yes_real_cents": int(round(new_yes_real)),
         "new_no_real_cents":  int(round(new_no_real)),
-        "shares_points_issued": float(shares),
+        "shares_micro_issued": micro,
+        "shares_points_issued": micro_to_points(micro),
         "price_yes_after": spot_price_yes(y_after, n_after),
         "odds": odds_from_pools(y_after, n_after),
         "implied_payout_per1_spot": implied_payout_per1_spot(y_after, n_after),
-    }
\ No newline at end of file
+    }
+
+
+# --------------- Limit prices ---------------
+
+def spend_to_price(side: Side, target: float, yes_eff: float, no_eff: float) -> float:
+    """
+    Closed form: spend (cents) on `side` after which that side's spot price
+    equals `target`. A buy adds to the side's own effective pool, so its
+    price other / (own + S + other) falls with S:
+        S = other / target - own - other
+    Negative when the price is already below target (it only moves away).
+    """
+    own, other = (yes_eff, no_eff) if side == "YES" else (no_eff, yes_eff)
+    return other / max(target, EPS) - own - other
+
+
+def max_spend_at_limit(side: Side, limit: float, yes_eff: float, no_eff: float) -> float:
+    """
+    Largest spend (cents) that fills `side` at spot prices <= `limit`.
+    0 if the price is above the limit. Otherwise the fill can run until the
+    price reaches the limit; in this CPMM a side's own buys lower its
+    price, so that point is never reached and the bound is infinite.
+    """
+    s = spend_to_price(side, limit, yes_eff, no_eff)
+    return 0.0 if s > 0 else math.inf
+
+
+# --------------- Settlement ---------------
+
+def allocate_pro_rata(total_cents: int, weights: Sequence[int]) -> List[int]:
+    """
+    Split `total_cents` across integer `weights` (micro-shares) with the
+    largest-remainder method. Exact: the result sums to total_cents (when
+    any weight > 0), each holder gets floor or floor+1 of their exact
+    share, and ties go to the earlier entry, so callers should pass
+    holders in a stable order.
+    """
+    W = sum(weights)
+    if W <= 0 or total_cents <= 0:
+        return [0] * len(weights)
+    out: List[int] = []
+    rems: List[Tuple[int, int]] = []
+    for i, w in enumerate(weights):
+        q, r = divmod(total_cents * w, W)
+        out.append(q)
+        rems.append((-r, i))
+    left = total_cents - sum(out)           # < len(weights)
+    for _, i in sorted(rems)[:left]:
+        out[i] += 1
+    return out
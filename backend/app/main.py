@@ -1,34 +1,122 @@
-from fastapi import FastAPI, HTTPException, Request
+import time
+_T0 = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 
-from .routers import users, markets, bets, auth, admin
+from . import boot, db, escrow, jobs, replica
+from .config import BOOT_WARM, COMPRESS_MIN_BYTES, SHARD_COUNT
+from .ratelimit import limit_admin
+from .routers import users, markets, bets, auth, admin, multi, orders, alerts
+
+_IMPORT_MS = (time.perf_counter() - _T0) * 1000
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Everything a worker does before serving, timed (see app/boot.py).
+    b = boot.Boot(_IMPORT_MS)
+    with b.step("schema"):
+        boot.check_schema()
+    if SHARD_COUNT > 1:
+        # Cross-shard bets interrupted by the last shutdown (see app/escrow.py)
+        with b.step("escrow"):
+            escrow.recover()
+    if BOOT_WARM:
+        with b.step("db"):
+            boot.warm_db()
+        with b.step("cache"):
+            boot.warm_cache()
+        with b.step("auth"):
+            boot.warm_auth()
+        with b.step("serializers"):
+            boot.warm_serializers(app)
+    # Background admin jobs (unfinished ones resume, see app/jobs.py), the
+    # read-only snapshot for reporting routes when REPLICA_REFRESH_S > 0, and
+    # periodic escrow recovery when markets are sharded
+    with b.step("threads"):
+        jobs.start()
+        replica.start()
+        if SHARD_COUNT > 1:
+            escrow.start()
+    app.state.boot = b.report()
+    try:
+        yield
+    finally:
+        jobs.stop()
+        replica.stop()
+        escrow.stop()
+
+
+def create_app() -> FastAPI:
+    """
+    Build the API. uvicorn serves the module-level `app` (app.main:app), or
+    `--factory app.main:create_app` for a fresh instance per worker.
+    """
+    app = FastAPI(title="Prediction Market API", version="0.1.0", lifespan=lifespan)
+
+    # Negotiated response compression (Accept-Encoding). Brotli is preferred when
+    # the optional `brotli-asgi` package is installed; it falls back to gzip for
+    # clients that don't advertise br. Without it we serve gzip only.
+    try:
+        from brotli_asgi import BrotliMiddleware
+        app.add_middleware(BrotliMiddleware, minimum_size=COMPRESS_MIN_BYTES, gzip_fallback=True)
+    except ImportError:
+        app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Mount routers (note the /users prefix)
+    app.include_router(auth.router,    prefix="/auth",  tags=["auth"])
+    app.include_router(users.router,   prefix="/users", tags=["users"])
+    app.include_router(markets.router, prefix="",       tags=["markets"])
+    app.include_router(bets.router,    prefix="",       tags=["bets"])
+    app.include_router(multi.router,   prefix="",       tags=["multi"])
+    app.include_router(orders.router,  prefix="",       tags=["orders"])
+    app.include_router(alerts.router,  prefix="",       tags=["alerts"])
+    app.include_router(admin.router,   prefix="/admin", tags=["admin"],
+                       dependencies=[Depends(limit_admin)])
+
+    @app.middleware("http")
+    async def report_staleness(request: Request, call_next):
+        # Routes that read through db.read_conn report how old their data was
+        reads = db.track_reads()
+        response = await call_next(request)
+        if "age" in reads:
+            response.headers["X-Data-Age"] = f"{reads['age']:.1f}"
+        return response
+
+    @app.get("/health")
+    def health():
+        return {"ok": True}
 
-app = FastAPI(title="Prediction Market API", version="0.1.0")
+    @app.get("/health/boot")
+    def health_boot():
+        # Startup breakdown of this worker (empty until the lifespan ran)
+        return getattr(app.state, "boot", {})
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    @app.exception_handler(HTTPException)
+    async def http_exc_handler(request: Request, exc: HTTPException):
+        return JSONResponse(
+            status_code=exc.status_code,
+            content={"error": str(exc.detail)},
+            headers=getattr(exc, "headers", None),  # e.g. Retry-After on 429
+        )
 
-# Mount routers (note the /users prefix)
-app.include_router(auth.router,    prefix="/auth",  tags=["auth"])
-app.include_router(users.router,   prefix="/users", tags=["users"])
-app.include_router(markets.router, prefix="",       tags=["markets"])
-app.include_router(bets.router,    prefix="",       tags=["bets"])
-app.include_router(admin.router,   prefix="/admin", tags=["admin"])
+    @app.exception_handler(Exception)
+    async def unhandled_exc_handler(request: Request, exc: Exception):
+        return JSONResponse(status_code=500, content={"error": "Internal server error"})
 
-@app.get("/health")
-def health():
-    return {"ok": True}
+    return app
 
-@app.exception_handler(HTTPException)
-async def http_exc_handler(request: Request, exc: HTTPException):
-    return JSONResponse(status_code=exc.status_code, content={"error": str(exc.detail)})
 
-@app.exception_handler(Exception)
-async def unhandled_exc_handler(request: Request, exc: Exception):
-    return JSONResponse(status_code=500, content={"error": "Internal server error"})
\ No newline at end of file
+app = create_app()
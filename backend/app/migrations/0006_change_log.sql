@@ -0,0 +1,13 @@
+-- 0006_change_log.sql
+-- Cross-worker cache invalidation feed (see app/cache.py).
+-- Writers append (topic, key) rows in the same transaction as the data they
+-- change; each worker replays rows with seq > its last seen seq.
+-- Old rows are trimmed by cache.publish(); a worker that falls behind the
+-- trimmed head simply flushes its whole cache.
+
+CREATE TABLE IF NOT EXISTS change_log (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  topic TEXT NOT NULL,
+  key TEXT,                       -- NULL = whole topic
+  created_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
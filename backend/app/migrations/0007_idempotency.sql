@@ -0,0 +1,14 @@
+-- 0007_idempotency.sql
+-- Stored responses for POST /markets/{id}/bet retries (see app/idempotency.py).
+-- Keys are scoped per user; rows older than IDEMPOTENCY_TTL_HOURS are compacted.
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+  username TEXT NOT NULL,
+  idem_key TEXT NOT NULL,
+  request_hash TEXT NOT NULL,     -- sha256 of the request the key was first used for
+  response_json TEXT NOT NULL,    -- BetResp as stored at commit time
+  created_at TEXT NOT NULL,
+  PRIMARY KEY (username, idem_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_created ON idempotency_keys(created_at);
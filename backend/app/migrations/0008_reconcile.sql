@@ -0,0 +1,34 @@
+-- 0008_reconcile.sql
+-- Running aggregates for ledger reconciliation (see app/reconcile.py).
+-- Updated in the same transaction as every bet / payout; rows touched since
+-- the last verification carry dirty=1 so a check only visits changed rows.
+-- checksum = order-independent sum of per-bet hashes (mod 2^61-1).
+-- After applying, run `PYTHONPATH=. python scripts/reconcile.py --rebuild`
+-- once to backfill aggregates for existing bets.
+
+CREATE TABLE IF NOT EXISTS recon_markets (
+  market_id TEXT PRIMARY KEY,
+  yes_bets_cents INTEGER NOT NULL DEFAULT 0,
+  no_bets_cents  INTEGER NOT NULL DEFAULT 0,
+  bet_count INTEGER NOT NULL DEFAULT 0,
+  checksum  INTEGER NOT NULL DEFAULT 0,
+  paid_cents INTEGER,               -- total settlement payout; NULL = not recorded
+  dirty INTEGER NOT NULL DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS recon_users (
+  username TEXT PRIMARY KEY,
+  spent_cents INTEGER NOT NULL DEFAULT 0,
+  paid_cents  INTEGER NOT NULL DEFAULT 0,
+  bet_count INTEGER NOT NULL DEFAULT 0,
+  checksum  INTEGER NOT NULL DEFAULT 0,
+  dirty INTEGER NOT NULL DEFAULT 1
+);
+
+-- Partial indexes: finding changed rows costs O(changed), not O(table).
+CREATE INDEX IF NOT EXISTS idx_recon_markets_dirty ON recon_markets(market_id) WHERE dirty=1;
+CREATE INDEX IF NOT EXISTS idx_recon_users_dirty   ON recon_users(username)    WHERE dirty=1;
+
+-- Deep checks re-sum one market's / one user's ledger rows.
+CREATE INDEX IF NOT EXISTS idx_bets_market ON bets(market_id);
+CREATE INDEX IF NOT EXISTS idx_bets_user   ON bets(username);
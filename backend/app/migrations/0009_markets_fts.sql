@@ -0,0 +1,30 @@
+-- 0009_markets_fts.sql
+-- Full-text index over markets.question for GET /markets/search.
+-- External-content FTS5 table: the text lives only in `markets`; triggers
+-- keep the index in sync on insert / update / delete.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS markets_fts USING fts5(
+  question,
+  content='markets',
+  content_rowid='rowid',
+  tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS markets_fts_ai AFTER INSERT ON markets BEGIN
+  INSERT INTO markets_fts(rowid, question) VALUES (new.rowid, new.question);
+END;
+
+CREATE TRIGGER IF NOT EXISTS markets_fts_ad AFTER DELETE ON markets BEGIN
+  INSERT INTO markets_fts(markets_fts, rowid, question) VALUES ('delete', old.rowid, old.question);
+END;
+
+CREATE TRIGGER IF NOT EXISTS markets_fts_au AFTER UPDATE OF question ON markets BEGIN
+  INSERT INTO markets_fts(markets_fts, rowid, question) VALUES ('delete', old.rowid, old.question);
+  INSERT INTO markets_fts(rowid, question) VALUES (new.rowid, new.question);
+END;
+
+-- Index existing markets.
+INSERT INTO markets_fts(markets_fts) VALUES ('rebuild');
+
+-- Filters used alongside text relevance.
+CREATE INDEX IF NOT EXISTS idx_markets_closes_at ON markets(closes_at);
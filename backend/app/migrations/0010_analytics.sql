@@ -0,0 +1,53 @@
+-- 0010_analytics.sql
+-- Incremental volume / activity rollups for /admin/stats (see app/analytics.py).
+-- Maintained inside the bet transaction; read in O(1) or O(limit) via indexes.
+-- Backfill existing bets once with: PYTHONPATH=. python scripts/stats.py --rebuild
+
+CREATE TABLE IF NOT EXISTS stats_totals (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  volume_cents INTEGER NOT NULL DEFAULT 0,
+  trade_count  INTEGER NOT NULL DEFAULT 0,
+  trader_count INTEGER NOT NULL DEFAULT 0      -- users with >= 1 trade
+);
+INSERT OR IGNORE INTO stats_totals (id) VALUES (1);
+
+CREATE TABLE IF NOT EXISTS stats_markets (
+  market_id TEXT PRIMARY KEY,
+  volume_cents     INTEGER NOT NULL DEFAULT 0,
+  yes_volume_cents INTEGER NOT NULL DEFAULT 0,
+  no_volume_cents  INTEGER NOT NULL DEFAULT 0,
+  trade_count  INTEGER NOT NULL DEFAULT 0,
+  trader_count INTEGER NOT NULL DEFAULT 0,     -- unique traders
+  first_trade_at TEXT,
+  last_trade_at  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_stats_markets_volume ON stats_markets(volume_cents DESC);
+CREATE INDEX IF NOT EXISTS idx_stats_markets_trades ON stats_markets(trade_count DESC);
+
+CREATE TABLE IF NOT EXISTS stats_users (
+  username TEXT PRIMARY KEY,
+  volume_cents INTEGER NOT NULL DEFAULT 0,
+  trade_count  INTEGER NOT NULL DEFAULT 0,
+  market_count INTEGER NOT NULL DEFAULT 0,     -- distinct markets traded
+  last_trade_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_stats_users_volume ON stats_users(volume_cents DESC);
+
+-- Time buckets: bucket = 'YYYY-MM-DDTHH' (hour) or 'YYYY-MM-DD' (day), UTC.
+CREATE TABLE IF NOT EXISTS stats_buckets (
+  granularity TEXT NOT NULL CHECK (granularity IN ('hour', 'day')),
+  bucket TEXT NOT NULL,
+  volume_cents INTEGER NOT NULL DEFAULT 0,
+  trade_count  INTEGER NOT NULL DEFAULT 0,
+  trader_count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (granularity, bucket)
+);
+
+-- Who traded in a bucket (for unique counts). Closed buckets are compacted
+-- away by analytics.compact(); their trader_count is already final.
+CREATE TABLE IF NOT EXISTS stats_bucket_traders (
+  granularity TEXT NOT NULL,
+  bucket TEXT NOT NULL,
+  username TEXT NOT NULL,
+  PRIMARY KEY (granularity, bucket, username)
+) WITHOUT ROWID;
@@ -0,0 +1,7 @@
+-- 0011_export_indexes.sql
+-- Keyset pagination for streaming exports (see app/export.py):
+-- each chunk is `WHERE (created_at, id) > (?, ?) ORDER BY created_at, id LIMIT n`.
+-- positions.created_at is rewritten on every bet, so it doubles as "updated at".
+
+CREATE INDEX IF NOT EXISTS idx_bets_created_id      ON bets(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_positions_created_id ON positions(created_at, id);
@@ -0,0 +1,19 @@
+-- backend/app/migrations/0012_shares_micro.sql
+-- Store share balances as exact integers: micro-shares, 1_000_000 per
+-- share (1 share pays 100 cents on win). Replaces the REAL
+-- yes_shares_points / no_shares_points columns, which accumulated float
+-- error on every bet and forced float math in settlement.
+--
+-- Run once (ADD COLUMN has no IF NOT EXISTS). DROP COLUMN needs
+-- SQLite >= 3.35. If app_archive.db exists, run it against that file too.
+
+ALTER TABLE positions ADD COLUMN yes_shares_micro INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE positions ADD COLUMN no_shares_micro  INTEGER NOT NULL DEFAULT 0;
+
+-- Backfill with the nearest micro-share of the stored float.
+UPDATE positions
+   SET yes_shares_micro = CAST(ROUND(yes_shares_points * 1000000) AS INTEGER),
+       no_shares_micro  = CAST(ROUND(no_shares_points  * 1000000) AS INTEGER);
+
+ALTER TABLE positions DROP COLUMN yes_shares_points;
+ALTER TABLE positions DROP COLUMN no_shares_points;
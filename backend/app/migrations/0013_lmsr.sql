@@ -0,0 +1,33 @@
+-- 0013_lmsr.sql
+-- Multi-outcome markets priced by LMSR (see app/lmsr.py), alongside CPMM.
+-- - markets.kind: 'binary' (CPMM, YES/NO) or 'lmsr' (N outcomes).
+-- - markets.lmsr_b_cents: LMSR liquidity b (in cents; max subsidy b*ln N).
+-- - markets.winner_idx: winning outcome of a settled lmsr market.
+-- - market_outcomes.q_micro: outstanding shares per outcome (micro-shares).
+-- - outcome_positions: per-user holdings, one row per (market, outcome, user).
+-- - bets.outcome_idx: outcome bought (NULL for binary). LMSR bets are
+--   recorded with side='YES' so the ledger constraint and aggregates hold.
+-- Run once (ADD COLUMN has no IF NOT EXISTS).
+
+ALTER TABLE markets ADD COLUMN kind TEXT NOT NULL DEFAULT 'binary' CHECK (kind IN ('binary', 'lmsr'));
+ALTER TABLE markets ADD COLUMN lmsr_b_cents INTEGER;
+ALTER TABLE markets ADD COLUMN winner_idx INTEGER;
+ALTER TABLE bets ADD COLUMN outcome_idx INTEGER;
+
+CREATE TABLE IF NOT EXISTS market_outcomes (
+  market_id TEXT NOT NULL,
+  idx       INTEGER NOT NULL,
+  label     TEXT NOT NULL,
+  q_micro   INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (market_id, idx)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS outcome_positions (
+  market_id    TEXT NOT NULL,
+  idx          INTEGER NOT NULL,
+  username     TEXT NOT NULL,
+  shares_micro INTEGER NOT NULL DEFAULT 0,
+  created_at   TEXT NOT NULL,
+  PRIMARY KEY (market_id, idx, username)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_outcome_positions_user ON outcome_positions(username, market_id);
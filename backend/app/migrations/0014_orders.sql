@@ -0,0 +1,24 @@
+-- 0014_orders.sql
+-- Resting limit orders: "buy <side> while its price <= limit_price, spending
+-- at most budget". The budget is escrowed (debited) when the order is placed;
+-- fills draw on remaining_cents, cancel/close refunds it. See app/orders.py.
+-- bets.order_id links a fill to its order (NULL for market buys).
+-- Run once (ADD COLUMN has no IF NOT EXISTS).
+
+CREATE TABLE IF NOT EXISTS orders (
+  id              TEXT PRIMARY KEY,
+  market_id       TEXT NOT NULL,
+  username        TEXT NOT NULL,
+  side            TEXT NOT NULL CHECK (side IN ('YES', 'NO')),
+  limit_price     REAL NOT NULL CHECK (limit_price > 0 AND limit_price < 1),
+  budget_cents    INTEGER NOT NULL CHECK (budget_cents > 0),
+  remaining_cents INTEGER NOT NULL,
+  status          TEXT NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'filled', 'cancelled')),
+  created_at      TEXT NOT NULL,
+  updated_at      TEXT NOT NULL
+);
+-- The book of a market is loaded from here; time priority is rowid.
+CREATE INDEX IF NOT EXISTS idx_orders_book ON orders(market_id, side, limit_price) WHERE status = 'open';
+CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(username, created_at);
+
+ALTER TABLE bets ADD COLUMN order_id TEXT;
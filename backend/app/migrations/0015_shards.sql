@@ -0,0 +1,44 @@
+-- 0015_shards.sql
+-- Market sharding (SHARD_COUNT > 1, see app/db.py and app/escrow.py).
+-- Home DB only:
+--   market_directory: which shard file holds a market. Markets without a
+--     row (created before sharding) live in the home DB, shard 0.
+--   escrows: money taken from a user for a bet on another shard, until the
+--     shard has filled it ('spent') or it is returned ('refunded').
+-- Every shard (including the home DB, which is shard 0):
+--   escrow_fills: fills a shard made for an escrow, read back by the home
+--     side to finalize it (outbox).
+--   escrow_void: escrows given up by recovery; a late fill must not use them.
+
+CREATE TABLE IF NOT EXISTS market_directory (
+  market_id TEXT PRIMARY KEY,
+  shard     INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS escrows (
+  id           TEXT PRIMARY KEY,
+  username     TEXT NOT NULL,
+  market_id    TEXT NOT NULL,
+  shard        INTEGER NOT NULL,
+  amount_cents INTEGER NOT NULL CHECK (amount_cents > 0),
+  status       TEXT NOT NULL DEFAULT 'held' CHECK (status IN ('held', 'spent', 'refunded')),
+  created_at   TEXT NOT NULL,
+  updated_at   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_escrows_held ON escrows(created_at) WHERE status = 'held';
+
+CREATE TABLE IF NOT EXISTS escrow_fills (
+  escrow_id    TEXT NOT NULL,
+  bet_id       TEXT NOT NULL,
+  username     TEXT NOT NULL,
+  side         TEXT NOT NULL,
+  amount_cents INTEGER NOT NULL,
+  new_trader   INTEGER NOT NULL,
+  created_at   TEXT NOT NULL,
+  PRIMARY KEY (escrow_id, bet_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS escrow_void (
+  escrow_id  TEXT PRIMARY KEY,
+  created_at TEXT NOT NULL
+) WITHOUT ROWID;
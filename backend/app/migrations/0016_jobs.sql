@@ -0,0 +1,36 @@
+-- 0016_jobs.sql
+-- Persistent background jobs (app/jobs.py): settle / delete / archive /
+-- reconcile run as a series of short transactions. `state` is the job's
+-- resume point, saved in the same transaction as each chunk of work, so a
+-- restarted worker continues where the last one stopped. A running job
+-- whose lease expired (its worker died) is claimed again.
+-- Home DB only.
+
+CREATE TABLE IF NOT EXISTS jobs (
+  id             TEXT PRIMARY KEY,
+  kind           TEXT NOT NULL,
+  params         TEXT NOT NULL,                 -- JSON
+  state          TEXT NOT NULL DEFAULT '{}',    -- JSON resume point
+  status         TEXT NOT NULL DEFAULT 'queued'
+                 CHECK (status IN ('queued', 'running', 'done', 'failed')),
+  dedupe_key     TEXT,                          -- one active job per key (e.g. settle:<market>)
+  progress_done  INTEGER NOT NULL DEFAULT 0,
+  progress_total INTEGER,
+  result         TEXT,                          -- JSON
+  error          TEXT,
+  attempts       INTEGER NOT NULL DEFAULT 0,
+  lease_until    TEXT,
+  created_at     TEXT NOT NULL,
+  updated_at     TEXT NOT NULL,
+  finished_at    TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_pending ON jobs(status, created_at) WHERE status IN ('queued', 'running');
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs(dedupe_key) WHERE status IN ('queued', 'running');
+
+-- Payouts computed by a settle job, applied and deleted in chunks.
+CREATE TABLE IF NOT EXISTS job_payouts (
+  job_id    TEXT NOT NULL,
+  username  TEXT NOT NULL,
+  pay_cents INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_payouts_job ON job_payouts(job_id);
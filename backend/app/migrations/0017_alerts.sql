@@ -0,0 +1,32 @@
+-- 0017_alerts.sql
+-- Price alerts: "tell me when price_yes >= threshold" (direction 'above') or
+-- "<= threshold" ('below'). Armed alerts are loaded into an in-memory
+-- trigger index per market (app/alerts.py); a fill that crosses one marks
+-- it 'fired' in the same transaction. The user polls fired alerts from
+-- GET /alerts/inbox. Every shard (including the home DB, which is shard 0).
+-- The inbox pages on fired_seq, drawn from alert_seq under the write lock
+-- when an alert fires: unlike fired_at it increases in commit order, and
+-- AUTOINCREMENT never hands out a number twice, even after the delete job
+-- removes the highest-numbered alert. alert_seq rows are deleted as soon
+-- as they are drawn.
+
+CREATE TABLE IF NOT EXISTS alerts (
+  id           TEXT PRIMARY KEY,
+  market_id    TEXT NOT NULL,
+  username     TEXT NOT NULL,
+  direction    TEXT NOT NULL CHECK (direction IN ('above', 'below')),
+  threshold    REAL NOT NULL CHECK (threshold > 0 AND threshold < 1),
+  status       TEXT NOT NULL DEFAULT 'armed' CHECK (status IN ('armed', 'fired', 'cancelled')),
+  created_at   TEXT NOT NULL,
+  fired_at     TEXT,
+  fired_price  REAL,
+  fired_seq    INTEGER
+);
+CREATE TABLE IF NOT EXISTS alert_seq (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT
+);
+-- The trigger index of a market is loaded from here
+CREATE INDEX IF NOT EXISTS idx_alerts_armed ON alerts(market_id, direction, threshold) WHERE status = 'armed';
+-- Inbox: a user's fired alerts in commit order
+CREATE INDEX IF NOT EXISTS idx_alerts_inbox ON alerts(username, fired_seq) WHERE status = 'fired';
+CREATE INDEX IF NOT EXISTS idx_alerts_user ON alerts(username, created_at);
@@ -0,0 +1,201 @@
+# backend/app/orders.py
+# ------------------------------------------------------------
+# Resting limit orders executed against the CPMM.
+# - An order is "buy <side> while that side's spot price <= limit, up to
+#   budget". The budget is escrowed when the order is placed, so a fill
+#   never has to check the owner's balance.
+# - Each market's open orders sit in an in-memory Book: one
+#   ThresholdIndex per side, keyed by limit price, built from `orders`
+#   and cached per worker under cache.ORDERBOOK. Writers publish that
+#   topic, so every worker reloads a book after it changes.
+# - sweep() runs after every fill, inside the same BEGIN IMMEDIATE
+#   transaction. It asks each side's index for orders with
+#   limit >= current price (O(log n + k)) and executes the most
+#   aggressive one through trading.fill. That moves the price, so it
+#   repeats until nothing is crossed. Rows are re-read under the write
+#   lock before filling, so a stale cached book can only cost a lookup.
+# - logic.max_spend_at_limit caps each fill at the spend where the price
+#   would pass the limit, so partial fills stop there.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import sqlite3, uuid
+from typing import Any, Dict, List, Optional
+from . import cache, trading
+from .db import market_conn
+from .logic import effective_pools, max_spend_at_limit, spot_price_no, spot_price_yes
+from .triggers import ThresholdIndex
+
+MAX_SWEEP_FILLS = 500    # per transaction; the rest wait for the next trade
+
+
+class Book:
+    """Open orders of one market. Read-only once built (it is shared via the cache)."""
+    __slots__ = ("sides", "remaining")
+
+    def __init__(self, rows):
+        entries: Dict[str, list] = {"YES": [], "NO": []}
+        self.remaining: Dict[str, int] = {}
+        for r in rows:
+            # Tiebreak -rowid: walking down from the best limit meets older orders first
+            entries[r["side"]].append((r["limit_price"], -r["rowid"], r["id"]))
+            self.remaining[r["id"]] = r["remaining_cents"]
+        self.sides = {s: ThresholdIndex(e) for s, e in entries.items()}
+
+    def __len__(self) -> int:
+        return len(self.remaining)
+
+    def depth(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Resting budget per limit price, best (highest) limit first."""
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        for side, idx in self.sides.items():
+            levels: List[Dict[str, Any]] = []
+            for limit, _, oid in idx.at_or_above(0.0):
+                if levels and levels[-1]["limit_price"] == limit:
+                    levels[-1]["budget_points"] += self.remaining[oid] / 100.0
+                    levels[-1]["orders"] += 1
+                else:
+                    levels.append({"limit_price": limit, "budget_points": self.remaining[oid] / 100.0, "orders": 1})
+            out[side] = levels
+        return out
+
+
+def book(market_id: str) -> Book:
+    """The market's committed open orders (cached per worker)."""
+    def load():
+        with market_conn(market_id) as c:
+            return Book(c.execute(
+                """
+                SELECT rowid, id, side, limit_price, remaining_cents
+                FROM orders WHERE market_id=? AND status='open'
+                """,
+                (market_id,),
+            ).fetchall())
+
+    return cache.cached(cache.ORDERBOOK, market_id, load)
+
+
+# --------------- execution (inside the writer's transaction) ---------------
+
+def execute(c: sqlite3.Connection, m: Dict[str, Any], order_id: str, now: str,
+            records: Optional[List[Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+    """Fill one open order as far as its limit allows. None if it can't fill."""
+    o = c.execute(
+        "SELECT username, side, limit_price, remaining_cents FROM orders WHERE id=? AND status='open'",
+        (order_id,),
+    ).fetchone()
+    if not o:
+        return None
+    y, n = effective_pools(m["yes_real_cents"], m["no_real_cents"], m["virt_yes_cents"], m["virt_no_cents"])
+    spend = int(min(o["remaining_cents"], max_spend_at_limit(o["side"], o["limit_price"], y, n)))
+    if spend <= 0:
+        return None
+
+    out = trading.fill(c, m, o["username"], o["side"], spend, now, order_id=order_id, records=records)
+    remaining = o["remaining_cents"] - spend
+    c.execute(
+        "UPDATE orders SET remaining_cents=?, status=?, updated_at=? WHERE id=?",
+        (remaining, "open" if remaining else "filled", now, order_id),
+    )
+    return {
+        "order_id": order_id,
+        "username": o["username"],
+        "side": o["side"],
+        "spend_points": spend / 100.0,
+        "shares_points": out["shares_points_issued"],
+        "price_yes_after": out["price_yes_after"],
+        "remaining_points": remaining / 100.0,
+    }
+
+
+def sweep(c: sqlite3.Connection, m: Dict[str, Any], now: str, max_fills: int = MAX_SWEEP_FILLS,
+          records: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Execute resting orders crossed by the market's current price, best
+    first. `records` as in trading.fill.
+    """
+    b = book(m["id"])
+    if not len(b):
+        return []
+    fills: List[Dict[str, Any]] = []
+    tried = set()
+    while len(fills) < max_fills:
+        y, n = effective_pools(m["yes_real_cents"], m["no_real_cents"], m["virt_yes_cents"], m["virt_no_cents"])
+        best = None
+        for side, price in (("YES", spot_price_yes(y, n)), ("NO", spot_price_no(y, n))):
+            for limit, age, oid in b.sides[side].at_or_above(price):
+                if oid in tried:
+                    continue
+                cand = (limit - price, age, oid)   # furthest through its limit, then oldest
+                if best is None or cand > best:
+                    best = cand
+                break
+        if best is None:
+            break
+        oid = best[2]
+        tried.add(oid)
+        f = execute(c, m, oid, now, records)
+        if f:
+            fills.append(f)
+    if fills:
+        cache.publish(c, cache.ORDERBOOK, m["id"])
+    return fills
+
+
+# --------------- place / cancel ---------------
+
+def place(c: sqlite3.Connection, market_id: str, username: str, side: str,
+          limit_price: float, budget_cents: int, now: str) -> str:
+    """Escrow the budget and insert the order. Caller checks market and balance."""
+    order_id = str(uuid.uuid4())
+    c.execute(
+        "UPDATE users SET balance_cents = balance_cents - ? WHERE username=?",
+        (budget_cents, username),
+    )
+    c.execute(
+        """
+        INSERT INTO orders (id, market_id, username, side, limit_price, budget_cents,
+                            remaining_cents, status, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'open', ?, ?)
+        """,
+        (order_id, market_id, username, side, limit_price, budget_cents, budget_cents, now, now),
+    )
+    cache.publish(c, cache.ORDERBOOK, market_id)
+    return order_id
+
+
+def cancel(c: sqlite3.Connection, order_id: str, username: str, now: str) -> Optional[int]:
+    """Cancel one of the user's open orders; returns the refunded cents, or None."""
+    o = c.execute(
+        "SELECT market_id, remaining_cents FROM orders WHERE id=? AND username=? AND status='open'",
+        (order_id, username),
+    ).fetchone()
+    if not o:
+        return None
+    c.execute("UPDATE orders SET status='cancelled', updated_at=? WHERE id=?", (now, order_id))
+    c.execute(
+        "UPDATE users SET balance_cents = balance_cents + ? WHERE username=?",
+        (o["remaining_cents"], username),
+    )
+    cache.publish(c, cache.ORDERBOOK, o["market_id"])
+    return o["remaining_cents"]
+
+
+def cancel_market(c: sqlite3.Connection, market_id: str, now: str) -> int:
+    """Cancel every open order of a market (close/delete); refunds in one UPDATE."""
+    c.execute(
+        """
+        UPDATE users SET balance_cents = balance_cents + o.refund
+        FROM (SELECT username, SUM(remaining_cents) AS refund
+              FROM orders WHERE market_id=? AND status='open' GROUP BY username) AS o
+        WHERE users.username = o.username
+        """,
+        (market_id,),
+    )
+    n = c.execute(
+        "UPDATE orders SET status='cancelled', updated_at=? WHERE market_id=? AND status='open'",
+        (now, market_id),
+    ).rowcount
+    if n:
+        cache.publish(c, cache.ORDERBOOK, market_id)
+    return n
@@ -0,0 +1,187 @@
+# backend/app/positions.py
+# ------------------------------------------------------------
+# Columnar in-memory index of binary-market positions.
+# - Each market's holders are one Holders block: parallel numpy arrays of
+#   interned user ids (int32) and YES / NO micro-shares (int64), 20 bytes
+#   per holder, ordered by username. Usernames are interned once per
+#   process (USERS), so blocks hold no Python objects per row.
+# - Blocks are cached per worker under cache.POSITIONS, which depends on
+#   cache.MARKET: every fill already publishes its market (trading.fill),
+#   so a block is dropped whenever place_bet or an order fill changes it
+#   and is rebuilt from `positions` on the next read, in every worker.
+# - Loading fetches plain tuples (no sqlite3.Row per holder); payouts and
+#   mark-to-market values are single vectorized passes over a block.
+# - Binary markets only; multi-outcome holdings live in outcome_positions
+#   and are priced by lmsr.py.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import sqlite3, threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from . import cache
+from .db import conn, market_conn, market_shards
+from .logic import SHARE_MICRO, allocate_pro_rata, effective_pools, spot_price_yes
+
+_I64_MAX = 2 ** 63 - 1
+
+
+class Interner:
+    """Stable str <-> int32 ids for this process."""
+    __slots__ = ("_ids", "_names", "_lock")
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def ids(self, names: Iterable[str]) -> np.ndarray:
+        with self._lock:
+            get, out = self._ids.get, []
+            for s in names:
+                i = get(s)
+                if i is None:
+                    i = self._ids[s] = len(self._names)
+                    self._names.append(s)
+                out.append(i)
+        return np.array(out, dtype=np.int32)
+
+    def name(self, i: int) -> str:
+        return self._names[i]
+
+
+USERS = Interner()
+
+
+class Holders:
+    """Positions of one market. Read-only once built (shared via the cache)."""
+    __slots__ = ("users", "yes", "no")
+
+    def __init__(self, rows: List[Tuple[str, int, int]]):
+        names, yes, no = zip(*rows) if rows else ((), (), ())
+        self.users = USERS.ids(names)
+        self.yes = np.array(yes, dtype=np.int64)
+        self.no = np.array(no, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def nbytes(self) -> int:
+        return self.users.nbytes + self.yes.nbytes + self.no.nbytes
+
+    def payouts(self, side: str, pool_cents: int) -> List[Tuple[str, int]]:
+        """
+        Split `pool_cents` pro-rata over the `side` shares, in username
+        order, exactly as logic.allocate_pro_rata does. Holders that get 0
+        are left out.
+        """
+        shares = self.yes if side == "YES" else self.no
+        held = np.flatnonzero(shares > 0)
+        w = shares[held]
+        if not len(w) or pool_cents <= 0:
+            return []
+        wmax = int(w.max())
+        if wmax * max(len(w), pool_cents) > _I64_MAX:
+            # pool * shares would overflow int64: Python ints (same result)
+            amounts = np.array(allocate_pro_rata(pool_cents, w.tolist()), dtype=np.int64)
+        else:
+            W = int(w.sum())
+            q, r = np.divmod(w * pool_cents, W)
+            left = pool_cents - int(q.sum())
+            # Largest remainder first, ties to the earlier holder (stable sort)
+            q[np.argsort(-r, kind="stable")[:left]] += 1
+            amounts = q
+        paid = np.flatnonzero(amounts > 0)
+        return [(USERS.name(u), int(a)) for u, a in zip(self.users[held[paid]], amounts[paid])]
+
+    def values(self, price_yes: float) -> np.ndarray:
+        """Mark-to-market value of every holder, in points, at `price_yes`."""
+        return (self.yes * price_yes + self.no * (1.0 - price_yes)) / SHARE_MICRO
+
+
+def holders(market_id: str, c: Optional[sqlite3.Connection] = None) -> Holders:
+    """The market's committed positions (cached per worker). `c`: a connection to its shard."""
+    def load():
+        if c is not None:
+            return _load(c, market_id)
+        with market_conn(market_id) as mc:
+            return _load(mc, market_id)
+
+    return cache.cached(cache.POSITIONS, market_id, load)
+
+
+def _load(c: sqlite3.Connection, market_id: str) -> Holders:
+    cur = c.cursor()
+    cur.row_factory = None
+    return Holders(cur.execute(
+        """
+        SELECT username, yes_shares_micro, no_shares_micro
+        FROM positions WHERE market_id=? ORDER BY username
+        """,
+        (market_id,),
+    ).fetchall())
+
+
+def mark_to_market(c: sqlite3.Connection, prices: Dict[str, float], out: np.ndarray) -> np.ndarray:
+    """
+    Add every holder's value in the markets of `prices` (market_id ->
+    price_yes, all on the shard of `c`) into `out`, indexed by interned
+    user id. Returns `out`, grown if new users were interned.
+    """
+    for market_id, price in prices.items():
+        h = holders(market_id, c)
+        if not len(h):
+            continue
+        if len(USERS) > len(out):
+            out = np.concatenate([out, np.zeros(len(USERS) - len(out))])
+        out += np.bincount(h.users, weights=h.values(price), minlength=len(out))
+    return out
+
+
+def leaderboard(limit: int) -> List[Dict[str, Any]]:
+    """
+    Users by net worth: balance plus open binary positions marked at the
+    current price. One bincount per market, then a partial sort.
+    """
+    held = np.zeros(len(USERS))
+    for k in market_shards():
+        with market_conn(shard=k) as c:
+            prices = {
+                r[0]: spot_price_yes(*effective_pools(r[1], r[2], r[3], r[4]))
+                for r in c.execute(
+                    """
+                    SELECT id, yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents
+                    FROM markets WHERE kind='binary' AND settled=0
+                    """
+                )
+            }
+            held = mark_to_market(c, prices, held)
+
+    with conn() as c:
+        cur = c.cursor()
+        cur.row_factory = None
+        rows = cur.execute("SELECT username, balance_cents FROM users").fetchall()
+    names, cents = zip(*rows) if rows else ((), ())
+    uids = USERS.ids(names)
+    # One size for every array: other requests may intern users meanwhile
+    n = len(USERS)
+    held = np.concatenate([held, np.zeros(n - len(held))])
+    balance = np.zeros(n)
+    balance[uids] = np.array(cents, dtype=np.int64) / 100.0
+    worth = balance + held
+
+    # Only current users rank (a deleted user may still be interned)
+    users = np.zeros(n, dtype=bool)
+    users[uids] = True
+    idx = np.flatnonzero(users)
+    if limit < len(idx):
+        idx = idx[np.argpartition(-worth[idx], limit)[:limit]]
+    idx = idx[np.argsort(-worth[idx], kind="stable")]
+    return [
+        {"username": USERS.name(int(i)), "net_worth_points": round(float(worth[i]), 2),
+         "balance_points": float(balance[i]), "positions_points": round(float(held[i]), 2)}
+        for i in idx
+    ]
@@ -0,0 +1,96 @@
+# backend/app/ratelimit.py
+# ------------------------------------------------------------
+# In-process token-bucket admission control.
+# - One bucket per (route class, caller). Route classes have separate
+#   budgets so a flood of reads can't starve bets and vice versa:
+#     read  -> keyed by client address (reads are anonymous)
+#     bet   -> keyed by username (from the bearer token)
+#     admin -> keyed by client address
+# - A bucket holds up to `burst` tokens and refills at `rate` tokens/s.
+#   Each request takes one token; an empty bucket answers 429 with a
+#   Retry-After header telling the client when a token will be back.
+# - Bookkeeping is two floats per bucket under one lock. Idle buckets
+#   (already refilled to full) are dropped when the table grows large.
+# - Limits are per worker process: with N workers the effective budget
+#   per caller is up to N times the configured one.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import math, threading, time
+from typing import Dict, List, NamedTuple, Tuple
+from fastapi import Depends, HTTPException, Request
+from .auth import get_current_username
+from .config import RATE_LIMITS_ENABLED, RATE_READ, RATE_BET, RATE_ADMIN
+
+MAX_BUCKETS = 100_000
+
+
+class Budget(NamedTuple):
+    rate: float    # tokens per second
+    burst: float   # bucket capacity
+
+
+BUDGETS: Dict[str, Budget] = {
+    "read":  Budget(*RATE_READ),
+    "bet":   Budget(*RATE_BET),
+    "admin": Budget(*RATE_ADMIN),
+}
+
+_lock = threading.Lock()
+_buckets: Dict[Tuple[str, str], List[float]] = {}  # -> [tokens, last_refill]
+
+
+def _prune(now: float) -> None:
+    """Drop buckets that have refilled to capacity (indistinguishable from new)."""
+    for k in [k for k, (tokens, last) in _buckets.items()
+              if tokens + (now - last) * BUDGETS[k[0]].rate >= BUDGETS[k[0]].burst]:
+        del _buckets[k]
+
+
+def take(route_class: str, key: str) -> float:
+    """Take one token. Returns 0.0 if admitted, else seconds until a token is available."""
+    budget = BUDGETS[route_class]
+    now = time.monotonic()
+    with _lock:
+        b = _buckets.get((route_class, key))
+        if b is None:
+            if len(_buckets) >= MAX_BUCKETS:
+                _prune(now)
+            b = _buckets[(route_class, key)] = [budget.burst, now]
+        else:
+            b[0] = min(budget.burst, b[0] + (now - b[1]) * budget.rate)
+            b[1] = now
+        if b[0] >= 1.0:
+            b[0] -= 1.0
+            return 0.0
+        return (1.0 - b[0]) / budget.rate
+
+
+def check(route_class: str, key: str) -> None:
+    if not RATE_LIMITS_ENABLED:
+        return
+    wait = take(route_class, key)
+    if wait > 0:
+        raise HTTPException(
+            429,
+            f"rate limit exceeded for {route_class}",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+
+def _client(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+# --------------- FastAPI dependencies ---------------
+
+def limit_reads(request: Request) -> None:
+    check("read", _client(request))
+
+
+def limit_admin(request: Request) -> None:
+    check("admin", _client(request))
+
+
+def limit_bets(username: str = Depends(get_current_username)) -> None:
+    check("bet", username)
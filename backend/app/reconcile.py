@@ -0,0 +1,397 @@
+# backend/app/reconcile.py
+# ------------------------------------------------------------
+# Ledger reconciliation with incrementally maintained aggregates.
+# - record_bet / record_payout run inside the writer's transaction and
+#   bump per-market and per-user running totals plus a checksum, marking
+#   the rows dirty.
+# - verify() only visits dirty rows (partial index), so a routine check
+#   costs O(changed markets + changed users), not a rescan of `bets`.
+# - Invariants checked per market:
+#     markets.<side>_real_cents == sum of bets on that side
+#     ledger rows still add up to the aggregate (deep: sums + checksum)
+#     settled with winning holders -> total payout == winning pool
+#     (LMSR markets: total payout == winning shares at par)
+#   and per user: ledger spend/count/checksum match, balance >= 0.
+# - With market shards, verify_all() checks each shard's markets there and
+#   re-sums every user's ledger across all shards. The reconcile job
+#   (jobs.py) runs the same checks in pages with verify_chunk().
+# - The checksum is a sum of per-bet hashes mod 2^61-1, so it is
+#   order-independent and can be updated with one addition per bet.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import hashlib, sqlite3
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from . import archive, db, lmsr
+
+MOD = (1 << 61) - 1
+
+
+def bet_hash(bet_id: str, side: str, amount_cents: int) -> int:
+    """40-bit fingerprint of one ledger row."""
+    d = hashlib.blake2b(f"{bet_id}|{side}|{amount_cents}".encode(), digest_size=5).digest()
+    return int.from_bytes(d, "big")
+
+
+# --------------- incremental hooks (call inside write txns) ---------------
+
+def record_bet(c: sqlite3.Connection, market_id: str, username: str,
+               bet_id: str, side: str, spend_cents: int) -> None:
+    record_bet_market(c, market_id, bet_id, side, spend_cents)
+    record_bet_user(c, username, bet_id, side, spend_cents)
+
+
+def record_bet_market(c: sqlite3.Connection, market_id: str,
+                      bet_id: str, side: str, spend_cents: int) -> None:
+    """Market half of record_bet (runs on the market's shard)."""
+    yes = spend_cents if side == "YES" else 0
+    no = spend_cents if side == "NO" else 0
+    c.execute(
+        """
+        INSERT INTO recon_markets (market_id, yes_bets_cents, no_bets_cents, bet_count, checksum, dirty)
+        VALUES (?, ?, ?, 1, ?, 1)
+        ON CONFLICT(market_id) DO UPDATE SET
+          yes_bets_cents = yes_bets_cents + excluded.yes_bets_cents,
+          no_bets_cents  = no_bets_cents  + excluded.no_bets_cents,
+          bet_count      = bet_count + 1,
+          checksum       = (checksum + excluded.checksum) % ?,
+          dirty          = 1
+        """,
+        (market_id, yes, no, bet_hash(bet_id, side, spend_cents), MOD),
+    )
+
+
+def record_bet_user(c: sqlite3.Connection, username: str,
+                    bet_id: str, side: str, spend_cents: int) -> None:
+    """User half of record_bet (runs on the home DB)."""
+    c.execute(
+        """
+        INSERT INTO recon_users (username, spent_cents, bet_count, checksum, dirty)
+        VALUES (?, ?, 1, ?, 1)
+        ON CONFLICT(username) DO UPDATE SET
+          spent_cents = spent_cents + excluded.spent_cents,
+          bet_count   = bet_count + 1,
+          checksum    = (checksum + excluded.checksum) % ?,
+          dirty       = 1
+        """,
+        (username, spend_cents, bet_hash(bet_id, side, spend_cents), MOD),
+    )
+
+
+def record_payout(c: sqlite3.Connection, username: str, pay_cents: int) -> None:
+    c.execute(
+        """
+        INSERT INTO recon_users (username, paid_cents, dirty) VALUES (?, ?, 1)
+        ON CONFLICT(username) DO UPDATE SET paid_cents = paid_cents + excluded.paid_cents, dirty = 1
+        """,
+        (username, pay_cents),
+    )
+
+
+def record_payouts(c: sqlite3.Connection, rows_sql: str, args: tuple) -> None:
+    """Set-based record_payout: `rows_sql` selects (username, pay_cents)."""
+    c.execute(
+        f"""
+        INSERT INTO recon_users (username, paid_cents, dirty)
+        SELECT username, pay_cents, 1 FROM ({rows_sql}) WHERE pay_cents > 0
+        ON CONFLICT(username) DO UPDATE SET paid_cents = paid_cents + excluded.paid_cents, dirty = 1
+        """,
+        args,
+    )
+
+
+def record_settlement(c: sqlite3.Connection, market_id: str, total_paid_cents: int) -> None:
+    c.execute(
+        """
+        INSERT INTO recon_markets (market_id, paid_cents, dirty) VALUES (?, ?, 1)
+        ON CONFLICT(market_id) DO UPDATE SET paid_cents = excluded.paid_cents, dirty = 1
+        """,
+        (market_id, total_paid_cents),
+    )
+
+
+def forget_bets(c: sqlite3.Connection, market_id: str, limit: int) -> int:
+    """
+    Back up to `limit` of a market's bets out of the user aggregates and
+    delete them (market deletion, in chunks). Returns the rows removed.
+    """
+    rows = c.execute(
+        "SELECT id, username, side, amount_cents FROM bets WHERE market_id=? LIMIT ?", (market_id, limit)
+    ).fetchall()
+    per_user: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0])  # spent, count, hash
+    for r in rows:
+        acc = per_user[r[1]]
+        acc[0] += r[3]
+        acc[1] += 1
+        acc[2] = (acc[2] + bet_hash(r[0], r[2], r[3])) % MOD
+    c.executemany(
+        """
+        UPDATE recon_users
+           SET spent_cents = spent_cents - ?, bet_count = bet_count - ?,
+               checksum = (checksum - ? + ?) % ?, dirty = 1
+         WHERE username=?
+        """,
+        [(s, n, h, MOD, MOD, u) for u, (s, n, h) in per_user.items()],
+    )
+    c.executemany("DELETE FROM bets WHERE id=?", [(r[0],) for r in rows])
+    return len(rows)
+
+
+def forget_market(c: sqlite3.Connection, market_id: str) -> None:
+    """Drop a deleted market's aggregate row (after forget_bets removed its bets)."""
+    c.execute("DELETE FROM recon_markets WHERE market_id=?", (market_id,))
+
+
+# --------------- verification ---------------
+
+def _ledger(conns: Sequence[sqlite3.Connection], where: str, arg: str) -> Dict[str, int]:
+    """
+    Re-sum ledger rows over `conns` (one per market shard), including
+    archived ones where the archive is attached.
+    """
+    out = {"YES": 0, "NO": 0, "count": 0, "checksum": 0}
+    for c in conns:
+        sql, parts = archive.union_sql(
+            f"SELECT id, side, amount_cents FROM {{db}}.bets WHERE {where}=?", archive.is_attached(c)
+        )
+        for r in c.execute(sql, (arg,) * parts):
+            out[r[1]] += r[2]
+            out["count"] += 1
+            out["checksum"] = (out["checksum"] + bet_hash(r[0], r[1], r[2])) % MOD
+    return out
+
+
+def _problem(problems: List[Dict[str, Any]], kind: str, key: str, check: str,
+             expected: Any, actual: Any) -> None:
+    problems.append({"kind": kind, "id": key, "check": check,
+                     "expected": expected, "actual": actual})
+
+
+def _check_market(c: sqlite3.Connection, r: sqlite3.Row, deep: bool,
+                  problems: List[Dict[str, Any]]) -> bool:
+    before = len(problems)
+    mid = r["market_id"]
+    if r["yes_real_cents"] != r["yes_bets_cents"]:
+        _problem(problems, "market", mid, "pool_yes", r["yes_bets_cents"], r["yes_real_cents"])
+    if r["no_real_cents"] != r["no_bets_cents"]:
+        _problem(problems, "market", mid, "pool_no", r["no_bets_cents"], r["no_real_cents"])
+
+    if deep:
+        led = _ledger((c,), "market_id", mid)
+        for check, agg, actual in (
+            ("ledger_yes", r["yes_bets_cents"], led["YES"]),
+            ("ledger_no", r["no_bets_cents"], led["NO"]),
+            ("ledger_count", r["bet_count"], led["count"]),
+            ("ledger_checksum", r["checksum"], led["checksum"]),
+        ):
+            if agg != actual:
+                _problem(problems, "market", mid, check, agg, actual)
+
+    if r["settled"] and r["paid_cents"] is not None and r["kind"] == "lmsr":
+        # Par payout: expected total is the winning shares, floored per holder.
+        expected = c.execute(
+            f"SELECT COALESCE(SUM(pay_cents), 0) FROM ({lmsr.PAYOUTS_SQL})", (mid, r["winner_idx"])
+        ).fetchone()[0]
+        if r["paid_cents"] != expected:
+            _problem(problems, "market", mid, "payout_eq_shares", expected, r["paid_cents"])
+    elif r["settled"] and r["paid_cents"] is not None:
+        col = "yes_shares_micro" if r["winner"] == "YES" else "no_shares_micro"
+        pool = r["yes_real_cents"] if r["winner"] == "YES" else r["no_real_cents"]
+        holders = c.execute(
+            f"SELECT COUNT(*) FROM positions WHERE market_id=? AND {col} > 0", (mid,)
+        ).fetchone()[0]
+        expected = pool if holders else 0
+        if r["paid_cents"] != expected:
+            _problem(problems, "market", mid, "payout_eq_pool", expected, r["paid_cents"])
+    return len(problems) == before
+
+
+def _check_user(ledgers: Sequence[sqlite3.Connection], r: sqlite3.Row, deep: bool,
+                problems: List[Dict[str, Any]]) -> bool:
+    before = len(problems)
+    u = r["username"]
+    if r["balance_cents"] is None:
+        _problem(problems, "user", u, "user_exists", True, False)
+    elif r["balance_cents"] < 0:
+        _problem(problems, "user", u, "balance_non_negative", 0, r["balance_cents"])
+    if deep:
+        led = _ledger(ledgers, "username", u)
+        for check, agg, actual in (
+            ("ledger_spent", r["spent_cents"], led["YES"] + led["NO"]),
+            ("ledger_count", r["bet_count"], led["count"]),
+            ("ledger_checksum", r["checksum"], led["checksum"]),
+        ):
+            if agg != actual:
+                _problem(problems, "user", u, check, agg, actual)
+    return len(problems) == before
+
+
+def _page(where: List[str], key: str, after: Optional[str], limit: Optional[int]) -> Tuple[str, tuple]:
+    """WHERE / ORDER BY / LIMIT of a verification pass, optionally one page after `after`."""
+    args: tuple = ()
+    if after is not None:
+        where = where + [f"{key} > ?"]
+        args += (after,)
+    sql = (f"WHERE {' AND '.join(where)} " if where else "") + f"ORDER BY {key}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        args += (limit,)
+    return sql, args
+
+
+def _verify_markets(c: sqlite3.Connection, full: bool, deep: bool, problems: List[Dict[str, Any]],
+                    after: Optional[str] = None, limit: Optional[int] = None) -> Tuple[int, Optional[str]]:
+    """Check market aggregates (a page of them with `limit`); returns (checked, last market_id)."""
+    page, args = _page([] if full else ["r.dirty=1"], "r.market_id", after, limit)
+    markets = c.execute(
+        f"""
+        SELECT r.*, m.yes_real_cents, m.no_real_cents, m.settled, m.winner, m.kind, m.winner_idx
+        FROM recon_markets r JOIN markets m ON m.id = r.market_id
+        {page}
+        """,
+        args,
+    ).fetchall()
+    clean = [r["market_id"] for r in markets if _check_market(c, r, deep, problems)]
+
+    if full and after is None:
+        # Markets with money in them but no aggregate row (not backfilled).
+        for r in c.execute(
+            """
+            SELECT m.id FROM markets m LEFT JOIN recon_markets r ON r.market_id = m.id
+            WHERE r.market_id IS NULL AND (m.yes_real_cents > 0 OR m.no_real_cents > 0)
+            """
+        ):
+            _problem(problems, "market", r["id"], "aggregate_exists", True, False)
+
+    c.executemany("UPDATE recon_markets SET dirty=0 WHERE market_id=?", [(m,) for m in clean])
+    return len(markets), markets[-1]["market_id"] if markets else None
+
+
+def _verify_users(c: sqlite3.Connection, ledgers: Sequence[sqlite3.Connection], full: bool,
+                  deep: bool, problems: List[Dict[str, Any]],
+                  after: Optional[str] = None, limit: Optional[int] = None) -> Tuple[int, Optional[str]]:
+    """Check user aggregates (a page of them with `limit`); returns (checked, last username)."""
+    page, args = _page([] if full else ["r.dirty=1"], "r.username", after, limit)
+    users = c.execute(
+        f"""
+        SELECT r.*, u.balance_cents
+        FROM recon_users r LEFT JOIN users u ON u.username = r.username
+        {page}
+        """,
+        args,
+    ).fetchall()
+    clean = [r["username"] for r in users if _check_user(ledgers, r, deep, problems)]
+    c.executemany("UPDATE recon_users SET dirty=0 WHERE username=?", [(u,) for u in clean])
+    return len(users), users[-1]["username"] if users else None
+
+
+def verify(c: sqlite3.Connection, full: bool = False, deep: bool = True) -> Dict[str, Any]:
+    """
+    Check invariants for dirty aggregates (or all of them with full=True).
+    Rows that pass are marked clean; failing rows stay dirty and are
+    reported again next time. Single database: see verify_all for shards.
+    """
+    problems: List[Dict[str, Any]] = []
+    markets, _ = _verify_markets(c, full, deep, problems)
+    users, _ = _verify_users(c, (c,), full, deep, problems)
+    return _report(markets, users, problems)
+
+
+def verify_all(full: bool = False, deep: bool = True) -> Dict[str, Any]:
+    """
+    verify() across market shards: markets are checked on their own shard,
+    users on the home DB (shard 0) with their ledger re-summed over every
+    shard. Archives are attached where they exist.
+    """
+    problems: List[Dict[str, Any]] = []
+    markets = 0
+    with db.shard_conns() as shards:
+        for s in shards:
+            archive.attach(s)
+            markets += _verify_markets(s, full, deep, problems)[0]
+        users, _ = _verify_users(shards[0], shards, full, deep, problems)
+    return _report(markets, users, problems)
+
+
+def verify_chunk(state: Dict[str, Any], full: bool, deep: bool, limit: int) -> Optional[Dict[str, Any]]:
+    """
+    One bounded piece of verify_all, for the reconcile job: up to `limit`
+    markets of one shard, or (after every shard) up to `limit` users.
+    Progress and problems accumulate in `state` (JSON); each piece commits
+    its clean marks on its own. Returns the report once everything is checked.
+    """
+    problems = state.setdefault("problems", [])
+    k = state.setdefault("shard", 0)
+    if k < db.SHARD_COUNT:
+        with db.market_conn(shard=k) as s:
+            archive.attach(s)
+            n, last = _verify_markets(s, full, deep, problems, state.get("after"), limit)
+        state["markets"] = state.get("markets", 0) + n
+        state["shard"], state["after"] = (k, last) if n == limit else (k + 1, None)
+        return None
+    with db.shard_conns() as shards:
+        for s in shards:
+            archive.attach(s)
+        n, last = _verify_users(shards[0], shards, full, deep, problems, state.get("after"), limit)
+    state["users"] = state.get("users", 0) + n
+    state["after"] = last
+    if n == limit:
+        return None
+    return _report(state.get("markets", 0), state["users"], problems)
+
+
+def _report(markets: int, users: int, problems: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "ok": not problems,
+        "markets_checked": markets,
+        "users_checked": users,
+        "problems": problems,
+    }
+
+
+def rebuild(c: sqlite3.Connection) -> Dict[str, int]:
+    """
+    Recompute every aggregate from the ledger (one full scan). Needed once
+    after migration 0008 and after any manual ledger surgery. Recorded
+    payouts cannot be recovered from `bets` and are reset to unknown.
+    Archived bets count towards user totals (archived markets have no
+    aggregate row), so a database with an archive must have it attached.
+    """
+    attached = archive.is_attached(c)
+    if not attached and archive.exists(c):
+        raise RuntimeError("the database has an archive: attach it (archive.attach) before rebuilding")
+    mk: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0, 0])  # yes, no, count, hash
+    us: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0])     # spent, count, hash
+    sql, _ = archive.union_sql(
+        "SELECT id, market_id, username, side, amount_cents, '{db}' FROM {db}.bets", attached
+    )
+    for bid, mid, user, side, amt, tier in c.execute(sql):
+        h = bet_hash(bid, side, amt)
+        if tier == "main":
+            m = mk[mid]
+            m[0 if side == "YES" else 1] += amt
+            m[2] += 1
+            m[3] = (m[3] + h) % MOD
+        u = us[user]
+        u[0] += amt
+        u[1] += 1
+        u[2] = (u[2] + h) % MOD
+
+    c.execute("DELETE FROM recon_markets")
+    c.execute("DELETE FROM recon_users")
+    c.executemany(
+        """
+        INSERT INTO recon_markets (market_id, yes_bets_cents, no_bets_cents, bet_count, checksum, dirty)
+        VALUES (?, ?, ?, ?, ?, 1)
+        """,
+        [(mid, *v) for mid, v in mk.items()],
+    )
+    c.executemany(
+        """
+        INSERT INTO recon_users (username, spent_cents, bet_count, checksum, dirty)
+        VALUES (?, ?, ?, ?, 1)
+        """,
+        [(u, *v) for u, v in us.items()],
+    )
+    return {"markets": len(mk), "users": len(us)}
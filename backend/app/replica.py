@@ -0,0 +1,120 @@
+# backend/app/replica.py
+# ------------------------------------------------------------
+# Read-only snapshot copies of the database files for reporting.
+# - refresh() copies a shard file to db.replica_path() with the sqlite3
+#   online backup API. It copies into a temp file and then os.replace()s
+#   it over the replica, so open readers keep their old snapshot and new
+#   ones get the fresh one. The temp file's mtime is set to when the copy
+#   started: that is the replica's age for every process (db.replica_age).
+# - The copy runs in steps of PAGES_PER_STEP with a pause between them,
+#   so writers are only blocked for one step at a time. A commit by
+#   another connection restarts the backup; if that keeps happening for
+#   INCREMENTAL_S, the rest is copied in one step.
+# - A daemon thread refreshes every REPLICA_REFRESH_S. One process does
+#   the copy (flock on a lock file); the others see the new mtime and
+#   skip. Reads fall back to the live DB once the replica is older than
+#   REPLICA_MAX_STALENESS_S, so staleness is bounded even if refreshing
+#   stalls.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import fcntl, os, sqlite3, threading, time
+from typing import Any, Dict, List, Optional
+from . import db
+from .config import REPLICA_REFRESH_S
+
+PAGES_PER_STEP = 1024      # ~4 MB with the default page size
+STEP_SLEEP_S = 0.005
+INCREMENTAL_S = 30.0
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+class _Restarting(Exception):
+    pass
+
+
+def refresh(shard: int = 0) -> Optional[float]:
+    """
+    Copy shard `shard` to its replica. Returns the copy's duration in
+    seconds, or None if another process is copying it right now.
+    """
+    dst_path = db.replica_path(shard)
+    with open(dst_path + ".lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        tmp = dst_path + ".tmp"
+        started = time.time()
+        db.ensure_shard(shard)
+        src = db.connect_readonly(db.shard_path(shard))
+        dst = sqlite3.connect(tmp)
+        try:
+            def progress(status, remaining, total):
+                if time.time() - started > INCREMENTAL_S:
+                    raise _Restarting()
+            try:
+                src.backup(dst, pages=PAGES_PER_STEP, progress=progress, sleep=STEP_SLEEP_S)
+            except _Restarting:
+                src.backup(dst, pages=-1)
+        finally:
+            dst.close()
+            src.close()
+        os.utime(tmp, (started, started))
+        os.replace(tmp, dst_path)
+        return time.time() - started
+
+
+def refresh_due(interval_s: float = REPLICA_REFRESH_S) -> List[int]:
+    """Refresh every shard whose replica is missing or older than `interval_s`."""
+    done = []
+    for k in db.market_shards():
+        age = db.replica_age(k)
+        if age is None or age >= interval_s:
+            if refresh(k) is not None:
+                done.append(k)
+    return done
+
+
+def status() -> List[Dict[str, Any]]:
+    out = []
+    for k in db.market_shards():
+        path = db.replica_path(k)
+        out.append({
+            "shard": k,
+            "path": path,
+            "age_s": db.replica_age(k),
+            "size": os.path.getsize(path) if os.path.exists(path) else 0,
+        })
+    return out
+
+
+# --------------- refresher thread ---------------
+
+def _loop() -> None:
+    while not _stop.is_set():
+        try:
+            refresh_due()
+        except (OSError, sqlite3.Error):
+            pass    # e.g. disk full: reads fall back to the live DB once stale
+        _stop.wait(min(1.0, REPLICA_REFRESH_S))
+
+
+def start() -> None:
+    """Start the refresher (app startup) when REPLICA_REFRESH_S > 0."""
+    global _thread
+    if REPLICA_REFRESH_S <= 0 or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="replica-refresh", daemon=True)
+    _thread.start()
+
+
+def stop(timeout: float = 10.0) -> None:
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout)
+        _thread = None
@@ -1,16 +1,23 @@
 # backend/app/routers/admin.py
 # Admin utilities: list users/markets/bets, close/settle markets, (optional) delete markets.
+# Settle and delete run as chunked jobs (app/jobs.py); ?background=true returns the job.
 
 from __future__ import annotations
+import datetime as dt
 from typing import Optional
 from fastapi import APIRouter, HTTPException, Header, Query
-from ..db import conn, DB_PATH
-from ..config import ADMIN_TOKEN
-from ..logic import effective_pools, odds_from_pools, implied_payout_per1_spot
+from fastapi.responses import StreamingResponse
+from ..db import map_shards, market_conn, market_shards, read_conn, shard_of, shard_path, DB_PATH, SHARD_COUNT
+from .. import analytics, archive, cache, escrow, export, jobs, orders, positions, reconcile, replica, singleflight
+from ..config import ADMIN_TOKEN, ESCROW_RECOVER_AFTER_S
+from ..logic import effective_pools, odds_from_pools, implied_payout_per1_spot, spot_price_yes
 from ..schemas.markets import SettleReq
+from ..formats import MARKET_COLUMNS, check_format, render
 
 router = APIRouter()
 
+BET_COLUMNS = ("id", "market_id", "question", "username", "side", "spend_points", "created_at")
+
 # --------- helpers ---------
 
 def _require_admin(token: Optional[str]):
@@ -22,25 +29,31 @@ def _require_admin(token: Optional[str]):
 
 @router.get("/users")
 def list_users(
-    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token")
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+    fmt: Optional[str] = Query(default=None, alias="format"),
 ):
     _require_admin(x_admin_token)
-    with conn() as c:
+    fmt = check_format(fmt)
+    with read_conn() as c:
         rows = c.execute(
             "SELECT username, balance_cents FROM users ORDER BY balance_cents DESC, username ASC"
         ).fetchall()
-    return [
+    out = [
         {"username": r["username"], "balance_points": r["balance_cents"] / 100.0}
         for r in rows
     ]
+    return render(out, fmt, ("username", "balance_points"))
 
 
 @router.get("/markets")
 def list_markets_admin(
     x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
-    status: Optional[str] = Query(default=None)  # open | closed | settled | None
+    status: Optional[str] = Query(default=None),  # open | closed | settled | None
+    fmt: Optional[str] = Query(default=None, alias="format"),
+    include_archive: bool = Query(default=False, description="also list archived (settled) markets"),
 ):
     _require_admin(x_admin_token)
+    fmt = check_format(fmt)
 
     where = []
     if status == "open":
@@ -51,16 +64,21 @@ def list_markets_admin(
         where.append("settled=1")
     where_sql = f"WHERE {' AND '.join(where)}" if where else ""
 
-    with conn() as c:
-        rows = c.execute(
+    def load(c):
+        sql, _ = archive.union_sql(
             f"""
             SELECT id, question, closes_at, open, settled, winner,
                    yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents
-            FROM markets
+            FROM {{db}}.markets
             {where_sql}
-            ORDER BY closes_at ASC
-            """
-        ).fetchall()
+            """,
+            include_archive and archive.attach(c),
+        )
+        return c.execute(f"{sql} ORDER BY closes_at ASC").fetchall()
+
+    rows = [r for part in map_shards(load, read=True) for r in part]
+    if SHARD_COUNT > 1:
+        rows.sort(key=lambda r: r["closes_at"])
 
     out = []
     for r in rows:
@@ -77,30 +95,37 @@ def list_markets_admin(
             "yes_pool_points": r["yes_real_cents"] / 100.0,
             "no_pool_points":  r["no_real_cents"]  / 100.0,
             "odds": odds_from_pools(y_eff, n_eff),
+            "price_yes": spot_price_yes(y_eff, n_eff),
             "implied_payout_per1_spot": implied_payout_per1_spot(y_eff, n_eff),
         })
-    return out
+    return render(out, fmt, MARKET_COLUMNS)
 
 
 @router.get("/bets")
 def list_bets_admin(
     x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
-    limit: int = Query(default=100, ge=1, le=1000)
+    limit: int = Query(default=100, ge=1, le=1000),
+    fmt: Optional[str] = Query(default=None, alias="format"),
+    include_archive: bool = Query(default=False, description="also include bets on archived markets"),
 ):
     _require_admin(x_admin_token)
-    with conn() as c:
-        rows = c.execute(
+    fmt = check_format(fmt)
+    def load(c):
+        sql, _ = archive.union_sql(
             """
             SELECT b.id, b.market_id, b.username, b.side, b.amount_cents, b.created_at,
                    m.question
-            FROM bets b
-            LEFT JOIN markets m ON m.id = b.market_id
-            ORDER BY b.created_at DESC
-            LIMIT ?
+            FROM {db}.bets b
+            LEFT JOIN {db}.markets m ON m.id = b.market_id
             """,
-            (limit,),
-        ).fetchall()
-    return [
+            include_archive and archive.attach(c),
+        )
+        return c.execute(f"{sql} ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+
+    rows = [r for part in map_shards(load, read=True) for r in part]
+    if SHARD_COUNT > 1:
+        rows = sorted(rows, key=lambda r: r["created_at"], reverse=True)[:limit]
+    out = [
         {
             "id": r["id"],
             "market_id": r["market_id"],
@@ -112,6 +137,7 @@ def list_bets_admin(
         }
         for r in rows
     ]
+    return render(out, fmt, BET_COLUMNS)
 
 
 # --------- ACTIONS ---------
@@ -122,14 +148,34 @@ def close_market(
     x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
 ):
     _require_admin(x_admin_token)
-    with conn() as c:
+    with market_conn(market_id, home=True) as c:
         cur = c.execute(
             "UPDATE markets SET open=0 WHERE id=? AND open=1 AND settled=0",
             (market_id,),
         )
         if cur.rowcount == 0:
             raise HTTPException(404, "market not found, already closed, or already settled")
-    return {"ok": True}
+        # Resting limit orders can't fill any more: refund their escrow
+        cancelled = orders.cancel_market(c, market_id, dt.datetime.utcnow().isoformat())
+        cache.publish_market(c, market_id)
+    return {"ok": True, "orders_cancelled": cancelled}
+
+
+def _enqueue(kind: str, params: dict, **kw) -> str:
+    """jobs.enqueue, with a job already doing something else to this target as a 409."""
+    try:
+        return jobs.enqueue(kind, params, **kw)
+    except jobs.JobConflict as e:
+        raise HTTPException(409, str(e))
+
+
+def _job_response(job: dict, background: bool) -> dict:
+    """The job's result if it finished here, else the job for polling /admin/jobs/{id}."""
+    if background or job["status"] in ("queued", "running"):
+        return {"ok": True, "job": job}
+    if job["status"] == "failed":
+        raise HTTPException(500, f"{job['kind']} failed: {job['error']}")
+    return job["result"]
 
 
 @router.post("/markets/{market_id}/settle")
@@ -137,73 +183,45 @@ def settle_market(
     market_id: str,
     req: SettleReq,
     x_admin_token: str = Header(default="", alias="X-Admin-Token"),
+    background: bool = Query(default=False, description="return a job to poll instead of waiting"),
 ):
+    """
+    Pay out a closed market. Runs as a `settle` job (app/jobs.py): payouts
+    are applied in chunks of short transactions, so trading on other
+    markets continues during a large settlement. A settlement that stopped
+    part-way is resumed by settling again with the same winner; another
+    winner, or a delete job on the market, is a 409.
+    """
     _require_admin(x_admin_token)
     winner = req.winner  # "YES" or "NO"
 
-    with conn() as c:
-        # Load market (must be closed & not yet settled)
-        m = c.execute(
-            """
-            SELECT open, settled,
-                   yes_real_cents, no_real_cents
-            FROM markets WHERE id=?
-            """,
-            (market_id,),
-        ).fetchone()
-
+    with market_conn(market_id) as c:
+        # Market must be closed & not yet settled
+        m = c.execute("SELECT open, settled, kind FROM markets WHERE id=?", (market_id,)).fetchone()
         if not m:
             raise HTTPException(404, "market not found")
         if bool(m["open"]):
             raise HTTPException(400, "close market before settlement")
-        if bool(m["settled"]):
-            return {"ok": True, "winner": winner, "total_paid_points": 0.0}
-
-        # Determine winner-side shares column
-        if winner == "YES":
-            shares_col = "yes_shares_points"
-            pool_cents = m["yes_real_cents"]
+        if m["kind"] == "lmsr":
+            if req.winner_idx is None:
+                raise HTTPException(400, "winner_idx required for a multi-outcome market")
+            if bool(m["settled"]):
+                return {"ok": True, "winner_idx": req.winner_idx, "total_paid_points": 0.0}
+            if not c.execute(
+                "SELECT 1 FROM market_outcomes WHERE market_id=? AND idx=?", (market_id, req.winner_idx)
+            ).fetchone():
+                raise HTTPException(400, "winner_idx is not an outcome of this market")
+            params = {"market_id": market_id, "winner_idx": req.winner_idx}
         else:
-            shares_col = "no_shares_points"
-            pool_cents = m["no_real_cents"]
-
-        # Sum total winner shares (in *points*, float)
-        row = c.execute(
-            f"SELECT COALESCE(SUM({shares_col}), 0.0) AS total_shares FROM positions WHERE market_id=?",
-            (market_id,),
-        ).fetchone()
-        total_winner_shares_points = row["total_shares"] or 0.0
-
-        total_paid_cents = 0
-
-        if total_winner_shares_points > 0 and pool_cents > 0:
-            # Pay each holder pro-rata from the real pool (points = dollars)
-            holders = c.execute(
-                f"""
-                SELECT username, {shares_col} AS sh
-                FROM positions
-                WHERE market_id=? AND {shares_col} > 0
-                """,
-                (market_id,),
-            ).fetchall()
-
-            for h in holders:
-                ratio = float(h["sh"]) / float(total_winner_shares_points)
-                pay_cents = int(round(pool_cents * ratio))
-                if pay_cents > 0:
-                    c.execute(
-                        "UPDATE users SET balance_cents = balance_cents + ? WHERE username=?",
-                        (pay_cents, h["username"]),
-                    )
-                    total_paid_cents += pay_cents
-
-        # Mark market settled
-        c.execute(
-            "UPDATE markets SET settled=1, winner=? WHERE id=?",
-            (winner, market_id),
-        )
+            if winner is None:
+                raise HTTPException(400, "winner (YES or NO) required")
+            if bool(m["settled"]):
+                return {"ok": True, "winner": winner, "total_paid_points": 0.0}
+            params = {"market_id": market_id, "winner": winner}
 
-    return {"ok": True, "winner": winner, "total_paid_points": total_paid_cents / 100.0}
+    job_id = _enqueue("settle", params, dedupe_key=f"settle:{market_id}", resume=True,
+                      exclusive=(f"delete:{market_id}",))
+    return _job_response(jobs.get(job_id) if background else jobs.run_now(job_id), background)
 
 
 @router.delete("/markets/{market_id}")
@@ -211,33 +229,208 @@ def delete_market(
     market_id: str,
     x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
     force: bool = Query(default=False, description="Allow deleting even if settled (dev only)"),
+    background: bool = Query(default=False, description="return a job to poll instead of waiting"),
 ):
     """
     Hard-delete a market and related rows. For development/testing only.
-    By default, refuses to delete if already settled.
+    By default, refuses to delete if already settled. Runs as a `delete`
+    job: the market is closed first, then its rows go in chunks.
     """
     _require_admin(x_admin_token)
-    with conn() as c:
+    with market_conn(market_id) as c:
         m = c.execute(
             "SELECT id, settled FROM markets WHERE id=?",
             (market_id,),
         ).fetchone()
-        if not m:
-            raise HTTPException(404, "market not found")
-        if bool(m["settled"]) and not force:
-            raise HTTPException(400, "market already settled; pass force=true to delete anyway (dev only)")
+    if not m:
+        raise HTTPException(404, "market not found")
+    if bool(m["settled"]) and not force:
+        raise HTTPException(400, "market already settled; pass force=true to delete anyway (dev only)")
+
+    job_id = _enqueue("delete", {"market_id": market_id}, dedupe_key=f"delete:{market_id}", resume=True,
+                      exclusive=(f"settle:{market_id}",))
+    return _job_response(jobs.get(job_id) if background else jobs.run_now(job_id), background)
+
+
+@router.post("/reconcile")
+def reconcile_ledger(
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+    full: bool = Query(default=False, description="Check every aggregate, not just changed ones"),
+    deep: bool = Query(default=True, description="Re-sum ledger rows of each checked market/user"),
+    background: bool = Query(default=False, description="run as a job; poll /admin/jobs/{id}"),
+):
+    """
+    Verify pool/ledger/payout invariants for markets and users changed since
+    the last run. Passing rows are marked clean; problems are listed.
+    """
+    _require_admin(x_admin_token)
+    if background:
+        return _job_response(jobs.get(jobs.enqueue("reconcile", {"full": full, "deep": deep})), True)
+    # Every shard, with archived bets still counting towards user totals
+    return reconcile.verify_all(full=full, deep=deep)
+
+
+@router.post("/archive")
+def archive_settled(
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+    batch: int = Query(default=100, ge=1, le=10_000, description="markets per transaction"),
+    max_batches: Optional[int] = Query(default=None, ge=1),
+    closed_before: Optional[dt.datetime] = Query(default=None, description="only markets closing before this ISO time"),
+    background: bool = Query(default=False, description="run as a job (all batches); poll /admin/jobs/{id}"),
+):
+    """Move settled markets (and their bets/positions) to the archive DB."""
+    _require_admin(x_admin_token)
+    if closed_before is not None:
+        closed_before = closed_before.isoformat()   # job params are JSON
+    if background:
+        job_id = _enqueue("archive", {"batch": batch, "closed_before": closed_before}, dedupe_key="archive")
+        return _job_response(jobs.get(job_id), True)
+    return archive.archive_settled(batch, max_batches, closed_before)
+
+
+# --------- JOBS (background work, see app/jobs.py) ---------
+
+@router.get("/jobs")
+def list_jobs(
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+    status: Optional[str] = Query(default=None, description="queued | running | done | failed"),
+    limit: int = Query(default=50, ge=1, le=500),
+):
+    _require_admin(x_admin_token)
+    return jobs.list_jobs(status, limit)
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token")):
+    """Status, progress (rows done / total) and, once done, the result."""
+    _require_admin(x_admin_token)
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "job not found")
+    return job
+
+
+@router.post("/escrow/recover")
+def recover_escrows(
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+    min_age_s: float = Query(default=ESCROW_RECOVER_AFTER_S, ge=0, description="only escrows held at least this long"),
+):
+    """Finalize or refund cross-shard bets whose request died mid-way (see app/escrow.py)."""
+    _require_admin(x_admin_token)
+    return escrow.recover(min_age_s)
+
+
+# --------- STATS (materialized rollups, see app/analytics.py) ---------
+
+@router.get("/stats")
+def stats_totals(x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token")):
+    _require_admin(x_admin_token)
+    with read_conn() as c:
+        return analytics.totals(c)
+
+
+@router.get("/stats/markets")
+def stats_top_markets(
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+    by: str = Query(default="volume", description="volume | trades"),
+    limit: int = Query(default=20, ge=1, le=500),
+):
+    _require_admin(x_admin_token)
+    if by not in ("volume", "trades"):
+        raise HTTPException(400, "by must be volume or trades")
+    rows = [r for part in map_shards(lambda c: analytics.top_markets(c, by, limit), read=True) for r in part]
+    if SHARD_COUNT > 1:
+        col = {"volume": "volume_points", "trades": "trade_count"}[by]
+        rows = sorted(rows, key=lambda r: r[col], reverse=True)[:limit]
+    return rows
+
+
+@router.get("/stats/markets/{market_id}")
+def stats_market(market_id: str, x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token")):
+    _require_admin(x_admin_token)
+    with read_conn(shard_of(market_id)) as c:
+        row = analytics.market(c, market_id)
+    if row is None:
+        raise HTTPException(404, "no trades for market")
+    return row
+
+
+@router.get("/stats/users")
+def stats_top_users(
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+    limit: int = Query(default=20, ge=1, le=500),
+):
+    _require_admin(x_admin_token)
+    with read_conn() as c:
+        return analytics.top_users(c, limit)
+
+
+@router.get("/stats/net-worth")
+def stats_net_worth(
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+    limit: int = Query(default=20, ge=1, le=500),
+):
+    """Leaderboard by balance + open positions at current prices (app/positions.py)."""
+    _require_admin(x_admin_token)
+    return positions.leaderboard(limit)
+
+
+@router.get("/stats/users/{username}")
+def stats_user(username: str, x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token")):
+    _require_admin(x_admin_token)
+    with read_conn() as c:
+        row = analytics.user(c, username)
+    if row is None:
+        raise HTTPException(404, "no trades for user")
+    return row
+
 
-        try:
-            c.execute("BEGIN")
-            c.execute("DELETE FROM bets WHERE market_id=?", (market_id,))
-            c.execute("DELETE FROM positions WHERE market_id=?", (market_id,))
-            c.execute("DELETE FROM markets WHERE id=?", (market_id,))
-            c.execute("COMMIT")
-        except Exception as e:
-            c.execute("ROLLBACK")
-            raise HTTPException(500, f"delete failed: {e}")
+@router.get("/stats/series")
+def stats_series(
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+    granularity: str = Query(default="hour", description="hour | day"),
+    limit: int = Query(default=48, ge=1, le=2000),
+):
+    _require_admin(x_admin_token)
+    if granularity not in analytics.GRANULARITIES:
+        raise HTTPException(400, "granularity must be hour or day")
+    with read_conn() as c:
+        return analytics.series(c, granularity, limit)
 
-    return {"ok": True}
+
+# --------- EXPORT (streaming, see app/export.py) ---------
+
+@router.get("/export/{table}.csv")
+def export_csv(
+    table: str,
+    x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token"),
+    since: Optional[str] = Query(default=None, description="watermark: created_at (bets/positions) or rowid (markets/users)"),
+    since_id: Optional[str] = Query(default=None, description="watermark id for bets/positions"),
+):
+    """
+    Stream a whole table (or rows after a watermark) as CSV in chunks.
+    Rows come out in key order; the last row's key is the next watermark.
+    """
+    _require_admin(x_admin_token)
+    if table not in export.TABLES:
+        raise HTTPException(404, f"unknown table; choose from {', '.join(export.TABLES)}")
+    key = export.TABLES[table].key
+    wm = None
+    if since is not None:
+        if len(key) == 2:
+            if since_id is None:
+                raise HTTPException(400, "since_id is required with since for this table")
+            wm = (since, since_id)
+        else:
+            try:
+                wm = (int(since),)
+            except ValueError:
+                raise HTTPException(400, "since must be an integer rowid for this table")
+    return StreamingResponse(
+        export.csv_stream(table, export.iter_chunks(table, since=wm, replica=True)),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{table}.csv"'},
+    )
 
 
 # --------- DEBUG ---------
@@ -258,4 +451,19 @@ def debug_db(x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-
         "size": size,
         "table_count": cur.fetchone()["n"],
         "tables": [t["name"] for t in tables],
-    }
\ No newline at end of file
+        "shards": [
+            {"shard": k, "path": shard_path(k),
+             "size": os.path.getsize(shard_path(k)) if os.path.exists(shard_path(k)) else 0}
+            for k in market_shards()
+        ],
+        "replicas": replica.status(),
+        "singleflight": singleflight.stats(),
+    }
+
+
+@router.post("/replica/refresh")
+def refresh_replica(x_admin_token: Optional[str] = Header(default=None, alias="X-Admin-Token")):
+    """Take a fresh read-replica snapshot of every shard now (see app/replica.py)."""
+    _require_admin(x_admin_token)
+    took = {k: replica.refresh(k) for k in market_shards()}
+    return {"ok": True, "seconds": took, "replicas": replica.status()}
\ No newline at end of file
@@ -0,0 +1,133 @@
+# backend/app/routers/alerts.py
+# Price alerts on binary markets: arm, list, cancel, and the inbox of fired
+# alerts. Matching lives in app/alerts.py and runs on every fill.
+# The inbox is polled with an opaque cursor (the last fired_seq seen on
+# each shard, see migration 0017), so a client only ever downloads each
+# fired alert once, whatever order concurrent fills committed in.
+
+from __future__ import annotations
+import datetime as dt, heapq, itertools
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from ..db import map_shards, market_conn, market_shards, SHARD_COUNT
+from .. import alerts
+from ..auth import get_current_username
+from ..logic import effective_pools, spot_price_yes
+from ..ratelimit import limit_bets, limit_reads
+from ..schemas.alerts import AlertOut, AlertReq, InboxResp
+
+router = APIRouter()
+
+_ALERT_COLS = "id, market_id, direction, threshold, status, created_at, fired_at, fired_price"
+
+
+@router.post("/markets/{market_id}/alerts", response_model=AlertOut, dependencies=[Depends(limit_bets)])
+def create_alert(market_id: str, req: AlertReq, username: str = Depends(get_current_username)):
+    """
+    Arm an alert that fires the first time a trade leaves price_yes at or
+    beyond `threshold`. A level the price is already at is a 400.
+    """
+    now = dt.datetime.utcnow().isoformat()
+    with market_conn(market_id) as c:
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            m = c.execute(
+                """
+                SELECT open, yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents
+                FROM markets WHERE id=? AND kind='binary'
+                """,
+                (market_id,),
+            ).fetchone()
+            if not m:
+                raise HTTPException(404, "market not found")
+            if not bool(m["open"]):
+                raise HTTPException(400, "market is closed")
+
+            price = spot_price_yes(*effective_pools(m["yes_real_cents"], m["no_real_cents"],
+                                                    m["virt_yes_cents"], m["virt_no_cents"]))
+            if alerts.holds(req.direction, req.threshold, price):
+                raise HTTPException(400, f"price_yes is already {price:.4f}")
+
+            armed = c.execute(
+                "SELECT COUNT(*) FROM alerts WHERE market_id=? AND username=? AND status='armed'",
+                (market_id, username),
+            ).fetchone()[0]
+            if armed >= alerts.MAX_ARMED_PER_MARKET:
+                raise HTTPException(400, f"at most {alerts.MAX_ARMED_PER_MARKET} armed alerts per market")
+
+            alert_id = alerts.create(c, market_id, username, req.direction, req.threshold, now)
+            r = c.execute(f"SELECT {_ALERT_COLS} FROM alerts WHERE id=?", (alert_id,)).fetchone()
+            c.execute("COMMIT")
+        except HTTPException:
+            c.execute("ROLLBACK")
+            raise
+        except Exception as e:
+            c.execute("ROLLBACK")
+            raise HTTPException(500, f"Alert failed: {e}")
+    return alerts.alert_out(r)
+
+
+@router.get("/alerts", dependencies=[Depends(limit_reads)])
+def list_my_alerts(
+    username: str = Depends(get_current_username),
+    status: Optional[str] = Query(default=None, description="armed | fired | cancelled"),
+    limit: int = Query(default=100, ge=1, le=1000),
+):
+    where, args = "username=?", [username]
+    if status:
+        where += " AND status=?"
+        args.append(status)
+    rows = [r for part in map_shards(lambda c: c.execute(
+        f"SELECT {_ALERT_COLS} FROM alerts WHERE {where} ORDER BY created_at DESC LIMIT ?",
+        (*args, limit),
+    ).fetchall()) for r in part]
+    if SHARD_COUNT > 1:
+        rows = sorted(rows, key=lambda r: r["created_at"], reverse=True)[:limit]
+    return [alerts.alert_out(r) for r in rows]
+
+
+@router.get("/alerts/inbox", response_model=InboxResp, dependencies=[Depends(limit_reads)])
+def alert_inbox(
+    username: str = Depends(get_current_username),
+    after: Optional[str] = Query(default=None, description="cursor from the previous poll"),
+    limit: int = Query(default=100, ge=1, le=1000),
+):
+    """Fired alerts in firing order, oldest first, after the cursor."""
+    seqs = _inbox_cursor(after)
+    parts = []
+    for k in market_shards():
+        with market_conn(shard=k) as c:
+            parts.append([(k, r) for r in c.execute(
+                f"""
+                SELECT {_ALERT_COLS}, fired_seq FROM alerts
+                WHERE username=? AND status='fired' AND fired_seq > ?
+                ORDER BY fired_seq LIMIT ?
+                """,
+                (username, seqs[k], limit),
+            )])
+    # Merge by fired_at, taking each shard's alerts in fired_seq order: what
+    # is returned from a shard is always a prefix, so its cursor can advance.
+    rows = list(itertools.islice(heapq.merge(*parts, key=lambda t: t[1]["fired_at"]), limit))
+    for k, r in rows:
+        seqs[k] = r["fired_seq"]
+    cursor = ".".join(map(str, seqs)) if rows else after
+    return {"alerts": [alerts.alert_out(r) for _, r in rows], "cursor": cursor}
+
+
+def _inbox_cursor(after: Optional[str]):
+    """Per-shard fired_seq from an inbox cursor ('' = from the start)."""
+    try:
+        seqs = [int(x) for x in after.split(".")] if after else []
+    except ValueError:
+        raise HTTPException(400, "invalid cursor")
+    return (seqs + [0] * SHARD_COUNT)[:SHARD_COUNT]
+
+
+@router.delete("/alerts/{alert_id}", dependencies=[Depends(limit_bets)])
+def cancel_alert(alert_id: str, username: str = Depends(get_current_username)):
+    """Disarm an alert that hasn't fired yet."""
+    for k in market_shards():   # alert ids don't say which shard holds them
+        with market_conn(shard=k) as c:
+            if alerts.cancel(c, alert_id, username):
+                return {"ok": True}
+    raise HTTPException(404, "armed alert not found")
@@ -1,9 +1,8 @@
 # backend/app/routers/auth.py
 from fastapi import APIRouter, HTTPException, Header
-from jose import jwt
 from pydantic import BaseModel, Field
 from ..db import conn
-from ..auth import hash_password, verify_password, create_token, JWT_SECRET, JWT_ALG  # uses your PyJWT helpers
+from ..auth import hash_password, verify_password, create_token, decode_token  # uses your PyJWT helpers
 
 router = APIRouter()
 
@@ -82,7 +81,7 @@ def whoami(authorization: str = Header(default="")):
         return {"ok": False, "error": "no bearer token"}
     token = authorization.split(" ", 1)[1]
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        payload = decode_token(token)
         return {"ok": True, "payload": payload}
     except Exception as e:
         return {"ok": False, "error": str(e)}
@@ -1,22 +1,73 @@
 # backend/app/routers/bets.py
 # Place a trade into the CPMM, debit user balance, mint shares, and move price.
+# The fill itself lives in app/trading.py (shared with limit-order fills).
+# Markets on shard 0 trade in one transaction; markets on other shards go
+# through the escrow protocol in app/escrow.py.
 
 from __future__ import annotations
-import uuid, datetime as dt
-from fastapi import APIRouter, HTTPException, Depends
-from ..db import conn
+import datetime as dt, sqlite3, uuid
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Header
+from ..db import conn, market_conn, shard_of
+from .. import escrow, idempotency, orders, trading
 from ..auth import get_current_username
+from ..ratelimit import limit_bets
 from ..schemas.bets import BetReq, BetResp
-from ..logic import apply_buy, effective_pools, odds_from_pools, implied_payout_per1_spot
+from ..logic import effective_pools, odds_from_pools, implied_payout_per1_spot, spot_price_yes
 
 router = APIRouter()
 
-@router.post("/markets/{market_id}/bet", response_model=BetResp)
+
+def _open_market(c, market_id: str):
+    """The binary market row for a trade, or 404 / 400."""
+    m = c.execute(
+        """
+        SELECT id, open, closes_at,
+               yes_real_cents, no_real_cents,
+               virt_yes_cents, virt_no_cents
+        FROM markets
+        WHERE id=? AND kind='binary'
+        """,
+        (market_id,),
+    ).fetchone()
+    if not m:
+        raise HTTPException(404, "market not found")
+    if not bool(m["open"]):
+        raise HTTPException(400, "market is closed")
+    return dict(m)
+
+
+def _bet_resp(m: Dict[str, Any], out: Dict[str, Any], new_bal: int, filled: List[Any]) -> BetResp:
+    # Response odds/price from effective pools AFTER the trade and the sweep:
+    # trading.fill keeps m's pools current, so orders the bet crossed count
+    yes_eff, no_eff = effective_pools(
+        m["yes_real_cents"], m["no_real_cents"],
+        m["virt_yes_cents"], m["virt_no_cents"]
+    )
+    return BetResp(
+        ok=True,
+        new_balance_points=new_bal / 100.0,
+        shares_points_issued=out["shares_points_issued"],
+        shares_micro_issued=out["shares_micro_issued"],
+        price_yes_after=spot_price_yes(yes_eff, no_eff),
+        odds=odds_from_pools(yes_eff, no_eff),
+        implied_payout_per1_spot=implied_payout_per1_spot(yes_eff, no_eff),
+        orders_filled=len(filled),
+    )
+
+
+@router.post("/markets/{market_id}/bet", response_model=BetResp, dependencies=[Depends(limit_bets)])
 def place_bet(
     market_id: str,
     req: BetReq,
     username: str = Depends(get_current_username),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
 ):
+    """
+    Market-buy `spend_points` of `side`. With an Idempotency-Key header, a
+    retry of the same request returns the stored BetResp instead of buying
+    again; reusing the key for a different request is a 422.
+    """
     # normalize/validate
     side = req.side.upper().strip()
     if side not in ("YES", "NO"):
@@ -26,27 +77,30 @@ def place_bet(
     if spend_cents <= 0:
         raise HTTPException(400, "spend_points must be > 0")
 
-    now = dt.datetime.utcnow().isoformat()
+    idem_key = idempotency.normalize_key(idempotency_key)
+    req_hash = idempotency.request_hash(market_id, side, spend_cents) if idem_key else None
+
+    k = shard_of(market_id)
+    if k != 0:
+        return _place_bet_escrowed(market_id, k, username, side, spend_cents, idem_key, req_hash)
 
     with conn() as c:
         try:
-            c.execute("BEGIN")
+            # IMMEDIATE: take the write lock up front so two retries with the
+            # same key serialize on the lookup below.
+            c.execute("BEGIN IMMEDIATE")
+            # Stamped under the lock: created_at / fired_at follow commit order
+            # (export watermarks rely on it)
+            now = dt.datetime.utcnow().isoformat()
+
+            if idem_key:
+                replay = idempotency.lookup(c, username, idem_key, req_hash)
+                if replay is not None:
+                    c.execute("ROLLBACK")
+                    return BetResp(**replay)
 
             # Market must exist and be open
-            m = c.execute(
-                """
-                SELECT id, open, closes_at,
-                       yes_real_cents, no_real_cents,
-                       virt_yes_cents, virt_no_cents
-                FROM markets
-                WHERE id=?
-                """,
-                (market_id,),
-            ).fetchone()
-            if not m:
-                raise HTTPException(404, "market not found")
-            if not bool(m["open"]):
-                raise HTTPException(400, "market is closed")
+            m = _open_market(c, market_id)
 
             # User must exist & have balance
             u = c.execute(
@@ -58,69 +112,17 @@ def place_bet(
             if u["balance_cents"] < spend_cents:
                 raise HTTPException(400, "insufficient balance")
 
-            # Compute CPMM outcome (pure math, no side-effects)
-            out = apply_buy(
-                side=side,
-                spend_cents=spend_cents,
-                yes_real_cents=m["yes_real_cents"],
-                no_real_cents=m["no_real_cents"],
-                virt_yes_cents=m["virt_yes_cents"],
-                virt_no_cents=m["virt_no_cents"],
-            )
-
             # 1) Debit user
             c.execute(
                 "UPDATE users SET balance_cents = balance_cents - ? WHERE username=?",
                 (spend_cents, username),
             )
 
-            # 2) Update market real pools
-            c.execute(
-                """
-                UPDATE markets
-                   SET yes_real_cents=?, no_real_cents=?
-                 WHERE id=?
-                """,
-                (out["new_yes_real_cents"], out["new_no_real_cents"], market_id),
-            )
-
-            # 3) Upsert positions (store issued shares in points as REAL)
-            add_yes_points = out["shares_points_issued"] if side == "YES" else 0.0
-            add_no_points  = out["shares_points_issued"] if side == "NO"  else 0.0
+            # 2) Fill against the curve: pools, positions, ledger, rollups, cache
+            out = trading.fill(c, m, username, side, spend_cents, now)
 
-            pos = c.execute(
-                "SELECT yes_shares_points, no_shares_points FROM positions WHERE market_id=? AND username=?",
-                (market_id, username),
-            ).fetchone()
-
-            if pos:
-                c.execute(
-                    """
-                    UPDATE positions
-                       SET yes_shares_points = yes_shares_points + ?,
-                           no_shares_points  = no_shares_points  + ?,
-                           created_at = ?
-                     WHERE market_id=? AND username=?
-                    """,
-                    (add_yes_points, add_no_points, now, market_id, username),
-                )
-            else:
-                c.execute(
-                    """
-                    INSERT INTO positions (id, market_id, username, yes_shares_points, no_shares_points, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    (str(uuid.uuid4()), market_id, username, add_yes_points, add_no_points, now),
-                )
-
-            # 4) Append to bets ledger (optional but useful)
-            c.execute(
-                """
-                INSERT INTO bets (id, market_id, username, side, amount_cents, created_at)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                (str(uuid.uuid4()), market_id, username, side, spend_cents, now),
-            )
+            # 3) The price moved: execute resting limit orders it crossed
+            filled = orders.sweep(c, m, now)
 
             # New balance for response
             new_bal = c.execute(
@@ -128,6 +130,12 @@ def place_bet(
                 (username,),
             ).fetchone()["balance_cents"]
 
+            resp = _bet_resp(m, out, new_bal, filled)
+
+            # 4) Remember the response for retries, atomically with the trade
+            if idem_key:
+                idempotency.store(c, username, idem_key, req_hash, resp.model_dump())
+
             c.execute("COMMIT")
 
         except HTTPException:
@@ -137,19 +145,96 @@ def place_bet(
             c.execute("ROLLBACK")
             raise HTTPException(500, f"Bet failed: {e}")
 
-    # Response odds/price from effective pools AFTER trade
-    yes_eff, no_eff = effective_pools(
-        out["new_yes_real_cents"], out["new_no_real_cents"],
-        m["virt_yes_cents"], m["virt_no_cents"]
-    )
-    odds_after = odds_from_pools(yes_eff, no_eff)
-    implied = implied_payout_per1_spot(yes_eff, no_eff)
+    return resp
 
-    return BetResp(
-        ok=True,
-        new_balance_points=new_bal / 100.0,
-        shares_points_issued=out["shares_points_issued"],
-        price_yes_after=out["price_yes_after"],
-        odds=odds_after,
-        implied_payout_per1_spot=implied,
-    )
\ No newline at end of file
+
+def _place_bet_escrowed(market_id: str, k: int, username: str, side: str, spend_cents: int,
+                        idem_key: Optional[str], req_hash: Optional[str]) -> BetResp:
+    """place_bet for a market on shard k != 0: hold, fill on the shard, finalize."""
+    # Idempotency keys live on the market's shard, next to the trade.
+    if idem_key:
+        with market_conn(shard=k) as s:
+            replay = idempotency.lookup(s, username, idem_key, req_hash)
+        if replay is not None:
+            return BetResp(**replay)
+
+    # 1) Hold the spend on the home DB
+    escrow_id = str(uuid.uuid4())
+    now = dt.datetime.utcnow().isoformat()
+    with conn() as h:
+        try:
+            h.execute("BEGIN IMMEDIATE")
+            u = h.execute("SELECT balance_cents FROM users WHERE username=?", (username,)).fetchone()
+            if not u:
+                raise HTTPException(404, "user not found")
+            if u["balance_cents"] < spend_cents:
+                raise HTTPException(400, "insufficient balance")
+            escrow.hold(h, escrow_id, username, market_id, k, spend_cents, now)
+            h.execute("COMMIT")
+        except Exception:
+            h.execute("ROLLBACK")
+            raise
+    new_bal = u["balance_cents"] - spend_cents
+
+    # 2) Fill on the market's shard; the bet id is the escrow id
+    fills: List[Dict[str, Any]] = []
+    replay = None
+    try:
+        with market_conn(shard=k) as s:
+            try:
+                s.execute("BEGIN IMMEDIATE")
+                now = dt.datetime.utcnow().isoformat()   # under the shard's lock, as in place_bet
+                if escrow.voided(s, escrow_id):
+                    raise HTTPException(409, "bet timed out before it filled; the spend was refunded")
+                if idem_key:
+                    replay = idempotency.lookup(s, username, idem_key, req_hash)
+                if replay is None:
+                    m = _open_market(s, market_id)
+                    out = trading.fill(s, m, username, side, spend_cents, now, bet_id=escrow_id, records=fills)
+                    filled = orders.sweep(s, m, now, records=fills)
+                    escrow.record_fills(s, escrow_id, fills)
+                    resp = _bet_resp(m, out, new_bal, filled)
+                    if idem_key:
+                        idempotency.store(s, username, idem_key, req_hash, resp.model_dump())
+                    s.execute("COMMIT")
+                else:
+                    s.execute("ROLLBACK")
+            except Exception:
+                s.execute("ROLLBACK")
+                raise
+    except Exception as e:
+        _refund_hold(escrow_id, now)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(500, f"Bet failed: {e}")
+    if replay is not None:
+        # A concurrent retry with the same key won the race: give the hold back.
+        _refund_hold(escrow_id, now)
+        return BetResp(**replay)
+
+    # 3) Settle the hold. If this fails the trade still stands: escrow.recover()
+    # finalizes it from the shard's escrow_fills.
+    try:
+        with conn() as h:
+            h.execute("BEGIN IMMEDIATE")
+            escrow.finalize(h, escrow_id, fills, now)
+            h.execute("COMMIT")
+    except sqlite3.Error:
+        pass
+    return resp
+
+
+def _refund_hold(escrow_id: str, now: str) -> None:
+    """
+    Refund a hold whose fill didn't happen, under the home write lock like
+    escrow.recover(), so the two can't both refund it. If this fails the
+    hold stays held and recover() refunds it (the shard has no fills).
+    """
+    with conn() as h:
+        try:
+            h.execute("BEGIN IMMEDIATE")
+            escrow.refund(h, escrow_id, now)
+            h.execute("COMMIT")
+        except sqlite3.Error:
+            if h.in_transaction:
+                h.execute("ROLLBACK")
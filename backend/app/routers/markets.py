@@ -1,13 +1,18 @@
 # backend/app/routers/markets.py
 # Market listing & creation using CPMM pools (real + virtual).
+# Multi-outcome (LMSR) markets are served by routers/multi.py.
 
 from __future__ import annotations
-import uuid
-from fastapi import APIRouter, HTTPException, Header, Query
+import re, uuid
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
 from typing import Optional, List
-from ..db import conn
+from ..db import db_time, map_shards, market_conn, new_market_shard, register_market, SHARD_COUNT
+from .. import cache, singleflight
 from ..config import ADMIN_TOKEN
+from ..ratelimit import limit_reads, limit_admin
 from ..schemas.markets import CreateMarketReq
+from ..formats import MARKET_COLUMNS, check_format, render
 from ..logic import effective_pools, odds_from_pools, implied_payout_per1_spot, spot_price_yes
 
 router = APIRouter()
@@ -42,11 +47,67 @@ def _rows_to_market_out(rows) -> List[dict]:
     return out
 
 
+_STATUS_SQL = {
+    "open":    "open=1 AND settled=0",
+    "closed":  "open=0 AND settled=0",
+    "settled": "settled=1",
+}
+
+_SEARCH_ORDER = {
+    "relevance": "rank ASC, volume DESC",
+    "volume":    "volume DESC, rank ASC",
+    "closes_at": "m.closes_at ASC, rank ASC",
+}
+
+_SEARCH_SORT_KEY = {   # _SEARCH_ORDER in Python, for merging shards
+    "relevance": lambda r: (r["rank"], -r["volume"]),
+    "volume":    lambda r: (-r["volume"], r["rank"]),
+    "closes_at": lambda r: (r["closes_at"], r["rank"]),
+}
+
+
+def _fts_query(q: str) -> str:
+    """
+    Turn free text into a safe FTS5 query: every word becomes a quoted
+    term (no user-controlled operators), ANDed together; the last word
+    is a prefix match so partial typing still finds results.
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        raise HTTPException(400, "q must contain at least one word")
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
 # --------- list / read ---------
 
-@router.get("/markets")
+def _load_list(key: Optional[str]) -> List[dict]:
+    where = ["kind='binary'"] + ([_STATUS_SQL[key]] if key else [])
+    where_sql = f"WHERE {' AND '.join(where)}"
+    rows = [r for part in map_shards(lambda c: c.execute(
+        f"""
+        SELECT id, question, closes_at, open, settled, winner,
+               yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents
+        FROM markets
+        {where_sql}
+        ORDER BY closes_at ASC
+        """
+    ).fetchall()) for r in part]
+    if SHARD_COUNT > 1:
+        rows.sort(key=lambda r: r["closes_at"])
+    return _rows_to_market_out(rows)
+
+
+def cached_list(key: Optional[str]) -> List[dict]:
+    """Market list for a status key (None = all), through the worker cache."""
+    return cache.cached(cache.MARKET_LIST, key, lambda: _load_list(key))
+
+
+@router.get("/markets", dependencies=[Depends(limit_reads)])
 def list_markets(
     status: Optional[str] = Query(default=None, description="open | closed | settled"),
+    fmt: Optional[str] = Query(default=None, alias="format", description="columnar = parallel arrays"),
 ):
     """
     List markets. `status` can be:
@@ -54,48 +115,99 @@ def list_markets(
       - closed:  open=0 and settled=0
       - settled: settled=1
       - None:    all
+    `format=columnar` returns parallel arrays (see formats.MARKET_COLUMNS).
     """
-    where = []
-    if status == "open":
-        where.append("open=1 AND settled=0")
-    elif status == "closed":
-        where.append("open=0 AND settled=0")
-    elif status == "settled":
-        where.append("settled=1")
-    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
-
-    with conn() as c:
-        rows = c.execute(
-            f"""
-            SELECT id, question, closes_at, open, settled, winner,
-                   yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents
-            FROM markets
-            {where_sql}
-            ORDER BY closes_at ASC
-            """
-        ).fetchall()
-    return _rows_to_market_out(rows)
+    fmt = check_format(fmt)
+    key = status if status in _STATUS_SQL else None
+
+    # Identical concurrent polls share one query and one encoded body.
+    return singleflight.respond(
+        "list_markets", (key, fmt),
+        lambda: render(cached_list(key), fmt, MARKET_COLUMNS),
+    )
 
 
-@router.get("/markets/{market_id}")
+@router.get("/markets/search", dependencies=[Depends(limit_reads)])
+def search_markets(
+    q: str = Query(..., min_length=1, max_length=200, description="words to match in the question"),
+    status: Optional[str] = Query(default=None, description="open | closed | settled"),
+    closes_after: Optional[datetime] = Query(default=None),
+    closes_before: Optional[datetime] = Query(default=None),
+    min_volume_points: float = Query(default=0, ge=0, description="real YES+NO pool, in points"),
+    sort: str = Query(default="relevance", description="relevance | volume | closes_at"),
+    limit: int = Query(default=50, ge=1, le=200),
+    offset: int = Query(default=0, ge=0),
+    fmt: Optional[str] = Query(default=None, alias="format"),
+):
+    """
+    Full-text search over market questions (FTS5, migration 0009).
+    Text relevance (bm25) is combined with status / closing-window /
+    volume filters; results are paged with limit/offset.
+    """
+    fmt = check_format(fmt)
+    if sort not in _SEARCH_ORDER:
+        raise HTTPException(400, "sort must be relevance, volume or closes_at")
+
+    where = ["markets_fts MATCH ?", "m.kind='binary'"]
+    args: list = [_fts_query(q)]
+    if status in _STATUS_SQL:
+        where.append(_STATUS_SQL[status])
+    if closes_after is not None:
+        where.append("m.closes_at >= ?")
+        args.append(db_time(closes_after))
+    if closes_before is not None:
+        where.append("m.closes_at < ?")
+        args.append(db_time(closes_before))
+    if min_volume_points > 0:
+        where.append("(m.yes_real_cents + m.no_real_cents) >= ?")
+        args.append(int(round(min_volume_points * 100)))
+
+    # Each shard returns its first offset+limit matches; the page is cut
+    # after merging. bm25 scores are per shard (its own term statistics).
+    sql = f"""
+        SELECT m.id, m.question, m.closes_at, m.open, m.settled, m.winner,
+               m.yes_real_cents, m.no_real_cents, m.virt_yes_cents, m.virt_no_cents,
+               bm25(markets_fts) AS rank,
+               m.yes_real_cents + m.no_real_cents AS volume
+        FROM markets_fts
+        JOIN markets m ON m.rowid = markets_fts.rowid
+        WHERE {' AND '.join(where)}
+        ORDER BY {_SEARCH_ORDER[sort]}
+        LIMIT ? OFFSET ?
+        """
+    if SHARD_COUNT == 1:
+        with market_conn(shard=0) as c:
+            rows = c.execute(sql, (*args, limit, offset)).fetchall()
+    else:
+        rows = [r for part in map_shards(lambda c: c.execute(sql, (*args, offset + limit, 0)).fetchall())
+                for r in part]
+        rows.sort(key=_SEARCH_SORT_KEY[sort])
+        rows = rows[offset:offset + limit]
+    return render(_rows_to_market_out(rows), fmt, MARKET_COLUMNS)
+
+
+@router.get("/markets/{market_id}", dependencies=[Depends(limit_reads)])
 def get_market(market_id: str):
-    with conn() as c:
-        r = c.execute(
-            """
-            SELECT id, question, closes_at, open, settled, winner,
-                   yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents
-            FROM markets WHERE id=?
-            """,
-            (market_id,),
-        ).fetchone()
-        if not r:
-            raise HTTPException(404, "market not found")
-    return _rows_to_market_out([r])[0]
+    def load():
+        with market_conn(market_id) as c:
+            r = c.execute(
+                """
+                SELECT id, question, closes_at, open, settled, winner,
+                       yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents
+                FROM markets WHERE id=? AND kind='binary'
+                """,
+                (market_id,),
+            ).fetchone()
+            if not r:
+                raise HTTPException(404, "market not found")
+        return _rows_to_market_out([r])[0]
+
+    return singleflight.respond("get_market", market_id, lambda: cache.cached(cache.MARKET, market_id, load))
 
 
 # --------- create (admin) ---------
 
-@router.post("/markets")
+@router.post("/markets", dependencies=[Depends(limit_admin)])
 def create_market(req: CreateMarketReq, x_admin_token: str = Header(default="")):
     """
     Create a market with virtual depth. Only admins (X-Admin-Token) can create.
@@ -117,9 +229,12 @@ def create_market(req: CreateMarketReq, x_admin_token: str = Header(default=""))
     m_id = str(uuid.uuid4())
     virt_yes_cents = int(round(req.seed_yes_points * 100))
     virt_no_cents  = int(round(req.seed_no_points  * 100))
+    shard = new_market_shard(m_id)
 
-    with conn() as c:
+    with market_conn(shard=shard, home=True) as c:
         try:
+            if SHARD_COUNT > 1:
+                register_market(c, m_id, shard)
             c.execute(
                 """
                 INSERT INTO markets
@@ -129,8 +244,9 @@ def create_market(req: CreateMarketReq, x_admin_token: str = Header(default=""))
                   (?,  ?,        ?,         1,    0,       NULL,
                    0,              0,             ?,              ?)
                 """,
-                (m_id, req.question, req.closes_at, virt_yes_cents, virt_no_cents),
+                (m_id, req.question, db_time(req.closes_at), virt_yes_cents, virt_no_cents),
             )
+            cache.publish(c, cache.MARKET_LIST)
         except Exception as e:
             raise HTTPException(400, f"create failed: {e}")
 
@@ -0,0 +1,272 @@
+# backend/app/routers/multi.py
+# Multi-outcome markets priced by LMSR (app/lmsr.py): create, read, quote, buy.
+# Close and settle go through the admin router like binary markets.
+# Bets write the market's shard and the home DB in one transaction (both
+# write locks); they are far rarer than binary bets, see app/escrow.py.
+
+from __future__ import annotations
+import uuid, datetime as dt
+from typing import List, Optional
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from ..db import db_time, map_shards, market_conn, new_market_shard, register_market, SHARD_COUNT
+from .. import analytics, cache, idempotency, lmsr, reconcile, singleflight
+from ..auth import get_current_username
+from ..config import ADMIN_TOKEN
+from ..logic import SHARE_MICRO, micro_to_points, to_micro
+from ..ratelimit import limit_admin, limit_bets, limit_reads
+from ..schemas.multi import CreateMultiMarketReq, MultiBetReq, MultiBetResp
+
+router = APIRouter()
+
+
+# --------- helpers ---------
+
+MARKET_COLS = "id, question, closes_at, open, settled, winner_idx, yes_real_cents, lmsr_b_cents"
+
+
+def _outcomes(rows):
+    """(labels, q in shares) from market_outcomes rows in idx order."""
+    q = np.array([r["q_micro"] for r in rows], dtype=np.float64) / SHARE_MICRO
+    return [r["label"] for r in rows], q
+
+
+def _load(c, market_id: str):
+    """(market row, outcome labels, q in shares) for an lmsr market, or 404."""
+    m = c.execute(
+        f"SELECT {MARKET_COLS} FROM markets WHERE id=? AND kind='lmsr'",
+        (market_id,),
+    ).fetchone()
+    if not m:
+        raise HTTPException(404, "market not found")
+    rows = c.execute(
+        "SELECT label, q_micro FROM market_outcomes WHERE market_id=? ORDER BY idx",
+        (market_id,),
+    ).fetchall()
+    return (m, *_outcomes(rows))
+
+
+def _market_out(m, labels: List[str], q: np.ndarray) -> dict:
+    b = m["lmsr_b_cents"] / 100.0
+    p = lmsr.prices(q, b)
+    return {
+        "id": m["id"],
+        "question": m["question"],
+        "closes_at": m["closes_at"],
+        "open": bool(m["open"]),
+        "settled": bool(m["settled"]),
+        "winner_idx": m["winner_idx"],
+        "liquidity_points": b,
+        "volume_points": m["yes_real_cents"] / 100.0,
+        "max_subsidy_points": lmsr.max_loss(b, len(labels)),
+        "outcomes": [
+            {"idx": i, "label": lab, "price": pi, "shares_outstanding": qi}
+            for i, (lab, pi, qi) in enumerate(zip(labels, p.tolist(), q.tolist()))
+        ],
+    }
+
+
+# --------- read ---------
+
+@router.get("/multi/markets", dependencies=[Depends(limit_reads)])
+def list_multi_markets(status: Optional[str] = Query(default=None, description="open | closed | settled")):
+    where = {
+        "open":    "AND open=1 AND settled=0",
+        "closed":  "AND open=0 AND settled=0",
+        "settled": "AND settled=1",
+    }.get(status, "")
+    def load(c):
+        # Two queries per shard: the markets, then all their outcomes grouped here
+        markets = c.execute(
+            f"SELECT {MARKET_COLS} FROM markets WHERE kind='lmsr' {where} ORDER BY closes_at ASC"
+        ).fetchall()
+        if not markets:
+            return []
+        by_market = {}
+        for r in c.execute(
+            f"""
+            SELECT market_id, label, q_micro FROM market_outcomes
+            WHERE market_id IN (SELECT id FROM markets WHERE kind='lmsr' {where})
+            ORDER BY market_id, idx
+            """
+        ):
+            by_market.setdefault(r["market_id"], []).append(r)
+        return [_market_out(m, *_outcomes(by_market.get(m["id"], []))) for m in markets]
+
+    out = [m for part in map_shards(load) for m in part]
+    if SHARD_COUNT > 1:
+        out.sort(key=lambda m: m["closes_at"])
+    return out
+
+
+@router.get("/multi/markets/{market_id}", dependencies=[Depends(limit_reads)])
+def get_multi_market(market_id: str):
+    def load():
+        with market_conn(market_id) as c:
+            return _market_out(*_load(c, market_id))
+
+    return singleflight.respond("get_multi_market", market_id, lambda: cache.cached(cache.OUTCOMES, market_id, load))
+
+
+@router.get("/multi/markets/{market_id}/quote", dependencies=[Depends(limit_reads)])
+def quote_multi_market(market_id: str, spend_points: float = Query(..., gt=0)):
+    """What `spend_points` buys on every outcome, in one vectorized pass."""
+    with market_conn(market_id) as c:
+        m, labels, q = _load(c, market_id)
+    qt = lmsr.quote(q, m["lmsr_b_cents"] / 100.0, spend_points)
+    return {
+        "spend_points": spend_points,
+        "outcomes": [
+            {"idx": i, "label": lab, "price": p, "shares": s, "avg_price": a, "price_after": pa}
+            for i, (lab, p, s, a, pa) in enumerate(zip(
+                labels, qt["price"].tolist(), qt["shares"].tolist(),
+                qt["avg_price"].tolist(), qt["price_after"].tolist(),
+            ))
+        ],
+    }
+
+
+# --------- create (admin) ---------
+
+@router.post("/multi/markets", dependencies=[Depends(limit_admin)])
+def create_multi_market(req: CreateMultiMarketReq, x_admin_token: str = Header(default="")):
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(401, "admin token required")
+    labels = [o.strip() for o in req.outcomes]
+    if any(not o for o in labels) or len(set(labels)) != len(labels):
+        raise HTTPException(400, "outcome labels must be non-empty and unique")
+    b_cents = int(round(req.liquidity_points * 100))
+    if b_cents < 1:
+        raise HTTPException(400, "liquidity_points must be at least 0.01")
+
+    m_id = str(uuid.uuid4())
+    shard = new_market_shard(m_id)
+    with market_conn(shard=shard, home=True) as c:
+        if SHARD_COUNT > 1:
+            register_market(c, m_id, shard)
+        c.execute(
+            """
+            INSERT INTO markets
+              (id, question, closes_at, open, settled, winner,
+               yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents,
+               kind, lmsr_b_cents)
+            VALUES (?, ?, ?, 1, 0, NULL, 0, 0, 0, 0, 'lmsr', ?)
+            """,
+            (m_id, req.question, db_time(req.closes_at), b_cents),
+        )
+        c.executemany(
+            "INSERT INTO market_outcomes (market_id, idx, label) VALUES (?, ?, ?)",
+            [(m_id, i, lab) for i, lab in enumerate(labels)],
+        )
+        cache.publish(c, cache.MARKET_LIST)
+        return _market_out(*_load(c, m_id))
+
+
+# --------- buy ---------
+
+@router.post("/multi/markets/{market_id}/bet", response_model=MultiBetResp, dependencies=[Depends(limit_bets)])
+def place_multi_bet(
+    market_id: str,
+    req: MultiBetReq,
+    username: str = Depends(get_current_username),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    """Market-buy `spend_points` of one outcome. Idempotency as in place_bet."""
+    spend_cents = int(round(req.spend_points * 100))
+    if spend_cents <= 0:
+        raise HTTPException(400, "spend_points must be > 0")
+
+    idem_key = idempotency.normalize_key(idempotency_key)
+    req_hash = idempotency.request_hash(market_id, "lmsr", req.outcome, spend_cents) if idem_key else None
+
+    with market_conn(market_id, home=True) as c:
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            now = dt.datetime.utcnow().isoformat()   # under the lock, as in place_bet
+
+            if idem_key:
+                replay = idempotency.lookup(c, username, idem_key, req_hash)
+                if replay is not None:
+                    c.execute("ROLLBACK")
+                    return MultiBetResp(**replay)
+
+            m, labels, q = _load(c, market_id)
+            if not bool(m["open"]):
+                raise HTTPException(400, "market is closed")
+            if req.outcome >= len(labels):
+                raise HTTPException(400, f"outcome must be in 0..{len(labels) - 1}")
+
+            u = c.execute("SELECT balance_cents FROM users WHERE username=?", (username,)).fetchone()
+            if not u:
+                raise HTTPException(404, "user not found")
+            if u["balance_cents"] < spend_cents:
+                raise HTTPException(400, "insufficient balance")
+
+            b = m["lmsr_b_cents"] / 100.0
+            micro = to_micro(float(lmsr.shares_for_spend(q, b, spend_cents / 100.0)[req.outcome]))
+
+            # 1) Debit user; the pool column tracks money collected
+            c.execute(
+                "UPDATE users SET balance_cents = balance_cents - ? WHERE username=?",
+                (spend_cents, username),
+            )
+            c.execute(
+                "UPDATE markets SET yes_real_cents = yes_real_cents + ? WHERE id=?",
+                (spend_cents, market_id),
+            )
+
+            # 2) Outstanding shares and the user's position in that outcome
+            c.execute(
+                "UPDATE market_outcomes SET q_micro = q_micro + ? WHERE market_id=? AND idx=?",
+                (micro, market_id, req.outcome),
+            )
+            new_trader = c.execute(
+                "SELECT 1 FROM outcome_positions WHERE market_id=? AND username=? LIMIT 1",
+                (market_id, username),
+            ).fetchone() is None
+            c.execute(
+                """
+                INSERT INTO outcome_positions (market_id, idx, username, shares_micro, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(market_id, idx, username) DO UPDATE SET
+                  shares_micro = shares_micro + excluded.shares_micro,
+                  created_at   = excluded.created_at
+                """,
+                (market_id, req.outcome, username, micro, now),
+            )
+
+            # 3) Ledger + aggregates (side='YES': see migration 0013)
+            bet_id = str(uuid.uuid4())
+            c.execute(
+                """
+                INSERT INTO bets (id, market_id, username, side, amount_cents, created_at, outcome_idx)
+                VALUES (?, ?, ?, 'YES', ?, ?, ?)
+                """,
+                (bet_id, market_id, username, spend_cents, now, req.outcome),
+            )
+            reconcile.record_bet(c, market_id, username, bet_id, "YES", spend_cents)
+            analytics.record_bet(c, market_id, username, "YES", spend_cents, now, new_trader=new_trader)
+            cache.publish_market(c, market_id)
+
+            q[req.outcome] += micro / SHARE_MICRO
+            resp = MultiBetResp(
+                ok=True,
+                new_balance_points=(u["balance_cents"] - spend_cents) / 100.0,
+                outcome=req.outcome,
+                shares_points_issued=micro_to_points(micro),
+                shares_micro_issued=micro,
+                prices=lmsr.prices(q, b).tolist(),
+            )
+            if idem_key:
+                idempotency.store(c, username, idem_key, req_hash, resp.model_dump())
+
+            c.execute("COMMIT")
+
+        except HTTPException:
+            c.execute("ROLLBACK")
+            raise
+        except Exception as e:
+            c.execute("ROLLBACK")
+            raise HTTPException(500, f"Bet failed: {e}")
+
+    return resp
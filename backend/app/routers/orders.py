@@ -0,0 +1,148 @@
+# backend/app/routers/orders.py
+# Resting limit orders on binary markets: place, list, cancel, and book depth.
+# Matching lives in app/orders.py; fills go through app/trading.py.
+# Placing and cancelling write the market's shard and the home DB (escrowed
+# budget) in one transaction with both attached.
+
+from __future__ import annotations
+import datetime as dt
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from ..db import map_shards, market_conn, market_shards, SHARD_COUNT
+from .. import idempotency, orders
+from ..auth import get_current_username
+from ..ratelimit import limit_bets, limit_reads
+from ..schemas.orders import OrderReq, OrderResp
+
+router = APIRouter()
+
+_ORDER_COLS = "id, market_id, side, limit_price, budget_cents, remaining_cents, status, created_at, updated_at"
+
+
+def _order_out(r) -> dict:
+    return {
+        "id": r["id"],
+        "market_id": r["market_id"],
+        "side": r["side"],
+        "limit_price": r["limit_price"],
+        "budget_points": r["budget_cents"] / 100.0,
+        "remaining_points": r["remaining_cents"] / 100.0,
+        "status": r["status"],
+        "created_at": r["created_at"],
+        "updated_at": r["updated_at"],
+    }
+
+
+@router.post("/markets/{market_id}/orders", response_model=OrderResp, dependencies=[Depends(limit_bets)])
+def place_order(
+    market_id: str,
+    req: OrderReq,
+    username: str = Depends(get_current_username),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    """
+    Rest an order: buy `side` while its price <= `limit_price`, spending at
+    most `budget_points` (escrowed now). If the market is already at or
+    through the limit it fills immediately, then sweeps any other orders
+    its fill crossed. Idempotency as in place_bet.
+    """
+    budget_cents = int(round(req.budget_points * 100))
+    if budget_cents <= 0:
+        raise HTTPException(400, "budget_points must be > 0")
+
+    idem_key = idempotency.normalize_key(idempotency_key)
+    req_hash = (idempotency.request_hash(market_id, "order", req.side, req.limit_price, budget_cents)
+                if idem_key else None)
+
+    with market_conn(market_id, home=True) as c:
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            now = dt.datetime.utcnow().isoformat()   # under the lock, as in place_bet
+
+            if idem_key:
+                replay = idempotency.lookup(c, username, idem_key, req_hash)
+                if replay is not None:
+                    c.execute("ROLLBACK")
+                    return OrderResp(**replay)
+
+            m = c.execute(
+                """
+                SELECT id, open, yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents
+                FROM markets WHERE id=? AND kind='binary'
+                """,
+                (market_id,),
+            ).fetchone()
+            if not m:
+                raise HTTPException(404, "market not found")
+            if not bool(m["open"]):
+                raise HTTPException(400, "market is closed")
+
+            u = c.execute("SELECT balance_cents FROM users WHERE username=?", (username,)).fetchone()
+            if not u:
+                raise HTTPException(404, "user not found")
+            if u["balance_cents"] < budget_cents:
+                raise HTTPException(400, "insufficient balance")
+
+            order_id = orders.place(c, market_id, username, req.side, req.limit_price, budget_cents, now)
+
+            # Marketable on arrival: fill it first, then whatever its fill crossed.
+            m = dict(m)
+            own = orders.execute(c, m, order_id, now)
+            fills = ([own] if own else []) + (orders.sweep(c, m, now) if own else [])
+
+            o = c.execute(f"SELECT {_ORDER_COLS} FROM orders WHERE id=?", (order_id,)).fetchone()
+            bal = c.execute("SELECT balance_cents FROM users WHERE username=?", (username,)).fetchone()[0]
+            resp = OrderResp(ok=True, new_balance_points=bal / 100.0, order=_order_out(o), fills=fills)
+
+            if idem_key:
+                idempotency.store(c, username, idem_key, req_hash, resp.model_dump())
+            c.execute("COMMIT")
+
+        except HTTPException:
+            c.execute("ROLLBACK")
+            raise
+        except Exception as e:
+            c.execute("ROLLBACK")
+            raise HTTPException(500, f"Order failed: {e}")
+
+    return resp
+
+
+@router.get("/orders", dependencies=[Depends(limit_reads)])
+def list_my_orders(
+    username: str = Depends(get_current_username),
+    status: Optional[str] = Query(default=None, description="open | filled | cancelled"),
+    limit: int = Query(default=100, ge=1, le=1000),
+):
+    where, args = "username=?", [username]
+    if status:
+        where += " AND status=?"
+        args.append(status)
+    rows = [r for part in map_shards(lambda c: c.execute(
+        f"SELECT {_ORDER_COLS} FROM orders WHERE {where} ORDER BY created_at DESC LIMIT ?",
+        (*args, limit),
+    ).fetchall()) for r in part]
+    if SHARD_COUNT > 1:
+        rows = sorted(rows, key=lambda r: r["created_at"], reverse=True)[:limit]
+    return [_order_out(r) for r in rows]
+
+
+@router.delete("/orders/{order_id}", dependencies=[Depends(limit_bets)])
+def cancel_order(order_id: str, username: str = Depends(get_current_username)):
+    """Cancel an open order and refund its unspent budget."""
+    now = dt.datetime.utcnow().isoformat()
+    refund = None
+    for k in market_shards():   # order ids don't say which shard holds them
+        with market_conn(shard=k, home=True) as c:
+            refund = orders.cancel(c, order_id, username, now)
+        if refund is not None:
+            break
+    if refund is None:
+        raise HTTPException(404, "open order not found")
+    return {"ok": True, "refunded_points": refund / 100.0}
+
+
+@router.get("/markets/{market_id}/book", dependencies=[Depends(limit_reads)])
+def get_book(market_id: str):
+    """Resting budget per limit price and side (from the cached in-memory book)."""
+    return {"market_id": market_id, **orders.book(market_id).depth()}
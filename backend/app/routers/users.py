@@ -1,16 +1,18 @@
 # backend/app/routers/users.py
-from fastapi import APIRouter, HTTPException, Header, Depends
-from ..db import conn, DB_PATH
+from fastapi import APIRouter, HTTPException, Header, Depends, Query
+from ..db import conn, map_shards, DB_PATH, SHARD_COUNT
+from .. import archive
 from ..config import ADMIN_TOKEN
 from ..schemas.users import UserCreate, UserOut
 from ..auth import get_current_username
+from ..ratelimit import limit_reads
 
 router = APIRouter()
 
 # --- Token-based conveniences (PUT THESE FIRST!) ---
 
 # GET /users/me
-@router.get("/me", response_model=UserOut)
+@router.get("/me", response_model=UserOut, dependencies=[Depends(limit_reads)])
 def get_me(username: str = Depends(get_current_username)):
     with conn() as c:
         row = c.execute(
@@ -21,21 +23,28 @@ def get_me(username: str = Depends(get_current_username)):
         raise HTTPException(status_code=404, detail=f"user not found (username={username}, db={DB_PATH})")
     return UserOut(username=row["username"], balance_points=row["balance_cents"] / 100.0)
 
-# GET /users/me/bets
-@router.get("/me/bets")
-def get_my_bets(username: str = Depends(get_current_username)):
-    with conn() as c:
-        rows = c.execute(
+# GET /users/me/bets (history: served from the read replica when fresh)
+@router.get("/me/bets", dependencies=[Depends(limit_reads)])
+def get_my_bets(
+    username: str = Depends(get_current_username),
+    include_archive: bool = Query(default=False, description="also include settled, archived markets"),
+):
+    def load(c):
+        sql, parts = archive.union_sql(
             """
             SELECT b.market_id, b.side, b.amount_cents, b.created_at,
                    m.question, m.closes_at, m.open
-            FROM bets b
-            LEFT JOIN markets m ON m.id = b.market_id
+            FROM {db}.bets b
+            LEFT JOIN {db}.markets m ON m.id = b.market_id
             WHERE b.username=?
-            ORDER BY b.created_at DESC
             """,
-            (username,),
-        ).fetchall()
+            include_archive and archive.attach(c),
+        )
+        return c.execute(f"{sql} ORDER BY created_at DESC", (username,) * parts).fetchall()
+
+    rows = [r for part in map_shards(load, read=True) for r in part]
+    if SHARD_COUNT > 1:
+        rows.sort(key=lambda r: r["created_at"], reverse=True)
     return [
         {
             "market_id": r["market_id"],
@@ -72,7 +81,7 @@ def create_user(req: UserCreate, x_admin_token: str = Header(default="")):
 
 # --- Named user (KEEP THIS LAST) ---
 
-@router.get("/{username}", response_model=UserOut)
+@router.get("/{username}", response_model=UserOut, dependencies=[Depends(limit_reads)])
 def get_user(username: str):
     with conn() as c:
         row = c.execute(
@@ -0,0 +1,28 @@
+# backend/app/schemas/alerts.py
+from __future__ import annotations
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+Direction = Literal["above", "below"]
+AlertStatus = Literal["armed", "fired", "cancelled"]
+
+class AlertReq(BaseModel):
+    # 'above': fire once price_yes >= threshold; 'below': once price_yes <= threshold
+    direction: Direction
+    threshold: float = Field(..., gt=0, lt=1)
+
+class AlertOut(BaseModel):
+    id: str
+    market_id: str
+    direction: Direction
+    threshold: float
+    status: AlertStatus
+    created_at: str
+    fired_at: Optional[str] = None
+    # price_yes right after the fill that fired it
+    fired_price: Optional[float] = None
+
+class InboxResp(BaseModel):
+    alerts: List[AlertOut]
+    # Pass back as `after` to get only alerts fired since; unchanged when empty
+    cursor: Optional[str] = None
@@ -14,9 +14,13 @@ class BetResp(BaseModel):
     new_balance_points: float
     # Shares issued to the user by this trade (points of $1 payout each)
     shares_points_issued: float
+    # Same quantity, exact: integer micro-shares (1_000_000 per share)
+    shares_micro_issued: int = 0
     # Spot price of YES after the fill (0..1)
     price_yes_after: float
     # Current odds after the fill (from effective pools)
     odds: Dict[str, float]
     # UI helper: 1/price spot multiples (not average fill)
-    implied_payout_per1_spot: Dict[str, float]
\ No newline at end of file
+    implied_payout_per1_spot: Dict[str, float]
+    # Resting limit orders executed by the price move of this trade
+    orders_filled: int = 0
@@ -39,4 +39,6 @@ class MarketOut(BaseModel):
     implied_payout_per1_spot: Dict[str, float]  # {"yes": 1/p_yes, "no": 1/p_no}
 
 class SettleReq(BaseModel):
-    winner: Winner
\ No newline at end of file
+    # Binary markets: winner. Multi-outcome (LMSR) markets: winner_idx.
+    winner: Optional[Winner] = None
+    winner_idx: Optional[int] = Field(default=None, ge=0)
\ No newline at end of file
@@ -0,0 +1,49 @@
+# backend/app/schemas/multi.py
+from __future__ import annotations
+from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel, Field
+from ..lmsr import MAX_OUTCOMES, MIN_OUTCOMES
+
+class CreateMultiMarketReq(BaseModel):
+    """
+    Admin-only create payload for an N-outcome LMSR market. `liquidity_points`
+    is the LMSR b: larger = deeper book, max house subsidy b * ln(N) points.
+    It is stored in cents, so it must be at least 0.01.
+    """
+    question: str = Field(min_length=5, max_length=200)
+    closes_at: datetime
+    outcomes: List[str] = Field(min_length=MIN_OUTCOMES, max_length=MAX_OUTCOMES)
+    liquidity_points: float = Field(100, ge=0.01)
+
+class OutcomeOut(BaseModel):
+    idx: int
+    label: str
+    price: float
+    shares_outstanding: float
+
+class MultiMarketOut(BaseModel):
+    id: str
+    question: str
+    closes_at: str
+    open: bool
+    settled: bool
+    winner_idx: Optional[int] = None
+    liquidity_points: float
+    volume_points: float
+    max_subsidy_points: float
+    outcomes: List[OutcomeOut]
+
+class MultiBetReq(BaseModel):
+    outcome: int = Field(..., ge=0)
+    # Amount the user wants to SPEND from balance (in points; 1 point = 100 cents).
+    spend_points: float = Field(..., gt=0)
+
+class MultiBetResp(BaseModel):
+    ok: bool
+    new_balance_points: float
+    outcome: int
+    shares_points_issued: float
+    shares_micro_issued: int
+    # Spot prices of every outcome after the fill (sum to 1)
+    prices: List[float]
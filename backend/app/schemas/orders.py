@@ -0,0 +1,41 @@
+# backend/app/schemas/orders.py
+from __future__ import annotations
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+Side = Literal["YES", "NO"]
+OrderStatus = Literal["open", "filled", "cancelled"]
+
+class OrderReq(BaseModel):
+    side: Side
+    # Buy while this side's spot price is at or below limit_price (0..1)
+    limit_price: float = Field(..., gt=0, lt=1)
+    # Most the order may spend (points); escrowed from balance on placement
+    budget_points: float = Field(..., gt=0)
+
+class FillOut(BaseModel):
+    order_id: str
+    username: str
+    side: Side
+    spend_points: float
+    shares_points: float
+    price_yes_after: float
+    remaining_points: float
+
+class OrderOut(BaseModel):
+    id: str
+    market_id: str
+    side: Side
+    limit_price: float
+    budget_points: float
+    remaining_points: float
+    status: OrderStatus
+    created_at: str
+    updated_at: str
+
+class OrderResp(BaseModel):
+    ok: bool
+    new_balance_points: float
+    order: OrderOut
+    # Fills executed by this request: the new order first (if it crossed), then any others it triggered
+    fills: List[FillOut]
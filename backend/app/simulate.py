@@ -0,0 +1,210 @@
+# backend/app/simulate.py
+# ------------------------------------------------------------
+# Vectorized replay of order flow through the CPMM in logic.py.
+# - Used offline (scripts/simulate.py) to pick seed_yes/seed_no points.
+# - Order flow is a [T, M] matrix: trade t of market m (spend in cents,
+#   side YES/NO). Zero spend = padding, no-op.
+# - Every (virtual-liquidity setting, market) pair is one lane. All
+#   S*M lanes advance together, one numpy step per trade index. Only the
+#   T trade steps run as a Python loop; markets and settings do not.
+# - The small-step integration inside logic._shares_for_spend_* is
+#   reproduced exactly (same step count, same equal sub-spends, same EPS
+#   clamping), so results match apply_buy up to float rounding.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .logic import EPS
+
+MAX_STEPS = 100          # logic.py: at most 100 integration steps per trade
+CENTS_PER_STEP = 50      # logic.py: ~50 cents per step
+CHUNK_LANES = 65_536     # bounds the [lanes, MAX_STEPS] scratch arrays (~50 MB)
+STEP_WIDTHS = (4, 16, 40, MAX_STEPS)
+
+
+def shares_for_spend(spend: np.ndarray, a0: np.ndarray, b0: np.ndarray) -> np.ndarray:
+    """
+    Shares issued for buying one side, vectorized over lanes.
+    a0: effective pool that *shrinks* during the buy (NO pool for a YES buy),
+    b0: effective pool that grows. The side's spot price is a / (a + b).
+    """
+    if spend.shape[0] > CHUNK_LANES:
+        return np.concatenate([
+            shares_for_spend(spend[i:i + CHUNK_LANES], a0[i:i + CHUNK_LANES], b0[i:i + CHUNK_LANES])
+            for i in range(0, spend.shape[0], CHUNK_LANES)
+        ])
+    k = np.clip((spend // CENTS_PER_STEP).astype(np.int64) + 1, 1, MAX_STEPS)
+    dS = spend / k
+    out = np.empty_like(spend)
+    # Small trades need few steps: group lanes by step count so the scratch
+    # width tracks the trades actually present instead of always MAX_STEPS.
+    lo = 0
+    for width in STEP_WIDTHS:
+        sel = (k > lo) & (k <= width)
+        lo = width
+        if not sel.any():
+            continue
+        i = np.arange(width, dtype=np.float64)[None, :]
+        d = dS[sel][:, None]
+        a = np.maximum(a0[sel][:, None] - i * d, EPS)
+        b = b0[sel][:, None] + i * d
+        price = np.maximum(a / (a + b), EPS)
+        out[sel] = np.where(i < k[sel][:, None], (d / 100.0) / price, 0.0).sum(axis=1)
+    return out
+
+
+def run(
+    spends: np.ndarray,
+    is_yes: np.ndarray,
+    virt_yes_cents: Sequence[int],
+    virt_no_cents: Sequence[int],
+    keep_paths: bool = False,
+) -> Dict[str, np.ndarray]:
+    """
+    Replay flow [T, M] under each virtual-liquidity setting.
+    virt_yes_cents / virt_no_cents: length-S arrays (one entry per setting).
+    Returns per-lane arrays shaped [S, M] (paths: [T, S, M] if keep_paths).
+    """
+    spends = np.asarray(spends, dtype=np.float64)
+    is_yes = np.asarray(is_yes, dtype=bool)
+    T, M = spends.shape
+    vy = np.asarray(virt_yes_cents, dtype=np.float64)
+    vn = np.asarray(virt_no_cents, dtype=np.float64)
+    S = vy.shape[0]
+
+    # Lane state (flattened S*M)
+    vy_l = np.repeat(vy, M)
+    vn_l = np.repeat(vn, M)
+    yes_real = np.zeros(S * M)
+    no_real = np.zeros(S * M)
+    yes_sh = np.zeros(S * M)
+    no_sh = np.zeros(S * M)
+    slip_w = np.zeros(S * M)      # spend-weighted slippage sum
+    slip_max = np.zeros(S * M)    # worst |avg fill - spot before|
+    p_min = np.full(S * M, np.inf)
+    p_max = np.full(S * M, -np.inf)
+    paths = np.empty((T, S * M), dtype=np.float32) if keep_paths else None
+
+    for t in range(T):
+        spend = np.tile(spends[t], S)
+        yes = np.tile(is_yes[t], S)
+        live = spend > 0
+
+        y = np.maximum(yes_real + vy_l, EPS)
+        n = np.maximum(no_real + vn_l, EPS)
+        a0 = np.where(yes, n, y)
+        b0 = np.where(yes, y, n)
+        spot_before = a0 / (a0 + b0)
+
+        sh = np.zeros(S * M)
+        if live.any():
+            sh[live] = shares_for_spend(spend[live], a0[live], b0[live])
+            avg = np.divide(spend / 100.0, sh, out=np.zeros_like(sh), where=sh > 0)
+            slip = np.where(live, avg - spot_before, 0.0)
+            slip_w += slip * spend
+            slip_max = np.maximum(slip_max, np.abs(slip))
+
+        yes_sh += np.where(yes, sh, 0.0)
+        no_sh += np.where(yes, 0.0, sh)
+        yes_real += np.where(yes & live, spend, 0.0)
+        no_real += np.where(~yes & live, spend, 0.0)
+
+        y = np.maximum(yes_real + vy_l, EPS)
+        n = np.maximum(no_real + vn_l, EPS)
+        price_yes = n / (y + n)
+        p_min = np.minimum(p_min, np.where(live, price_yes, np.inf))
+        p_max = np.maximum(p_max, np.where(live, price_yes, -np.inf))
+        if keep_paths:
+            paths[t] = price_yes
+
+    volume = yes_real + no_real
+    # Liability if every winning share were paid at par (1 share = 100 cents),
+    # net of real money collected, for the worse of the two outcomes.
+    exposure = np.maximum(yes_sh, no_sh) * 100.0 - volume
+
+    shape = (S, M)
+    out = {
+        "volume_cents": volume.reshape(shape),
+        "yes_shares": yes_sh.reshape(shape),
+        "no_shares": no_sh.reshape(shape),
+        "final_price_yes": price_yes.reshape(shape) if T else np.full(shape, np.nan),
+        "min_price_yes": p_min.reshape(shape),
+        "max_price_yes": p_max.reshape(shape),
+        "mean_slippage": np.divide(slip_w, volume, out=np.zeros_like(volume), where=volume > 0).reshape(shape),
+        "max_abs_slippage": slip_max.reshape(shape),
+        "exposure_cents": exposure.reshape(shape),
+    }
+    if keep_paths:
+        out["price_paths"] = paths.reshape(T, S, M)
+    return out
+
+
+def summarize(result: Dict[str, np.ndarray], settings: Sequence[Tuple[float, float]]) -> List[Dict[str, float]]:
+    """One row per setting, aggregated across markets."""
+    rows = []
+    traded = result["volume_cents"] > 0
+    for s, (seed_yes, seed_no) in enumerate(settings):
+        mask = traded[s]
+        pick = lambda k: result[k][s][mask] if mask.any() else np.zeros(1)
+        rows.append({
+            "seed_yes_points": seed_yes,
+            "seed_no_points": seed_no,
+            "markets": int(mask.sum()),
+            "mean_slippage": float(pick("mean_slippage").mean()),
+            "p95_abs_slippage": float(np.percentile(pick("max_abs_slippage"), 95)),
+            "mean_final_price_yes": float(pick("final_price_yes").mean()),
+            "mean_price_range": float((pick("max_price_yes") - pick("min_price_yes")).mean()),
+            "mean_exposure_points": float(pick("exposure_cents").mean() / 100.0),
+            "max_exposure_points": float(pick("exposure_cents").max() / 100.0),
+        })
+    return rows
+
+
+# --------------- order flow sources ---------------
+
+def synthetic_flow(
+    n_markets: int,
+    n_trades: int,
+    mean_spend_points: float = 10.0,
+    yes_share: float = 0.5,
+    seed: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Lognormal spends (cents, >= 1) and Bernoulli sides, shaped [T, M]."""
+    rng = np.random.default_rng(seed)
+    sigma = 1.0
+    mu = np.log(mean_spend_points * 100.0) - sigma ** 2 / 2
+    spends = np.maximum(1.0, np.round(rng.lognormal(mu, sigma, size=(n_trades, n_markets))))
+    is_yes = rng.random((n_trades, n_markets)) < yes_share
+    return spends, is_yes
+
+
+def ledger_flow(c: sqlite3.Connection, market_ids: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Historical bets as a padded [T_max, M] matrix, in created_at order per
+    market. Returns (spends, is_yes, market_ids in column order).
+    """
+    where, args = "", ()
+    if market_ids:
+        where = f"WHERE market_id IN ({','.join('?' * len(market_ids))})"
+        args = tuple(market_ids)
+    rows = c.execute(
+        f"SELECT market_id, side, amount_cents FROM bets {where} ORDER BY market_id, created_at, id",
+        args,
+    ).fetchall()
+    if not rows:
+        return np.zeros((0, 0)), np.zeros((0, 0), dtype=bool), []
+
+    mids = np.array([r[0] for r in rows], dtype=object)
+    ids, col = np.unique(mids, return_inverse=True)
+    # Position of each bet within its market (rows are grouped by market).
+    starts = np.r_[0, np.flatnonzero(col[1:] != col[:-1]) + 1]
+    counts = np.diff(np.r_[starts, len(rows)])
+    pos = np.arange(len(rows)) - np.repeat(starts, counts)
+
+    spends = np.zeros((counts.max(), len(ids)))
+    is_yes = np.zeros((counts.max(), len(ids)), dtype=bool)
+    spends[pos, col] = [r[2] for r in rows]
+    is_yes[pos, col] = [r[1] == "YES" for r in rows]
+    return spends, is_yes, list(ids)
@@ -0,0 +1,89 @@
+# backend/app/singleflight.py
+# ------------------------------------------------------------
+# Request coalescing for hot read routes.
+# - Concurrent identical requests (same route, params and data version)
+#   share one computation: the first caller runs it, the rest wait on
+#   its Event and get the same encoded JSON bytes (or the same error).
+#   A thundering herd costs one query + one encode instead of N.
+# - The key includes cache.version(), so a request arriving after a
+#   commit never joins a computation that started before it.
+# - Only in-flight calls are shared; nothing is kept once the leader
+#   finishes (value caching is cache.py's job).
+# - Per process: sync routes run in the threadpool, so waiting is a
+#   plain threading.Event.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import json, threading
+from typing import Any, Callable, Dict, Hashable, Optional
+from fastapi import Response
+from . import cache
+
+WAIT_TIMEOUT_S = 10.0   # a follower stops waiting and computes itself after this
+
+_lock = threading.Lock()
+_inflight: Dict[Hashable, "_Call"] = {}
+_stats = {"leaders": 0, "shared": 0, "timeouts": 0}
+
+
+class _Call:
+    __slots__ = ("done", "body", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.body: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+
+def encode(content: Any) -> bytes:
+    """Same bytes FastAPI's JSONResponse would send."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def do(key: Hashable, fn: Callable[[], bytes]) -> bytes:
+    """Run fn() once per concurrent `key`; everyone gets its result."""
+    with _lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+            _stats["leaders"] += 1
+        else:
+            _stats["shared"] += 1
+
+    if not leader:
+        if not call.done.wait(WAIT_TIMEOUT_S):
+            with _lock:
+                _stats["timeouts"] += 1
+            return fn()
+        if call.error is not None:
+            raise call.error
+        return call.body
+
+    try:
+        call.body = fn()
+        return call.body
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+def respond(route: str, params: Hashable, compute: Callable[[], Any]) -> Response:
+    """
+    JSON response for `route` with `params`, coalesced with identical
+    in-flight requests at the current data version. `compute` returns the
+    content (not yet encoded).
+    """
+    key = (route, params, cache.version())
+    body = do(key, lambda: encode(compute()))
+    return Response(content=body, media_type="application/json")
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return {**_stats, "inflight": len(_inflight)}
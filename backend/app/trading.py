@@ -0,0 +1,123 @@
+# backend/app/trading.py
+# ------------------------------------------------------------
+# One CPMM fill against a binary market, shared by market buys
+# (routers/bets.py) and resting limit-order fills (orders.py).
+# - Runs inside the caller's write transaction. The caller has already
+#   taken the money (balance debit, or escrow held by the order).
+# - Updates pools, positions, the bets ledger, the reconcile/analytics
+#   rollups and the cache feed, exactly as place_bet always has, and
+#   fires the price alerts the new price crossed (alerts.py).
+# - On a market shard without the home DB (escrowed cross-shard bets, see
+#   escrow.py) the caller passes `records`: the per-user rollups are then
+#   collected there and applied on the home DB later by record_users().
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import sqlite3, uuid
+from typing import Any, Dict, List, Optional
+from . import alerts, analytics, cache, reconcile
+from .logic import apply_buy
+
+
+def fill(
+    c: sqlite3.Connection,
+    m: Dict[str, Any],
+    username: str,
+    side: str,
+    spend_cents: int,
+    now: str,
+    order_id: Optional[str] = None,
+    bet_id: Optional[str] = None,
+    records: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    Buy `spend_cents` of `side` for `username`. `m` holds the market's id,
+    pools and virtual depth; its real pools are updated in place so the
+    caller can chain fills. Returns apply_buy's result plus bet_id.
+    With `records`, user rollups are appended there instead of written.
+    """
+    market_id = m["id"]
+    out = apply_buy(
+        side=side,
+        spend_cents=spend_cents,
+        yes_real_cents=m["yes_real_cents"],
+        no_real_cents=m["no_real_cents"],
+        virt_yes_cents=m["virt_yes_cents"],
+        virt_no_cents=m["virt_no_cents"],
+    )
+
+    # Market real pools
+    c.execute(
+        """
+        UPDATE markets
+           SET yes_real_cents=?, no_real_cents=?
+         WHERE id=?
+        """,
+        (out["new_yes_real_cents"], out["new_no_real_cents"], market_id),
+    )
+    m["yes_real_cents"] = out["new_yes_real_cents"]
+    m["no_real_cents"] = out["new_no_real_cents"]
+
+    # Upsert positions (issued shares as integer micro-shares)
+    add_yes_micro = out["shares_micro_issued"] if side == "YES" else 0
+    add_no_micro  = out["shares_micro_issued"] if side == "NO"  else 0
+
+    pos = c.execute(
+        "SELECT yes_shares_micro, no_shares_micro FROM positions WHERE market_id=? AND username=?",
+        (market_id, username),
+    ).fetchone()
+
+    if pos:
+        c.execute(
+            """
+            UPDATE positions
+               SET yes_shares_micro = yes_shares_micro + ?,
+                   no_shares_micro  = no_shares_micro  + ?,
+                   created_at = ?
+             WHERE market_id=? AND username=?
+            """,
+            (add_yes_micro, add_no_micro, now, market_id, username),
+        )
+    else:
+        c.execute(
+            """
+            INSERT INTO positions (id, market_id, username, yes_shares_micro, no_shares_micro, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (str(uuid.uuid4()), market_id, username, add_yes_micro, add_no_micro, now),
+        )
+
+    # Append to bets ledger and the reconciliation aggregates
+    bet_id = bet_id or str(uuid.uuid4())
+    c.execute(
+        """
+        INSERT INTO bets (id, market_id, username, side, amount_cents, created_at, order_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (bet_id, market_id, username, side, spend_cents, now, order_id),
+    )
+    if records is None:
+        reconcile.record_bet(c, market_id, username, bet_id, side, spend_cents)
+        analytics.record_bet(c, market_id, username, side, spend_cents, now, new_trader=pos is None)
+    else:
+        reconcile.record_bet_market(c, market_id, bet_id, side, spend_cents)
+        analytics.record_bet_market(c, market_id, side, spend_cents, now, new_trader=pos is None)
+        records.append({"bet_id": bet_id, "username": username, "side": side, "amount_cents": spend_cents,
+                        "new_trader": int(pos is None), "created_at": now})
+
+    # Tell other workers their cached copy of this market is stale
+    cache.publish_market(c, market_id)
+
+    # Price alerts this fill crossed
+    alerts.fire(c, market_id, out["price_yes_after"], now)
+
+    out["bet_id"] = bet_id
+    return out
+
+
+def record_users(c: sqlite3.Connection, records: List[Dict[str, Any]]) -> None:
+    """Apply the user rollups fill() collected in `records` (on the home DB)."""
+    for r in records:
+        reconcile.record_bet_user(c, r["username"], r["bet_id"], r["side"], r["amount_cents"])
+        analytics.record_bet_user(c, r["username"], r["amount_cents"], r["created_at"],
+                                  new_trader=bool(r["new_trader"]))
@@ -0,0 +1,71 @@
+# backend/app/triggers.py
+# ------------------------------------------------------------
+# Sorted threshold index for "which rules does this price cross?".
+# - Entries are (threshold, tiebreak, item) kept in one sorted list.
+#   Range queries bisect to the boundary and walk only the matches:
+#   O(log n + k) per price change, whatever the total n.
+# - Inserts/removals are a bisect plus a list memmove, which is cheap
+#   even at hundreds of thousands of entries.
+# - Used for resting limit orders (orders.py) and price alerts.
+# ------------------------------------------------------------
+
+from __future__ import annotations
+import bisect
+from typing import Any, Iterable, Iterator, List, Tuple
+
+Entry = Tuple[float, Any, Any]   # (threshold, tiebreak, item)
+
+
+class ThresholdIndex:
+    __slots__ = ("_e",)
+
+    def __init__(self, entries: Iterable[Entry] = ()):
+        self._e: List[Entry] = sorted(entries)
+
+    def __len__(self) -> int:
+        return len(self._e)
+
+    def add(self, threshold: float, tiebreak: Any, item: Any) -> None:
+        bisect.insort(self._e, (threshold, tiebreak, item))
+
+    def remove(self, threshold: float, tiebreak: Any, item: Any) -> bool:
+        e = (threshold, tiebreak, item)
+        i = bisect.bisect_left(self._e, e)
+        if i < len(self._e) and self._e[i] == e:
+            del self._e[i]
+            return True
+        return False
+
+    def at_or_above(self, x: float) -> Iterator[Entry]:
+        """Entries with threshold >= x, highest threshold first."""
+        lo = bisect.bisect_left(self._e, (x,))
+        for i in range(len(self._e) - 1, lo - 1, -1):
+            yield self._e[i]
+
+    def at_or_below(self, x: float) -> Iterator[Entry]:
+        """Entries with threshold <= x, lowest threshold first."""
+        hi = bisect.bisect_right(self._e, (x, _TOP))
+        for i in range(hi):
+            yield self._e[i]
+
+    def levels(self) -> List[Tuple[float, int]]:
+        """(threshold, entry count) per distinct threshold, ascending."""
+        out: List[Tuple[float, int]] = []
+        for th, _, _ in self._e:
+            if out and out[-1][0] == th:
+                out[-1] = (th, out[-1][1] + 1)
+            else:
+                out.append((th, 1))
+        return out
+
+
+class _Top:
+    """Compares greater than any tiebreak, so (x, _TOP) sorts after every (x, ...)."""
+    def __lt__(self, other: Any) -> bool:
+        return False
+
+    def __gt__(self, other: Any) -> bool:
+        return True
+
+
+_TOP = _Top()
@@ -0,0 +1,27 @@
+# backend/scripts/archive.py
+# Move settled markets and their bets/positions into the archive DB.
+#   PYTHONPATH=. python scripts/archive.py                       # everything settled
+#   PYTHONPATH=. python scripts/archive.py --batch 500 --max-batches 20
+#   PYTHONPATH=. python scripts/archive.py --closed-before 2025-06-01
+import argparse
+from app import archive, db
+
+def main():
+    ap = argparse.ArgumentParser(description="Archive settled markets")
+    ap.add_argument("--batch", type=int, default=100, help="markets per transaction")
+    ap.add_argument("--max-batches", type=int, default=None)
+    ap.add_argument("--closed-before", default=None, help="ISO time; keep later markets hot")
+    ap.add_argument("--vacuum", action="store_true", help="VACUUM the hot DB afterwards to return freed pages")
+    args = ap.parse_args()
+
+    totals = archive.archive_settled(args.batch, args.max_batches, args.closed_before)
+    print(f"archived {totals} -> {', '.join(db.archive_path(db.shard_path(k)) for k in db.market_shards())}")
+    if args.vacuum:
+        for k in db.market_shards():
+            with db.market_conn(shard=k) as c:
+                c.isolation_level = None
+                c.execute("VACUUM")
+        print("vacuumed hot DB" + ("s" if db.SHARD_COUNT > 1 else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# backend/scripts/export.py
+# Bulk export of ledger tables to CSV or Parquet with constant memory.
+#   PYTHONPATH=. python scripts/export.py --out-dir exports                    # all tables, CSV
+#   PYTHONPATH=. python scripts/export.py --table bets --format parquet --out-dir exports
+#   PYTHONPATH=. python scripts/export.py --table bets --incremental           # rows after the saved watermark
+#   PYTHONPATH=. python scripts/export.py --replica                            # read the replica if fresh
+# Watermarks are kept in <out-dir>/watermarks.json; incremental runs write
+# a new timestamped file per table rather than appending.
+import argparse, datetime as dt, json, os
+from app import export
+
+def main():
+    ap = argparse.ArgumentParser(description="Streaming ledger export")
+    ap.add_argument("--table", action="append", choices=list(export.TABLES),
+                    help="table to export (repeatable; default: all)")
+    ap.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    ap.add_argument("--out-dir", default="exports")
+    ap.add_argument("--chunk-rows", type=int, default=export.CHUNK_ROWS)
+    ap.add_argument("--incremental", action="store_true", help="resume from the saved watermark")
+    ap.add_argument("--replica", action="store_true", help="read from the read replica when fresh enough")
+    args = ap.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    state_path = os.path.join(args.out_dir, "watermarks.json")
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+
+    stamp = dt.datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    for table in args.table or list(export.TABLES):
+        since = state.get(table) if args.incremental else None
+        chunks = export.iter_chunks(table, since=since, chunk_rows=args.chunk_rows, replica=args.replica)
+        name = f"{table}-{stamp}" if args.incremental else table
+        out_path = os.path.join(args.out_dir, f"{name}.{args.format}")
+        if args.format == "parquet":
+            n, wm = export.write_parquet(table, chunks, out_path)
+        else:
+            with open(out_path, "w", newline="") as f:
+                n, wm = export.write_csv(table, chunks, f)
+        if wm is not None:
+            state[table] = wm
+        print(f"{table}: {n} rows -> {out_path} (watermark {state.get(table)})")
+
+    with open(state_path, "w") as f:
+        json.dump(state, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# backend/scripts/reconcile.py
+# Verify ledger invariants from the command line.
+#   PYTHONPATH=. python scripts/reconcile.py            # changed rows only
+#   PYTHONPATH=. python scripts/reconcile.py --full     # every aggregate
+#   PYTHONPATH=. python scripts/reconcile.py --rebuild  # recompute aggregates from bets, then verify
+# --rebuild needs a single database (SHARD_COUNT=1).
+import argparse, json, sys
+from app.db import conn, SHARD_COUNT
+from app import archive, reconcile
+
+def main():
+    ap = argparse.ArgumentParser(description="Verify ledger reconciliation invariants")
+    ap.add_argument("--full", action="store_true", help="check all aggregates, not just dirty ones")
+    ap.add_argument("--shallow", action="store_true", help="skip re-summing ledger rows")
+    ap.add_argument("--rebuild", action="store_true", help="recompute aggregates from the bets ledger first")
+    args = ap.parse_args()
+
+    if args.rebuild:
+        if SHARD_COUNT > 1:
+            sys.exit("--rebuild scans one database; not supported with SHARD_COUNT > 1")
+        with conn() as c:
+            archive.attach(c)   # archived bets still count towards user totals
+            print(f"rebuilt aggregates: {reconcile.rebuild(c)}")
+    report = reconcile.verify_all(full=args.full or args.rebuild, deep=not args.shallow)
+
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["ok"] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# backend/scripts/seed.py
+# Generate a production-sized database: users, markets, bets and positions.
+#   PYTHONPATH=. python scripts/seed.py --users 100000 --markets 20000 --bets 5000000
+#   PYTHONPATH=. python scripts/seed.py --db /tmp/big.db --bets 1000000 --rng-seed 7
+#
+# - Pools and shares are consistent with logic.apply_buy: each market's
+#   trades are replayed in created_at order through the same CPMM kernel
+#   as scripts/simulate.py (vectorized across markets).
+# - Balances are what each user has left after their bets: a random
+#   amount in [0, --start-points], never negative.
+# - All users share one bcrypt hash (password: "password"); hashing a
+#   million passwords would dominate the run.
+# - Loading uses executemany in large transactions with secondary indexes
+#   dropped and recreated afterwards. Run on a DB created by init_db.py +
+#   migrations; existing rows are kept.
+# - Loads one database file: seed with SHARD_COUNT=1 (markets on shard 0).
+import argparse, os, sqlite3, time, uuid
+import numpy as np
+from app import archive, db, simulate, reconcile, analytics
+from app.auth import hash_password
+from app.logic import MAX_FILL_MICRO, SHARE_MICRO
+
+QUESTION_TEMPLATES = [
+    "Will {} win the {} championship?",
+    "Will {} release a new product before {}?",
+    "Will {} stock close higher on {}?",
+    "Will the {} vote pass in {}?",
+    "Will {} announce a merger with {}?",
+]
+NOUNS = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Tyrell",
+         "Cyberdyne", "Soylent", "Aperture", "Gringotts", "Wonka", "Oscorp", "Vandelay"]
+TABLES_WITH_INDEXES = ("bets", "positions", "markets", "users")
+
+
+def _iso(ts_us: np.ndarray) -> np.ndarray:
+    """Microsecond epoch -> 'YYYY-MM-DDTHH:MM:SS.ffffff' (datetime.isoformat() format)."""
+    return np.datetime_as_string(ts_us.astype("datetime64[us]"), unit="us")
+
+
+def _uuids(rng: np.random.Generator, n: int):
+    raw = rng.integers(0, 2**63, size=(n, 2), dtype=np.int64).astype(np.uint64)
+    return [str(uuid.UUID(int=(int(a) << 64 | int(b)), version=4)) for a, b in raw]
+
+
+def generate(args, rng):
+    N, M, B = args.users, args.markets, args.bets
+    t0 = int(np.datetime64("2025-01-01T00:00:00", "us").astype(np.int64))
+    span = int(args.days * 86_400 * 1_000_000)
+
+    # --- users ---
+    usernames = [f"{args.prefix}{i:07d}" for i in range(N)]
+    activity = 1.0 / np.arange(1, N + 1) ** 0.7          # a few heavy traders
+    activity = rng.permutation(activity / activity.sum())
+
+    # --- markets ---
+    market_ids = _uuids(rng, M)
+    questions = [
+        QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)].format(
+            NOUNS[rng.integers(len(NOUNS))], f"{NOUNS[rng.integers(len(NOUNS))]} {2026 + i % 5} #{i}")
+        for i in range(M)
+    ]
+    closes_at = _iso(t0 + span + rng.integers(0, span, size=M))
+    seed_pts = rng.choice(np.array([100, 500, 1000, 5000]), size=M)
+    virt = (seed_pts * 100).astype(np.float64)
+    yes_bias = rng.beta(2, 2, size=M)
+
+    # --- trade counts per market (skewed), sorted so active lanes are a prefix ---
+    popularity = rng.lognormal(0, 1.2, size=M)
+    counts = rng.multinomial(B, popularity / popularity.sum())
+    order = np.argsort(-counts, kind="stable")
+    counts_sorted = counts[order]
+    offsets = np.r_[0, np.cumsum(counts_sorted)[:-1]]
+
+    bet_market = np.repeat(order, counts_sorted)                 # market index per bet
+    spend = np.maximum(1, np.round(rng.lognormal(np.log(args.mean_spend * 100) - 0.5, 1.0, size=B)))
+    is_yes = rng.random(B) < yes_bias[bet_market]
+    bet_user = rng.choice(N, size=B, p=activity)
+    shares = np.empty(B)
+
+    # Replay trades: round r advances every market with > r trades.
+    yes_real = np.zeros(M)
+    no_real = np.zeros(M)
+    for r in range(int(counts_sorted.max(initial=0))):
+        active = int(np.searchsorted(-counts_sorted, -r, side="left"))
+        lanes = order[:active]
+        idx = offsets[:active] + r
+        yes = is_yes[idx]
+        y = np.maximum(yes_real[lanes] + virt[lanes], simulate.EPS)
+        n = np.maximum(no_real[lanes] + virt[lanes], simulate.EPS)
+        shares[idx] = simulate.shares_for_spend(spend[idx], np.where(yes, n, y), np.where(yes, y, n))
+        yes_real[lanes] += np.where(yes, spend[idx], 0)
+        no_real[lanes] += np.where(yes, 0, spend[idx])
+
+    # Timestamps increasing within each market (trade order == created_at order).
+    gaps = rng.exponential(span / max(1, counts.max()), size=B)
+    start = t0 + rng.integers(0, span // 2 + 1, size=M)
+    cs = np.cumsum(gaps)
+    first = np.minimum(offsets, max(B - 1, 0))           # zero-trade markets sort last
+    within = cs - np.repeat(cs[first] - gaps[first], counts_sorted) if B else cs
+    bet_ts = (start[bet_market] + within).astype(np.int64)
+
+    # --- positions: aggregate shares per (market, user) ---
+    pair = bet_market.astype(np.int64) * N + bet_user
+    uniq, inv = np.unique(pair, return_inverse=True)
+    # Floor to micro-shares per bet, as logic.to_micro does, then sum exactly.
+    micro = np.floor(np.minimum(np.nan_to_num(shares * SHARE_MICRO, nan=MAX_FILL_MICRO), MAX_FILL_MICRO)).astype(np.int64)
+    pos_yes = np.zeros(len(uniq), dtype=np.int64)
+    pos_no = np.zeros(len(uniq), dtype=np.int64)
+    np.add.at(pos_yes, inv, np.where(is_yes, micro, 0))
+    np.add.at(pos_no, inv, np.where(is_yes, 0, micro))
+    pos_ts = np.zeros(len(uniq), dtype=np.int64)
+    np.maximum.at(pos_ts, inv, bet_ts)
+
+    # --- balances: the unspent remainder (bets are already paid for) ---
+    balances = rng.integers(0, args.start_points * 100 + 1, size=N)
+
+    return dict(
+        usernames=usernames, balances=balances,
+        market_ids=market_ids, questions=questions, closes_at=closes_at,
+        virt=virt.astype(np.int64), yes_real=yes_real.astype(np.int64), no_real=no_real.astype(np.int64),
+        bet_market=bet_market, bet_user=bet_user, spend=spend.astype(np.int64), is_yes=is_yes,
+        bet_ts=bet_ts, pos_market=uniq // N, pos_user=uniq % N, pos_yes=pos_yes, pos_no=pos_no, pos_ts=pos_ts,
+        closed=rng.random(M) < args.closed_frac,
+    )
+
+
+def _batched(c, sql, rows, batch):
+    for i in range(0, len(rows), batch):
+        c.execute("BEGIN")
+        c.executemany(sql, rows[i:i + batch])
+        c.execute("COMMIT")
+
+
+def load(c: sqlite3.Connection, d, batch: int, rng) -> None:
+    c.isolation_level = None       # explicit BEGIN/COMMIT per batch
+    c.execute("PRAGMA synchronous=OFF")
+    c.execute("PRAGMA cache_size=-262144")   # 256 MB
+    c.execute("PRAGMA temp_store=MEMORY")
+
+    # Defer secondary indexes: drop now, recreate after the bulk insert.
+    indexes = c.execute(
+        f"""
+        SELECT name, sql FROM sqlite_master
+        WHERE type='index' AND sql IS NOT NULL
+          AND tbl_name IN ({','.join('?' * len(TABLES_WITH_INDEXES))})
+        """,
+        TABLES_WITH_INDEXES,
+    ).fetchall()
+    for name, _ in indexes:
+        c.execute(f"DROP INDEX IF EXISTS {name}")
+
+    try:
+        pw = hash_password("password")
+        users, mids = d["usernames"], d["market_ids"]
+        _batched(c, "INSERT INTO users (username, balance_cents, password_hash) VALUES (?, ?, ?)",
+                 [(u, int(b), pw) for u, b in zip(users, d["balances"])], batch)
+        _batched(c, """
+            INSERT INTO markets (id, question, closes_at, open, settled, winner,
+                                 yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents)
+            VALUES (?, ?, ?, ?, 0, NULL, ?, ?, ?, ?)
+            """,
+            [(mids[i], d["questions"][i], str(d["closes_at"][i]), int(not d["closed"][i]),
+              int(d["yes_real"][i]), int(d["no_real"][i]), int(d["virt"][i]), int(d["virt"][i]))
+             for i in range(len(mids))], batch)
+
+        # .tolist() converts numpy scalars once, far cheaper than int()/str() per cell.
+        side = np.where(d["is_yes"], "YES", "NO").tolist()
+        bet_rows = list(zip(
+            _uuids(rng, len(d["spend"])),
+            [mids[m] for m in d["bet_market"].tolist()],
+            [users[u] for u in d["bet_user"].tolist()],
+            side, d["spend"].tolist(), _iso(d["bet_ts"]).tolist(),
+        ))
+        _batched(c, "INSERT INTO bets (id, market_id, username, side, amount_cents, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                 bet_rows, batch)
+        del bet_rows
+
+        pos_rows = list(zip(
+            _uuids(rng, len(d["pos_yes"])),
+            [mids[m] for m in d["pos_market"].tolist()],
+            [users[u] for u in d["pos_user"].tolist()],
+            d["pos_yes"].tolist(), d["pos_no"].tolist(), _iso(d["pos_ts"]).tolist(),
+        ))
+        _batched(c, """
+            INSERT INTO positions (id, market_id, username, yes_shares_micro, no_shares_micro, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, pos_rows, batch)
+        del pos_rows
+    finally:
+        # A failed batch leaves its transaction open; the indexes come back either way.
+        if c.in_transaction:
+            c.execute("ROLLBACK")
+        for _, sql in indexes:
+            c.execute(sql)
+        c.execute("ANALYZE")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bulk synthetic data generator")
+    ap.add_argument("--db", default=None, help="target database (default: app DB)")
+    ap.add_argument("--users", type=int, default=10_000)
+    ap.add_argument("--markets", type=int, default=2_000)
+    ap.add_argument("--bets", type=int, default=200_000)
+    ap.add_argument("--mean-spend", type=float, default=10.0, help="mean bet in points")
+    ap.add_argument("--start-points", type=int, default=1000, help="max unspent balance per user")
+    ap.add_argument("--days", type=float, default=90, help="trading window length")
+    ap.add_argument("--closed-frac", type=float, default=0.1, help="fraction of markets closed (unsettled)")
+    ap.add_argument("--prefix", default="user", help="username prefix (must not collide with existing users)")
+    ap.add_argument("--batch", type=int, default=50_000, help="rows per transaction")
+    ap.add_argument("--skip-rollups", action="store_true", help="don't rebuild reconcile/analytics tables")
+    ap.add_argument("--rng-seed", type=int, default=None)
+    args = ap.parse_args()
+
+    path = os.path.abspath(args.db or db.DB_PATH)
+    rng = np.random.default_rng(args.rng_seed)
+
+    t = time.perf_counter()
+    data = generate(args, rng)
+    print(f"generated {args.users} users, {args.markets} markets, {args.bets} bets, "
+          f"{len(data['pos_yes'])} positions in {time.perf_counter() - t:.1f}s")
+
+    t = time.perf_counter()
+    c = sqlite3.connect(path)
+    try:
+        load(c, data, args.batch, rng)
+        print(f"loaded into {path} in {time.perf_counter() - t:.1f}s")
+        if not args.skip_rollups:
+            t = time.perf_counter()
+            archive.attach(c)   # before BEGIN: ATTACH can't run inside a transaction
+            c.execute("BEGIN")
+            reconcile.rebuild(c)
+            analytics.rebuild(c)
+            c.execute("COMMIT")
+            print(f"rebuilt reconcile/analytics rollups in {time.perf_counter() - t:.1f}s")
+    finally:
+        c.close()
+
+
+if __name__ == "__main__":
+    main()
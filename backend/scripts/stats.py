@@ -0,0 +1,26 @@
+# backend/scripts/stats.py
+# Maintain the /admin/stats rollup tables.
+#   PYTHONPATH=. python scripts/stats.py --rebuild   # recompute from the bets ledger
+#   PYTHONPATH=. python scripts/stats.py --compact   # drop closed buckets' trader sets
+# --rebuild needs a single database (SHARD_COUNT=1).
+import argparse, json, sys
+from app.db import conn, SHARD_COUNT
+from app import analytics
+
+def main():
+    ap = argparse.ArgumentParser(description="Maintain analytics rollups")
+    ap.add_argument("--rebuild", action="store_true", help="recompute every rollup from bets")
+    ap.add_argument("--compact", action="store_true", help="drop unique-trader sets of closed buckets")
+    args = ap.parse_args()
+
+    if args.rebuild and SHARD_COUNT > 1:
+        sys.exit("--rebuild scans one database; not supported with SHARD_COUNT > 1")
+    with conn() as c:
+        if args.rebuild:
+            print(f"rebuilt rollups: {analytics.rebuild(c)}")
+        if args.compact:
+            print(f"compacted {analytics.compact(c)} trader rows")
+        print(json.dumps(analytics.totals(c), indent=2))
+
+if __name__ == "__main__":
+    main()
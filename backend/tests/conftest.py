@@ -0,0 +1,103 @@
+# backend/tests/conftest.py
+# App under test on a throwaway database with three shards, so markets off
+# shard 0 trade through the escrow protocol (app/escrow.py).
+# - Migrations 0001-0005 don't replay onto an empty file (0003/0012 expect
+#   columns of older schemas), so the base tables are created as those
+#   migrations leave them and 0006 onward are applied from app/migrations.
+# - Env vars are set before `app` is imported: config reads them once.
+#   Periodic escrow recovery is off so a 'held' escrow stays put until a
+#   test resolves it.
+#   db.DB_PATH is a module constant, so it is pointed at the file directly.
+import glob, os, sqlite3, sys, tempfile, uuid
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+DB_FILE = os.path.join(tempfile.mkdtemp(prefix="market-tests-"), "app.db")
+os.environ["SHARD_COUNT"] = "3"
+os.environ["RATE_LIMITS_ENABLED"] = "0"
+os.environ["BOOT_WARM"] = "0"
+os.environ["ESCROW_RECOVER_EVERY_S"] = "0"   # tests drive escrow.recover() themselves
+
+BASE_DDL = """
+CREATE TABLE users (
+  username TEXT PRIMARY KEY, balance_cents INTEGER NOT NULL, password_hash TEXT,
+  created_at TEXT DEFAULT (datetime('now'))
+);
+CREATE TABLE markets (
+  id TEXT PRIMARY KEY, question TEXT NOT NULL, closes_at TEXT NOT NULL,
+  open INTEGER NOT NULL DEFAULT 1,
+  yes_real_cents INTEGER NOT NULL DEFAULT 0, no_real_cents INTEGER NOT NULL DEFAULT 0,
+  virt_yes_cents INTEGER NOT NULL DEFAULT 100000, virt_no_cents INTEGER NOT NULL DEFAULT 100000,
+  settled INTEGER NOT NULL DEFAULT 0, winner TEXT CHECK (winner IN ('YES','NO'))
+);
+CREATE TABLE bets (
+  id TEXT PRIMARY KEY, market_id TEXT NOT NULL, username TEXT NOT NULL,
+  side TEXT NOT NULL CHECK (side IN ('YES','NO')), amount_cents INTEGER NOT NULL,
+  created_at TEXT NOT NULL
+);
+CREATE TABLE positions (
+  id TEXT PRIMARY KEY, market_id TEXT NOT NULL, username TEXT NOT NULL,
+  yes_shares_points REAL NOT NULL DEFAULT 0.0, no_shares_points REAL NOT NULL DEFAULT 0.0,
+  created_at TEXT NOT NULL, UNIQUE(market_id, username)
+);
+"""
+
+
+def _create_db(path):
+    c = sqlite3.connect(path)
+    try:
+        c.executescript(BASE_DDL)
+        for f in sorted(glob.glob(os.path.join(BACKEND, "app", "migrations", "*.sql"))):
+            if int(os.path.basename(f)[:4]) >= 6:
+                with open(f) as sql:
+                    c.executescript(sql.read())
+        c.commit()
+    finally:
+        c.close()
+
+
+_create_db(DB_FILE)
+
+import pytest
+from fastapi.testclient import TestClient
+from app import db
+db.DB_PATH = DB_FILE
+from app.config import ADMIN_TOKEN
+from app.main import app
+
+ADMIN = {"X-Admin-Token": ADMIN_TOKEN}
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def user(client):
+    """Register a fresh user with `points`; returns (username, auth headers)."""
+    def make(points=1000):
+        name = "u" + uuid.uuid4().hex[:12]
+        r = client.post("/auth/register", json={"username": name, "password": "pw1234",
+                                                "starting_points": points})
+        assert r.status_code == 200, r.text
+        return name, {"Authorization": "Bearer " + r.json()["access_token"]}
+    return make
+
+
+@pytest.fixture
+def shard_market(client):
+    """Create an open binary market on a shard other than 0; returns its id."""
+    def make():
+        while True:
+            r = client.post("/markets", headers=ADMIN, json={
+                "question": f"Will test event {uuid.uuid4().hex[:8]} happen?",
+                "closes_at": "2030-01-01T00:00:00Z",
+                "seed_yes_points": 1000, "seed_no_points": 1000,
+            })
+            assert r.status_code == 200, r.text
+            if db.shard_of(r.json()["id"]) != 0:
+                return r.json()["id"]
+    return make
@@ -0,0 +1,136 @@
+# backend/tests/test_escrow.py
+# Cross-shard bets (app/escrow.py): every way step 2 can go wrong leaves
+# the user's balance whole and the escrow resolved exactly once.
+import sqlite3, time
+from contextlib import contextmanager
+from app import db, escrow, idempotency
+from app.routers import bets
+from conftest import ADMIN
+
+
+def _balance(client, headers):
+    return client.get("/users/me", headers=headers).json()["balance_points"]
+
+
+def _escrows(username):
+    with db.conn() as h:
+        return [r["status"] for r in h.execute(
+            "SELECT status FROM escrows WHERE username=? ORDER BY created_at", (username,)
+        )]
+
+
+def _bets(market_id, username):
+    with db.market_conn(market_id) as s:
+        return s.execute(
+            "SELECT COUNT(*) FROM bets WHERE market_id=? AND username=?", (market_id, username)
+        ).fetchone()[0]
+
+
+def test_failed_fill_refunds_the_hold(client, user, shard_market):
+    name, headers = user(100)
+    mid = shard_market()
+    # Closed on the shard: the hold succeeds, the fill is refused
+    assert client.post(f"/admin/markets/{mid}/close", headers=ADMIN).status_code == 200
+
+    r = client.post(f"/markets/{mid}/bet", json={"side": "YES", "spend_points": 10}, headers=headers)
+
+    assert r.status_code == 400
+    assert _balance(client, headers) == 100
+    assert _escrows(name) == ["refunded"]
+    assert _bets(mid, name) == 0
+
+
+def test_crash_after_fill_is_finalized_by_recover(client, user, shard_market, monkeypatch):
+    name, headers = user(100)
+    mid = shard_market()
+
+    def crash(*a, **kw):
+        raise sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(escrow, "finalize", crash)
+    r = client.post(f"/markets/{mid}/bet", json={"side": "YES", "spend_points": 10}, headers=headers)
+    monkeypatch.undo()
+
+    # The trade stands; only the home side is left 'held'
+    assert r.status_code == 200
+    assert _escrows(name) == ["held"]
+    assert _bets(mid, name) == 1
+
+    assert escrow.recover(min_age_s=-1)["finalized"] == 1
+    assert _escrows(name) == ["spent"]
+    assert _balance(client, headers) == 90
+    assert escrow.recover(min_age_s=-1) == {"finalized": 0, "refunded": 0}
+
+
+def test_recover_timer_settles_a_failed_finalize(client, user, shard_market, monkeypatch):
+    name, headers = user(100)
+    mid = shard_market()
+
+    def crash(*a, **kw):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(escrow, "finalize", crash)
+    r = client.post(f"/markets/{mid}/bet", json={"side": "YES", "spend_points": 10}, headers=headers)
+    monkeypatch.undo()
+    assert r.status_code == 200
+    assert _escrows(name) == ["held"]
+
+    # No one calls recover(): the periodic thread picks the hold up
+    monkeypatch.setattr(escrow, "ESCROW_RECOVER_EVERY_S", 0.05)
+    monkeypatch.setattr(escrow, "ESCROW_RECOVER_AFTER_S", 0)
+    escrow.start()
+    try:
+        deadline = time.monotonic() + 5
+        while _escrows(name) == ["held"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        escrow.stop()
+
+    assert _escrows(name) == ["spent"]
+    assert _balance(client, headers) == 90
+    assert _bets(mid, name) == 1
+
+
+def test_late_fill_after_void_is_rejected(client, user, shard_market, monkeypatch):
+    name, headers = user(100)
+    mid = shard_market()
+    real_conn = bets.market_conn
+
+    @contextmanager
+    def recover_first(*a, **kw):
+        # The request stalls between hold and fill long enough for recovery
+        # to void the escrow on the shard and refund it.
+        escrow.recover(min_age_s=-1)
+        with real_conn(*a, **kw) as s:
+            yield s
+    monkeypatch.setattr(bets, "market_conn", recover_first)
+
+    r = client.post(f"/markets/{mid}/bet", json={"side": "YES", "spend_points": 10}, headers=headers)
+
+    assert r.status_code == 409
+    assert _balance(client, headers) == 100
+    assert _escrows(name) == ["refunded"]
+    assert _bets(mid, name) == 0
+
+
+def test_idempotent_replay_on_shard_releases_its_hold(client, user, shard_market, monkeypatch):
+    name, headers = user(100)
+    mid = shard_market()
+    headers = {**headers, "Idempotency-Key": "replay-1"}
+    body = {"side": "YES", "spend_points": 10}
+    first = client.post(f"/markets/{mid}/bet", json=body, headers=headers)
+    assert first.status_code == 200
+
+    # A concurrent retry: the pre-check misses, the shard transaction finds the stored response
+    real_lookup = idempotency.lookup
+    calls = []
+    def racing_lookup(*a, **kw):
+        calls.append(1)
+        return None if len(calls) == 1 else real_lookup(*a, **kw)
+    monkeypatch.setattr(idempotency, "lookup", racing_lookup)
+
+    again = client.post(f"/markets/{mid}/bet", json=body, headers=headers)
+
+    assert again.status_code == 200
+    assert again.json() == first.json()
+    assert _escrows(name) == ["spent", "refunded"]
+    assert _balance(client, headers) == 90
+    assert _bets(mid, name) == 1
@@ -0,0 +1,102 @@
+# backend/tests/test_orders.py
+# Resting limit orders (app/orders.py) swept by bets that cross them.
+import uuid
+import pytest
+from conftest import ADMIN
+from app import db
+from app.logic import apply_buy
+
+
+def _market(client, home: bool):
+    """An open binary market on shard 0 (home) or on another shard."""
+    while True:
+        r = client.post("/markets", headers=ADMIN, json={
+            "question": f"Will order test {uuid.uuid4().hex[:8]} happen?",
+            "closes_at": "2030-01-01T00:00:00Z",
+            "seed_yes_points": 1000, "seed_no_points": 1000,
+        })
+        assert r.status_code == 200, r.text
+        if (db.shard_of(r.json()["id"]) == 0) == home:
+            return r.json()["id"]
+
+
+def _pools(market_id):
+    with db.market_conn(market_id) as c:
+        return dict(c.execute(
+            "SELECT yes_real_cents, no_real_cents, virt_yes_cents, virt_no_cents FROM markets WHERE id=?",
+            (market_id,),
+        ).fetchone())
+
+
+def _yes_micro(market_id, username):
+    with db.market_conn(market_id) as c:
+        r = c.execute("SELECT yes_shares_micro FROM positions WHERE market_id=? AND username=?",
+                      (market_id, username)).fetchone()
+    return r[0] if r else 0
+
+
+def _order(client, market_id, headers, side, limit, points):
+    r = client.post(f"/markets/{market_id}/orders", headers=headers,
+                    json={"side": side, "limit_price": limit, "budget_points": points})
+    assert r.status_code == 200, r.text
+    assert r.json()["order"]["status"] == "open"
+    return r.json()["order"]["id"]
+
+
+def test_sweep_fills_crossed_orders_best_first_at_curve_price(client, user):
+    m = _market(client, True)
+    (deep, deep_h), (near, near_h), (far, far_h), (_, no_h), (_, taker) = (user(1000) for _ in range(5))
+    _order(client, m, deep_h, "YES", 0.45, 50)
+    _order(client, m, near_h, "YES", 0.44, 50)
+    _order(client, m, far_h, "YES", 0.30, 50)
+    _order(client, m, no_h, "NO", 0.40, 50)
+
+    # The taker's bet takes price_yes to ~0.43. Both YES orders above that
+    # fill in full, the one furthest through its limit first, each on the
+    # curve where the previous fill left it.
+    pools = _pools(m)
+    expected = {}
+    for who, spend in (("taker", 30000), (deep, 5000), (near, 5000)):
+        out = apply_buy("YES", spend, **pools)
+        pools.update(yes_real_cents=out["new_yes_real_cents"], no_real_cents=out["new_no_real_cents"])
+        expected[who] = out
+    assert expected["taker"]["price_yes_after"] < 0.44
+
+    r = client.post(f"/markets/{m}/bet", headers=taker, json={"side": "YES", "spend_points": 300})
+    assert r.status_code == 200, r.text
+    assert r.json()["orders_filled"] == 2
+
+    assert _yes_micro(m, deep) == expected[deep]["shares_micro_issued"]
+    assert _yes_micro(m, near) == expected[near]["shares_micro_issued"]
+    assert _pools(m) == pools
+    assert client.get(f"/markets/{m}").json()["price_yes"] == pytest.approx(expected[near]["price_yes_after"])
+
+    # Not crossed: YES at 0.30 is below the price, NO at 0.40 below NO's ~0.58
+    for h in (far_h, no_h):
+        o, = client.get("/orders", headers=h).json()
+        assert (o["status"], o["remaining_points"]) == ("open", 50)
+    for h in (deep_h, near_h):
+        o, = client.get("/orders", headers=h).json()
+        assert (o["status"], o["remaining_points"]) == ("filled", 0)
+
+
+@pytest.mark.parametrize("home", [True, False], ids=["shard0", "escrowed"])
+def test_bet_response_prices_after_sweep(client, user, home):
+    m = _market(client, home)
+    _, maker = user(1000)
+    _, taker = user(1000)
+    # YES is at 0.5; this rests until a bet moves price_yes below 0.45
+    r = client.post(f"/markets/{m}/orders", headers=maker,
+                    json={"side": "YES", "limit_price": 0.45, "budget_points": 50})
+    assert r.status_code == 200, r.text
+    assert r.json()["order"]["status"] == "open"
+
+    r = client.post(f"/markets/{m}/bet", headers=taker, json={"side": "YES", "spend_points": 300})
+    assert r.status_code == 200, r.text
+    bet = r.json()
+    assert bet["orders_filled"] == 1
+
+    # The order's fill moved the price again: the response reports where it ended
+    market = client.get(f"/markets/{m}").json()
+    assert bet["price_yes_after"] == pytest.approx(market["price_yes"])
+    assert bet["odds"] == pytest.approx(market["odds"])
@@ -0,0 +1,105 @@
+# backend/tests/test_payouts.py
+# Settlement payouts: the pro-rata split is exact, and a settle job that
+# dies part-way through paying resumes without paying anyone twice.
+import random
+from app import db, jobs, reconcile
+from app.logic import allocate_pro_rata
+from app.positions import Holders
+from conftest import ADMIN
+
+
+def test_allocate_pro_rata_sums_to_the_pool():
+    rng = random.Random(37)
+    for _ in range(500):
+        weights = [rng.choice([0, 1, rng.randrange(1, 10**6), rng.randrange(1, 10**12)])
+                   for _ in range(rng.randrange(1, 40))]
+        pool = rng.randrange(0, 10**7)
+        out = allocate_pro_rata(pool, weights)
+        W = sum(weights)
+        if W == 0 or pool == 0:
+            assert out == [0] * len(weights)
+            continue
+        assert sum(out) == pool
+        # Everyone gets the floor of their exact share, at most one cent more
+        for w, a in zip(weights, out):
+            assert pool * w // W <= a <= pool * w // W + 1
+
+
+def test_allocate_pro_rata_ties_go_to_the_earlier_holder():
+    assert allocate_pro_rata(2, [1, 1, 1]) == [1, 1, 0]
+    assert allocate_pro_rata(100, [1, 1, 1]) == [34, 33, 33]
+
+
+def test_holders_payouts_match_the_allocator():
+    rng = random.Random(41)
+    for big in (False, True):   # True: pool * shares overflows int64
+        for _ in range(50):
+            n = rng.randrange(1, 30)
+            top = 10**15 if big else 10**9
+            rows = sorted((f"payout-{big}-{i:03d}", rng.choice([0, rng.randrange(1, top)]),
+                           rng.randrange(0, top)) for i in range(n))
+            pool = rng.randrange(1, 10**8 if big else 10**6)
+            h = Holders(rows)
+            for side, col in (("YES", 1), ("NO", 2)):
+                want = [(r[0], a) for r, a in zip(rows, allocate_pro_rata(pool, [r[col] for r in rows])) if a > 0]
+                got = h.payouts(side, pool)
+                assert got == want
+                assert sum(a for _, a in got) == (pool if any(r[col] for r in rows) else 0)
+
+
+def _cents(username):
+    with db.conn() as h:
+        return h.execute("SELECT balance_cents FROM users WHERE username=?", (username,)).fetchone()[0]
+
+
+def test_settle_resumed_after_crash_mid_pay_pays_once(client, user, shard_market, monkeypatch):
+    mid = shard_market()
+    winners = [user(1000) for _ in range(4)]
+    for points, (_, headers) in zip((10, 25, 40, 7), winners):
+        r = client.post(f"/markets/{mid}/bet", json={"side": "YES", "spend_points": points}, headers=headers)
+        assert r.status_code == 200, r.text
+    _, loser = user(1000)
+    assert client.post(f"/markets/{mid}/bet", json={"side": "NO", "spend_points": 30},
+                       headers=loser).status_code == 200
+    assert client.post(f"/admin/markets/{mid}/close", headers=ADMIN).status_code == 200
+
+    with db.market_conn(mid) as s:
+        pool = s.execute("SELECT yes_real_cents FROM markets WHERE id=?", (mid,)).fetchone()[0]
+        held = s.execute(
+            "SELECT username, yes_shares_micro FROM positions WHERE market_id=? AND yes_shares_micro > 0"
+            " ORDER BY username", (mid,),
+        ).fetchall()
+    expected = dict(zip((r[0] for r in held), allocate_pro_rata(pool, [r[1] for r in held])))
+    assert sum(expected.values()) == pool
+    before = {name: _cents(name) for name in expected}
+
+    # One payout per chunk; the second chunk's transaction dies
+    monkeypatch.setattr(jobs, "JOB_CHUNK_ROWS", 1)
+    real_record = reconcile.record_payouts
+    calls = []
+    def crash_second(*a, **kw):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("worker killed")
+        return real_record(*a, **kw)
+    with monkeypatch.context() as mp:
+        mp.setattr(reconcile, "record_payouts", crash_second)
+        mp.setattr(jobs, "MAX_ATTEMPTS", 1)
+        r = client.post(f"/admin/markets/{mid}/settle", json={"winner": "YES"}, headers=ADMIN)
+    assert r.status_code == 500, r.text
+
+    paid = {name: _cents(name) - before[name] for name in expected}
+    assert sorted(paid.values()).count(0) == len(expected) - 1
+    with db.market_conn(mid) as s:
+        assert s.execute("SELECT settled FROM markets WHERE id=?", (mid,)).fetchone()[0] == 0
+
+    # Settling again continues from the saved state
+    r = client.post(f"/admin/markets/{mid}/settle", json={"winner": "YES"}, headers=ADMIN)
+    assert r.status_code == 200, r.text
+    assert r.json()["total_paid_points"] == pool / 100.0
+
+    assert {name: _cents(name) - before[name] for name in expected} == expected
+    with db.market_conn(mid) as s:
+        assert s.execute("SELECT settled FROM markets WHERE id=?", (mid,)).fetchone()[0] == 1
+    with db.conn() as h:
+        assert h.execute("SELECT COUNT(*) FROM job_payouts").fetchone()[0] == 0